@@ -0,0 +1,601 @@
+#emulates an A-1 for testing and benchmarking without a unit: answers control messages like the unit does and outputs
+#IMU, INS, GPS and heading messages in ascii, rtcm or binary at the configured output rate, from a vehicle driving
+#in a circle. it can drop, corrupt and delay its output to test how programs handle a bad connection.
+#   UDP: listens on the unit ports 1, 2, 3 like an A-1 (ports below 1024 need root on linux) and sends output to
+#        rip:rport1 from its configurations, so IMUBoard.from_udp("127.0.0.1", 1111, 2222) or connecting user_program
+#        by UDP to 127.0.0.1 with ports 1111 and 2222 works with the defaults.
+#   pty: a pair of virtual serial ports for the data and control port. their paths are printed and can be used like
+#        COM ports: IMUBoard(data_port, control_port), or entered in user_program.
+#it also takes ODO messages and counts NTRIP corrections sent to the data port.
+#usage: python a1_emulator.py [-f ascii|rtcm|binary] [-r output rate in Hz] [--no_udp] [--pty] [--loss probability]
+#       [--corrupt probability] [--jitter_ms ms] [-s seconds]
+
+import argparse
+import math
+import os
+import random
+import selectors
+import socket
+import struct
+import sys
+import pathlib
+import time
+import tty
+from collections import deque
+
+parent_dir = str(pathlib.Path(__file__).parent)
+sys.path.append(parent_dir+'/src')
+from tools import *
+from tools.rtcm_scheme import crc24q
+from tools.binary_scheme import binary_checksum
+from user_program_config import CFG_VALUE_OPTIONS
+
+# product info the emulator answers with
+PRODUCT_INFO = {b'VER': b'1.4.0', b'SER': b'EMU00001', b'PID': b'A-1', b'IHW': b'1', b'FHW': b'1', b'FSN': b'1'}
+MESSAGE_FORMAT_CODES = {FRAME_ASCII: b'1', FRAME_RTCM: b'4', FRAME_BINARY: b'0'}  # mfm values
+DEFAULT_CONFIGS = {
+    "odr": b'200', "orn": b'+X+Y+Z', "gps1": b'on', "gps2": b'on', "odo": b'mps', "fog": b'on', "dhcp": b'off',
+    "lip": b'127.0.0.1', "rip": b'127.0.0.1', "rport1": b'1111', "rport2": b'2222', "rport3": b'3333',
+    "mfm": b'1', "uart": b'on', "eth": b'on', "sync": b'off', "ptp": b'off', "lpa": b'100', "lpw": b'100',
+    "lpo": b'100', "min": b'0', "ntrip": b'0', "nmea": b'0',
+}
+DEFAULT_VEHICLE_CONFIGS = {
+    "g1x": b'0.00', "g1y": b'-0.50', "g1z": b'-1.00', "g2x": b'0.00', "g2y": b'0.50', "g2z": b'-1.00',
+    "cnx": b'0.00', "cny": b'0.00', "cnz": b'0.00', "ocx": b'0.00', "ocy": b'0.00', "ocz": b'0.00',
+    "bsl": b'1.00', "bcal": b'0', "tic": b'0', "rad": b'0.000',
+}
+STATUS_PAYLOAD = b'errs,0,warnings,0,overall,PEACHY!'
+PING_CODE = 0
+MAX_OUTPUT_RATE = max(ALLOWED_SMP)
+UNIT_PORTS = [UDP_LOCAL_DATA_PORT, UDP_LOCAL_CONFIG_PORT, UDP_LOCAL_ODOMETER_PORT]
+
+GPS_RATE_HZ = 10  # GPS, GP2 and heading messages per second
+RESET_SECONDS = 1.0  # no output for this long after RST, like the unit restarting
+MAX_CATCH_UP_SECONDS = 1.0  # if the emulator was stalled longer than this, skip the missed output instead of bursting it
+STATUS_INTERVAL_SECONDS = 5
+CONTROL_READ_SIZE = 4096
+GPS_EPOCH_UNIX_SECONDS = 315964800
+GPS_LEAP_SECONDS = 18
+
+# vehicle path: a circle at constant speed, starting north
+START_LAT_DEG = 37.3990838
+START_LON_DEG = -121.9791725
+START_ALT_M = 10.0
+GEOID_HEIGHT_M = -30.0  # msl altitude = ellipsoid altitude - geoid height
+CIRCLE_RADIUS_M = 50.0
+SPEED_MPS = 10.0
+METERS_PER_DEGREE = 111320
+GRAVITY_MPS2 = 9.80665
+ACCEL_NOISE_G = 0.002
+RATE_NOISE_DPS = 0.02
+TEMPERATURE_C = 35.0
+# binary IMU accel and rate are scaled by these ranges, sent in mems_ranges
+BINARY_ACCEL_RANGE_G = 8
+BINARY_RATE_RANGE_DPS = 450
+HEADING_FLAGS_RTK_FIXED = 1 + 2 + 4 + 16 + 256  # gnssFixOK, diffSoln, relPosValid, carrSoln fixed, relPosHeading_Valid
+ASCII_DECIMALS = {"lat_deg": 7, "lon_deg": 7, "accel_x_g": 6, "accel_y_g": 6, "accel_z_g": 6, "angrate_x_dps": 6,
+                  "angrate_y_dps": 6, "angrate_z_dps": 6, "fog_angrate_z_dps": 6, "imu_time_ms": 3,
+                  "sync_time_ms": 3, "odometer_time_ms": 3}
+
+
+# ascii frame around a payload, like the unit's: #APxxx,payload*checksum\r\n
+def ascii_frame(scheme, msgtype, payload=None):
+    data = OUR_TALKER + msgtype + (READABLE_PAYLOAD_SEPARATOR + payload if payload else b'')
+    return READABLE_START + data + READABLE_CHECKSUM_SEPARATOR + int_to_ascii(scheme.compute_checksum(data)) + READABLE_END
+
+
+# smallest and largest value of a struct integer code
+def integer_limits(format_code):
+    bits = 8 * struct.calcsize("<" + format_code)
+    if format_code.islower():
+        return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+    return 0, (1 << bits) - 1
+
+
+# packs the fields of a binary or rtcm payload from their values, reversing the scale and clamping to the field size
+class PayloadPacker:
+    def __init__(self, format_list, endian, type_codes=None):
+        self.payload_format = PayloadFormat(format_list, endian, type_codes)
+        self.limits = [integer_limits(code) for code in self.payload_format.struct.format[1:]]
+        self.fields = list(zip(self.payload_format.names, self.payload_format.scales, self.limits))
+
+    def pack(self, values):
+        return self.payload_format.struct.pack(*[min(max(round(values[name] / scale), low), high)
+                                                 for name, scale, (low, high) in self.fields])
+
+
+# ascii payload text for a readable format list, with ASCII_DECIMALS for floats
+def ascii_payload_template(format_list):
+    parts = []
+    for name, value_type in format_list:
+        parts.append("%d" if value_type is int else f"%.{ASCII_DECIMALS.get(name, 4)}f")
+    return ",".join(parts), [name for name, value_type in format_list]
+
+
+# builds output frames from message values in one of the three formats
+class OutputEncoder:
+    def __init__(self):
+        self.scheme = ReadableScheme()
+        self.ascii_formats = {b'IMU': ascii_payload_template(FORMAT_IMU_WITH_SYNC),
+                              b'INS': ascii_payload_template(FORMAT_INS),
+                              b'GPS': ascii_payload_template(FORMAT_GPS),
+                              b'GP2': ascii_payload_template(FORMAT_GP2),
+                              b'HDG': ascii_payload_template(FORMAT_HDG)}
+        self.rtcm_formats = {b'IMU': (RTCM_MSGTYPE_IMU, PayloadPacker(RTCM_IMU_PAYLOAD_FIELDS_WITH_SYNC, ENDIAN)),
+                             b'INS': (RTCM_MSGTYPE_INS, PayloadPacker(RTCM_INS_PAYLOAD_FIELDS, ENDIAN)),
+                             b'GPS': (RTCM_MSGTYPE_GPS, PayloadPacker(RTCM_GPS_PAYLOAD_FIELDS, ENDIAN)),
+                             b'GP2': (RTCM_MSGTYPE_GPS, PayloadPacker(RTCM_GPS_PAYLOAD_FIELDS, ENDIAN)),
+                             b'HDG': (RTCM_MSGTYPE_HEADING, PayloadPacker(RTCM_DUAL_ANT_HEAD_FIELDS, ENDIAN))}
+        self.binary_formats = {b'IMU': (BINARY_MSGTYPE_IMU, PayloadPacker(BINARY_FORMAT_IMU, BINARY_ENDIAN, NUMBER_TYPES)),
+                               b'INS': (BINARY_MSGTYPE_INS, PayloadPacker(BINARY_FORMAT_INS, BINARY_ENDIAN, NUMBER_TYPES)),
+                               b'GPS': (BINARY_MSGTYPE_GPS, PayloadPacker(BINARY_FORMAT_GPS, BINARY_ENDIAN, NUMBER_TYPES)),
+                               b'GP2': (BINARY_MSGTYPE_GP2, PayloadPacker(BINARY_FORMAT_GP2, BINARY_ENDIAN, NUMBER_TYPES)),
+                               b'HDG': (BINARY_MSGTYPE_HDG, PayloadPacker(BINARY_FORMAT_HDG, BINARY_ENDIAN, NUMBER_TYPES))}
+
+    def encode(self, output_format, msgtype, values):
+        if output_format == FRAME_RTCM:
+            subtype, packer = self.rtcm_formats[msgtype]
+            message_data = ((ANELLO_IDENTIFIER << 4) | subtype).to_bytes(TYPE_LENGTH, "big") + packer.pack(values)
+            frame = RTCM_PREAMBLE + len(message_data).to_bytes(LENGTH_LENGTH, "big") + message_data
+            return frame + crc24q(frame).to_bytes(RTCM_CRC_LEN, "big")
+        if output_format == FRAME_BINARY:
+            binary_msgtype, packer = self.binary_formats[msgtype]
+            payload = packer.pack(binary_values(msgtype, values))
+            body = bytes([binary_msgtype, len(payload)]) + payload
+            return BINARY_PREAMBLE + body + binary_checksum(body)
+        template, names = self.ascii_formats[msgtype]
+        return ascii_frame(self.scheme, msgtype, (template % tuple(values[name] for name in names)).encode())
+
+
+# binary fields which differ from the others: IMU scaled by the ranges, heading within +-180, packed fix and rtk status
+def binary_values(msgtype, values):
+    values = dict(values)
+    if msgtype == b'IMU':
+        for name in ("accel_x_g", "accel_y_g", "accel_z_g"):
+            values[name] /= BINARY_ACCEL_RANGE_G
+        for name in ("angrate_x_dps", "angrate_y_dps", "angrate_z_dps"):
+            values[name] /= BINARY_RATE_RANGE_DPS
+        values["mems_ranges"] = BINARY_ACCEL_RANGE_G * pow(2, 11) + BINARY_RATE_RANGE_DPS
+        values["fog_range"] = 0
+    for name in ("heading_deg", "relPosHeading_deg"):
+        if name in values and values[name] > 180:
+            values[name] -= 360
+    if msgtype in (b'GPS', b'GP2'):
+        values["carrsoln_and_fix"] = values["carrier_solution_status"] * 16 + values["gnss_fix_type"]
+    return values
+
+
+# message values of a vehicle driving in a circle
+class VehicleModel:
+    def __init__(self):
+        self.odometer_speed = 0.0
+        self.odometer_time_ns = 0
+
+    def state(self, seconds):
+        angle = SPEED_MPS * seconds / CIRCLE_RADIUS_M
+        north = CIRCLE_RADIUS_M * math.sin(angle)
+        east = CIRCLE_RADIUS_M * (1 - math.cos(angle))
+        lat = START_LAT_DEG + north / METERS_PER_DEGREE
+        lon = START_LON_DEG + east / (METERS_PER_DEGREE * math.cos(math.radians(START_LAT_DEG)))
+        return lat, lon, math.degrees(angle) % 360
+
+    def imu(self, imu_time_ns):
+        yaw_rate = math.degrees(SPEED_MPS / CIRCLE_RADIUS_M)
+        return {"imu_time_ns": imu_time_ns, "imu_time_ms": imu_time_ns / 1e6,
+                "sync_time_ns": imu_time_ns - imu_time_ns % 1000000000, "sync_time_ms": (imu_time_ns - imu_time_ns % 1000000000) / 1e6,
+                "accel_x_g": random.gauss(0, ACCEL_NOISE_G),
+                "accel_y_g": SPEED_MPS ** 2 / CIRCLE_RADIUS_M / GRAVITY_MPS2 + random.gauss(0, ACCEL_NOISE_G),
+                "accel_z_g": -1.0 + random.gauss(0, ACCEL_NOISE_G),
+                "angrate_x_dps": random.gauss(0, RATE_NOISE_DPS), "angrate_y_dps": random.gauss(0, RATE_NOISE_DPS),
+                "angrate_z_dps": yaw_rate + random.gauss(0, RATE_NOISE_DPS), "fog_angrate_z_dps": yaw_rate,
+                "odometer_speed_mps": self.odometer_speed, "odometer_time_ns": self.odometer_time_ns,
+                "odometer_time_ms": self.odometer_time_ns / 1e6, "temperature_c": TEMPERATURE_C}
+
+    def ins(self, imu_time_ns, gps_time_ns):
+        lat, lon, heading = self.state(imu_time_ns / 1e9)
+        return {"imu_time_ns": imu_time_ns, "imu_time_ms": imu_time_ns // 1000000, "gps_time_ns": gps_time_ns,
+                "ins_solution_status": 3, "lat_deg": lat, "lon_deg": lon, "alt_m": START_ALT_M,
+                "velocity_north_mps": SPEED_MPS * math.cos(math.radians(heading)),
+                "velocity_east_mps": SPEED_MPS * math.sin(math.radians(heading)), "velocity_down_mps": 0.0,
+                "roll_deg": 0.0, "pitch_deg": 0.0, "heading_deg": heading, "zupt_flag": 0}
+
+    def gps(self, imu_time_ns, gps_time_ns, antenna_id):
+        lat, lon, heading = self.state(imu_time_ns / 1e9)
+        offset = antenna_id * 1.0 / METERS_PER_DEGREE  # second antenna a meter away
+        return {"imu_time_ns": imu_time_ns, "imu_time_ms": imu_time_ns / 1e6, "gps_time_ns": gps_time_ns,
+                "lat_deg": lat + offset, "lon_deg": lon, "alt_ellipsoid_m": START_ALT_M,
+                "alt_msl_m": START_ALT_M - GEOID_HEIGHT_M, "speed_mps": SPEED_MPS, "heading_deg": heading,
+                "accuracy_horizontal_m": 0.02, "accuracy_vertical_m": 0.03, "PDOP": 1.2, "gnss_fix_type": 3,
+                "num_sats": 20, "speed_accuracy_mps": 0.05, "heading_accuracy_deg": 0.5,
+                "carrier_solution_status": 2, "antenna_id": antenna_id}
+
+    def heading(self, imu_time_ns, gps_time_ns, baseline):
+        heading = self.state(imu_time_ns / 1e9)[2]
+        return {"imu_time_ns": imu_time_ns, "imu_time_ms": imu_time_ns / 1e6, "gps_time_ns": gps_time_ns,
+                "relPosN_m": baseline * math.cos(math.radians(heading)),
+                "relPosE_m": baseline * math.sin(math.radians(heading)), "relPosD_m": 0.0, "relPosLen_m": baseline,
+                "relPosHeading_deg": heading, "relPosLenAcc_m": 0.005, "relPosHeadingAcc_deg": 0.2,
+                "flags": HEADING_FLAGS_RTK_FIXED}
+
+
+# what a unit keeps: configurations in ram and flash, odometer input, counts of control messages and corrections
+class EmulatedUnit:
+    def __init__(self, output_format, output_rate):
+        self.scheme = ReadableScheme()
+        self.flash_configs = dict(DEFAULT_CONFIGS)
+        self.flash_configs["mfm"] = MESSAGE_FORMAT_CODES[output_format]
+        self.flash_configs["odr"] = str(output_rate).encode()
+        self.configs = dict(self.flash_configs)
+        self.vehicle_configs = dict(DEFAULT_VEHICLE_CONFIGS)
+        self.flash_unlocked = False
+        self.reset_until = 0  # perf_counter time the output starts again after RST
+        self.requests = 0
+        self.errors = 0
+        self.odometer_messages = 0
+
+    def output_format(self):
+        for output_format, code in MESSAGE_FORMAT_CODES.items():
+            if self.configs["mfm"] == code:
+                return output_format
+        return FRAME_ASCII
+
+    def output_rate(self):
+        return int(self.configs["odr"])
+
+    def error(self, code):
+        self.errors += 1
+        return ascii_frame(self.scheme, b'ERR', str(code).encode())
+
+    # response frame to a control message frame, None if there is none (RST, ODO)
+    def respond(self, frame, vehicle):
+        message = self.scheme.parse_message(frame)
+        if not hasattr(message, "payload"):
+            return self.error(ERROR_INCOMPLETE)
+        if not self.scheme.checksum_passes(message):
+            return self.error(ERROR_CHECKSUM)
+        if message.talker != OUR_TALKER:
+            return self.error(ERROR_TALKER)
+        msgtype = message.msgtype
+        self.requests += 1
+        if msgtype in PRODUCT_INFO:
+            return ascii_frame(self.scheme, msgtype, PRODUCT_INFO[msgtype])
+        if msgtype == b'CFG':
+            return self.read_write(msgtype, message.payload, self.configs, self.flash_configs, check_config)
+        if msgtype == b'VEH':
+            return self.read_write(msgtype, message.payload, self.vehicle_configs, self.vehicle_configs, check_vehicle_config)
+        if msgtype == b'STA':
+            return ascii_frame(self.scheme, b'STA', STATUS_PAYLOAD)
+        if msgtype == b'PNG':
+            return ascii_frame(self.scheme, b'PNG', str(PING_CODE).encode())
+        if msgtype == b'ECH':
+            return ascii_frame(self.scheme, b'ECH', message.payload)
+        if msgtype == b'UNL':
+            if message.payload:
+                self.flash_unlocked = message.payload == UNLOCK_FLASH_CODE
+            return ascii_frame(self.scheme, b'UNL', FLASH_UNLOCKED_VALUE if self.flash_unlocked else FLASH_LOCKED_VALUE)
+        if msgtype == b'RST':
+            self.configs = dict(self.flash_configs)
+            self.reset_until = time.perf_counter() + RESET_SECONDS
+            return None
+        if msgtype == b'ODO':
+            try:
+                vehicle.odometer_speed = float(message.payload)
+            except ValueError:
+                return self.error(ERROR_VALUE)
+            vehicle.odometer_time_ns = time.monotonic_ns()
+            self.odometer_messages += 1
+            return None
+        return self.error(ERROR_MSG_TYPE)
+
+    # CFG or VEH: r/R,name,... reads (all if no names), w/W,name,value,... writes. answers with name,value pairs
+    def read_write(self, msgtype, payload, ram, flash, check):
+        fields = [field.decode() for field in payload.split(READABLE_PAYLOAD_SEPARATOR)]
+        mode, fields = fields[0].encode(), fields[1:]
+        if mode in (READ_RAM, READ_FLASH):
+            configs = ram if mode == READ_RAM else flash
+            names = fields or list(configs.keys())
+            if any(name not in configs for name in names):
+                return self.error(ERROR_FIELD)
+            pairs = [(name, configs[name]) for name in names]
+        elif mode in (WRITE_RAM, WRITE_FLASH):
+            if len(fields) % 2:
+                return self.error(ERROR_INCOMPLETE)
+            pairs = [(fields[i], fields[i + 1].encode()) for i in range(0, len(fields), 2)]
+            for name, value in pairs:
+                if name not in ram:
+                    return self.error(ERROR_FIELD)
+                if not check(name, value):
+                    return self.error(ERROR_VALUE)
+            for name, value in pairs:
+                ram[name] = value
+                if mode == WRITE_FLASH:
+                    flash[name] = value
+        else:
+            return self.error(ERROR_NO_READ_WRITE)
+        return ascii_frame(self.scheme, msgtype, b','.join(name.encode() + b',' + value for name, value in pairs))
+
+
+def check_config(name, value):
+    if name == "odr":
+        return value.isdigit() and 0 < int(value) <= MAX_OUTPUT_RATE
+    if name == "mfm":
+        return value in MESSAGE_FORMAT_CODES.values()
+    if name in CFG_VALUE_OPTIONS:
+        return value.decode() in CFG_VALUE_OPTIONS[name]
+    if name in ("rport1", "rport2", "rport3"):
+        return value.isdigit() and 0 < int(value) < 65536
+    return bool(value)
+
+
+def check_vehicle_config(name, value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+# loss, corruption and delay of output messages
+class Impairments:
+    def __init__(self, loss=0.0, corrupt=0.0, jitter_ms=0.0):
+        self.loss = loss
+        self.corrupt = corrupt
+        self.jitter_seconds = jitter_ms / 1000
+        self.dropped = 0
+        self.corrupted = 0
+        self.last_release = 0
+
+    # the frame to send, or None if it is lost
+    def apply(self, frame):
+        if self.loss and random.random() < self.loss:
+            self.dropped += 1
+            return None
+        if self.corrupt and random.random() < self.corrupt:
+            self.corrupted += 1
+            frame = bytearray(frame)
+            frame[random.randrange(len(frame))] ^= random.randint(1, 255)
+            frame = bytes(frame)
+        return frame
+
+    # when a message due at due_time goes out: up to jitter later, never before the one before it
+    def release_time(self, due_time):
+        if not self.jitter_seconds:
+            return due_time
+        self.last_release = max(self.last_release, due_time + random.uniform(0, self.jitter_seconds))
+        return self.last_release
+
+
+# virtual serial port: the emulator keeps the master end and its own handle on the port end, so the port stays
+# usable while programs open and close it
+def open_pty(link_path=None):
+    master, port = os.openpty()
+    tty.setraw(port)
+    os.set_blocking(master, False)
+    path = os.ttyname(port)
+    if link_path:
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        os.symlink(path, link_path)
+    return master, port, path
+
+
+class A1Emulator:
+    def __init__(self, output_format=FRAME_ASCII, output_rate=200, udp=True, udp_ip="", unit_ports=UNIT_PORTS,
+                 use_pty=False, pty_links=None, impairments=None):
+        self.unit = EmulatedUnit(output_format, output_rate)
+        self.vehicle = VehicleModel()
+        self.encoder = OutputEncoder()
+        self.impairments = impairments or Impairments()
+        self.selector = selectors.DefaultSelector()
+        self.control_framers = {}  # per control input: StreamFramer for its ascii messages
+        self.ntrip_framer = StreamFramer()
+        self.ntrip_framer.set_protocols([FRAME_RTCM])
+        self.ntrip_bytes = 0
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.pty_overflow_bytes = 0  # output nobody read, dropped when the pty buffer was full
+        self.skipped_messages = 0  # not sent because the emulator fell too far behind
+        self.pending = deque()  # (release time, frame) waiting for jitter
+        self.data_socket = None
+        self.pty_data = None
+        self.pty_paths = None
+        if udp:
+            data_port, control_port, odometer_port = unit_ports
+            self.data_socket = self.udp_socket(udp_ip, data_port, self.data_input)
+            self.control_socket = self.udp_socket(udp_ip, control_port, self.control_input)
+            self.odometer_socket = self.udp_socket(udp_ip, odometer_port, self.control_input)
+        if use_pty:
+            pty_links = pty_links or [None, None]
+            self.pty_data, self.pty_data_port, data_path = open_pty(pty_links[0])
+            self.pty_control, self.pty_control_port, control_path = open_pty(pty_links[1])
+            self.selector.register(self.pty_data, selectors.EVENT_READ, self.data_input)
+            self.selector.register(self.pty_control, selectors.EVENT_READ, self.control_input)
+            self.pty_paths = (pty_links[0] or data_path, pty_links[1] or control_path)
+
+    def udp_socket(self, ip, port, handler):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((ip, port))
+        sock.setblocking(False)
+        self.selector.register(sock, selectors.EVENT_READ, handler)
+        return sock
+
+    # data read from a udp socket or pty master: (data, address to answer, or None for the pty)
+    def receive(self, source):
+        try:
+            if isinstance(source, socket.socket):
+                return source.recvfrom(CONTROL_READ_SIZE)
+            return os.read(source, CONTROL_READ_SIZE), None
+        except OSError:  # nothing to read, pty with nothing on the port end, or udp port unreachable from a send
+            return b'', None
+
+    def control_input(self, source):
+        data, address = self.receive(source)
+        framer = self.control_framers.setdefault(source, self.new_control_framer())
+        for protocol, frame in framer.feed(data):
+            response = self.unit.respond(bytes(frame), self.vehicle)
+            if response is None:
+                continue
+            if address is not None:
+                source.sendto(response, address)
+            else:
+                self.write_pty(source, response)
+
+    def new_control_framer(self):
+        framer = StreamFramer()
+        framer.set_protocols([FRAME_ASCII])
+        return framer
+
+    # on the data port: ntrip corrections going to the gps receivers
+    def data_input(self, source):
+        data, address = self.receive(source)
+        self.ntrip_bytes += len(data)
+        for protocol, frame in self.ntrip_framer.feed(data):
+            pass  # framed only to check them: StreamFramer counts the frames
+
+    def write_pty(self, master, data):
+        try:
+            written = os.write(master, data)
+        except OSError:  # buffer full: nobody is reading the port
+            written = 0
+        self.pty_overflow_bytes += len(data) - written
+
+    def send_output(self, frames):
+        configs = self.unit.configs
+        if self.data_socket and configs["eth"] == b'on':
+            destination = (configs["rip"].decode(), int(configs["rport1"]))
+            for frame in frames:
+                try:
+                    self.data_socket.sendto(frame, destination)
+                except OSError:  # like nothing listening on the computer's port
+                    pass
+        if self.pty_data is not None and configs["uart"] == b'on':
+            self.write_pty(self.pty_data, b''.join(frames))
+        self.sent_messages += len(frames)
+        self.sent_bytes += sum(len(frame) for frame in frames)
+
+    # frames for the output due at imu time, after loss and corruption
+    def output_frames(self, imu_time_ns, gps_due):
+        output_format = self.unit.output_format()
+        gps_time_ns = time.time_ns() + (GPS_LEAP_SECONDS - GPS_EPOCH_UNIX_SECONDS) * 1000000000
+        messages = [(b'IMU', self.vehicle.imu(imu_time_ns)), (b'INS', self.vehicle.ins(imu_time_ns, gps_time_ns))]
+        if gps_due:
+            if self.unit.configs["gps1"] == b'on':
+                messages.append((b'GPS', self.vehicle.gps(imu_time_ns, gps_time_ns, 0)))
+            if self.unit.configs["gps2"] == b'on':
+                messages.append((b'GP2', self.vehicle.gps(imu_time_ns, gps_time_ns, 1)))
+                baseline = float(self.unit.vehicle_configs["bsl"])
+                messages.append((b'HDG', self.vehicle.heading(imu_time_ns, gps_time_ns, baseline)))
+        frames = []
+        for msgtype, values in messages:
+            frame = self.impairments.apply(self.encoder.encode(output_format, msgtype, values))
+            if frame is not None:
+                frames.append(frame)
+        return frames
+
+    def run(self, seconds=None):
+        start = time.perf_counter()
+        start_ns = time.monotonic_ns()
+        stop_time = start + seconds if seconds else None
+        next_output = start
+        next_gps = start
+        next_status = start + STATUS_INTERVAL_SECONDS
+        last_status = (start, 0, 0)
+        try:
+            while stop_time is None or time.perf_counter() < stop_time:
+                now = time.perf_counter()
+                if now < self.unit.reset_until:
+                    next_output = next_gps = self.unit.reset_until
+                elif now - next_output > MAX_CATCH_UP_SECONDS:  # stalled: skip ahead instead of a huge burst
+                    skipped = int((now - next_output) * self.unit.output_rate())
+                    self.skipped_messages += skipped
+                    next_output += skipped / self.unit.output_rate()
+                while next_output <= now:
+                    gps_due = next_output >= next_gps
+                    if gps_due:
+                        next_gps += 1 / GPS_RATE_HZ
+                    imu_time_ns = start_ns + round((next_output - start) * 1e9)
+                    for frame in self.output_frames(imu_time_ns, gps_due):
+                        self.pending.append((self.impairments.release_time(next_output), frame))
+                    next_output += 1 / self.unit.output_rate()
+                frames = []
+                while self.pending and self.pending[0][0] <= now:
+                    frames.append(self.pending.popleft()[1])
+                if frames:
+                    self.send_output(frames)
+                if now >= next_status:
+                    last_status = self.print_status(now, last_status)
+                    next_status += STATUS_INTERVAL_SECONDS
+                wake = min(next_output, next_status, self.pending[0][0] if self.pending else next_output)
+                if stop_time is not None:
+                    wake = min(wake, stop_time)
+                for key, events in self.selector.select(max(0, wake - time.perf_counter())):
+                    key.data(key.fileobj)
+        except KeyboardInterrupt:
+            pass
+        self.print_status(time.perf_counter(), (start, 0, 0))
+
+    # counts since the last status: sends (time, messages, bytes) for the next one
+    def print_status(self, now, last_status):
+        last_time, last_messages, last_bytes = last_status
+        elapsed = max(now - last_time, 1e-9)
+        print(f"{self.unit.output_format()} at {self.unit.output_rate()} Hz: {(self.sent_messages - last_messages) / elapsed:.0f} messages/s,"
+              f" {(self.sent_bytes - last_bytes) / elapsed / 1000:.1f} kB/s. sent {self.sent_messages:,},"
+              f" lost {self.impairments.dropped:,}, corrupted {self.impairments.corrupted:,},"
+              f" skipped {self.skipped_messages:,}, pty overflow {self.pty_overflow_bytes:,} B")
+        print(f"    control messages {self.unit.requests:,} (errors {self.unit.errors:,}), odometer {self.unit.odometer_messages:,}"
+              f" (speed {self.vehicle.odometer_speed} m/s), ntrip {self.ntrip_bytes:,} B in"
+              f" {self.ntrip_framer.frame_counts[FRAME_RTCM]:,} rtcm messages")
+        return now, self.sent_messages, self.sent_bytes
+
+    def close(self):
+        self.selector.close()
+        for sock in [self.data_socket, getattr(self, "control_socket", None), getattr(self, "odometer_socket", None)]:
+            if sock:
+                sock.close()
+        if self.pty_data is not None:
+            for fd in [self.pty_data, self.pty_data_port, self.pty_control, self.pty_control_port]:
+                os.close(fd)
+
+
+if __name__ == "__main__":
+    argp = argparse.ArgumentParser()
+    argp.add_argument('-f', '--format', choices=[FRAME_ASCII, FRAME_RTCM, FRAME_BINARY], default=FRAME_ASCII,
+                      help='output message format (mfm)')
+    argp.add_argument('-r', '--rate', type=int, default=200, help=f'output data rate in Hz (odr), up to {MAX_OUTPUT_RATE}')
+    argp.add_argument('-s', '--seconds', type=float, default=None, help='stop after this long, default: until ctrl-c')
+    argp.add_argument('--no_udp', action='store_true', help="don't listen on the unit's UDP ports")
+    argp.add_argument('--udp_ip', default="", help='address to listen on, default all')
+    argp.add_argument('--unit_ports', type=int, nargs=3, default=UNIT_PORTS, metavar=('DATA', 'CONTROL', 'ODOMETER'),
+                      help="the unit's UDP ports, 1 2 3 on an A-1")
+    argp.add_argument('--computer_ip', default=None, help='where UDP output goes (rip), default 127.0.0.1')
+    argp.add_argument('--ports', type=int, nargs=3, default=None, metavar=('DATA', 'CONTROL', 'ODOMETER'),
+                      help="computer's UDP ports (rport1, rport2, rport3), default 1111 2222 3333")
+    argp.add_argument('--pty', action='store_true', help='also make virtual serial ports for the data and control port')
+    argp.add_argument('--pty_links', nargs=2, default=None, metavar=('DATA', 'CONTROL'),
+                      help='symlink paths for the virtual serial ports, like /tmp/a1_data /tmp/a1_control')
+    argp.add_argument('--loss', type=float, default=0, help='probability of dropping each output message')
+    argp.add_argument('--corrupt', type=float, default=0, help='probability of changing a byte of each output message')
+    argp.add_argument('--jitter_ms', type=float, default=0, help='delay output messages by up to this much, in order')
+    argp.add_argument('--seed', type=int, default=None, help='random seed, for repeatable loss and corruption')
+    args = argp.parse_args()
+    if not 0 < args.rate <= MAX_OUTPUT_RATE:
+        argp.error(f"rate must be from 1 to {MAX_OUTPUT_RATE}")
+    random.seed(args.seed)
+
+    emulator = A1Emulator(args.format, args.rate, udp=not args.no_udp, udp_ip=args.udp_ip, unit_ports=args.unit_ports,
+                          use_pty=args.pty or args.no_udp, pty_links=args.pty_links,
+                          impairments=Impairments(args.loss, args.corrupt, args.jitter_ms))
+    if args.computer_ip:
+        emulator.unit.configs["rip"] = emulator.unit.flash_configs["rip"] = args.computer_ip.encode()
+    if args.ports:
+        for name, port in zip(["rport1", "rport2", "rport3"], args.ports):
+            emulator.unit.configs[name] = emulator.unit.flash_configs[name] = str(port).encode()
+    configs = emulator.unit.configs
+    if emulator.data_socket:
+        print(f"UDP: unit ports {args.unit_ports}, output to {configs['rip'].decode()}:{configs['rport1'].decode()},"
+              f" computer ports {configs['rport1'].decode()} {configs['rport2'].decode()} {configs['rport3'].decode()}")
+    if emulator.pty_paths:
+        print(f"serial: data port {emulator.pty_paths[0]}, control port {emulator.pty_paths[1]}")
+    emulator.run(args.seconds)
+    emulator.close()
@@ -105,15 +105,23 @@ def export_logs_detect_format():
     return True
 
 
+# parse each complete message of the log's format once. frames of other formats are skipped.
+# frames are views into the mapped log, so the log is not copied and memory use stays flat for big logs.
+def read_log_messages(reader, format, parse_scheme, bad_frames=None):
+    for protocol, frame in mapped_log_frames(reader, bad_frames):
+        if protocol == format:
+            yield parse_scheme.parse_message(frame)
+
+
 def export_log_by_format(file_path, format="rtcm"):
     if format == "ascii":
-        parse_scheme = ReadableScheme()
+        parse_scheme = ReadableScheme(lazy=False)  # all fields are exported
         #start_char = b'#'
     elif format == "rtcm":
-        parse_scheme = RTCM_Scheme()
+        parse_scheme = RTCM_Scheme(lazy=False)  # all fields are exported
         #start_char = b'\xD3'
     elif format == "binary":
-        parse_scheme = Binary_Scheme()
+        parse_scheme = Binary_Scheme(lazy=False)  # all fields are exported
     else:
         print(f"unknown format {format}, must be ascii, binary or rtcm")
         return
@@ -123,7 +131,7 @@ def export_log_by_format(file_path, format="rtcm"):
     # elif format == "rtcm":
     #     reader = open(input_path, 'rb')
 
-    reader = FileReaderConnection(file_path) #should work for either format
+    reader = MappedLogConnection(file_path) #should work for either format
 
     # pick name and location for output files
     input_location = os.path.dirname(file_path)
@@ -182,23 +190,14 @@ def export_log_by_format(file_path, format="rtcm"):
     #print("line: "+line.decode())
     errors_count = 0
     line_num = 0
-    while True: #until read empty - TODO figure out the loop condition
+    bad_frames = {}  # frames which failed their checksum, counted by the framer instead of parsed
+    for m in read_log_messages(reader, format, parse_scheme, bad_frames):
 
         #show progress: dot per some number of lines
         if line_num % 1000 == 0:
             print(".", end="", flush=True)
         line_num += 1
 
-        if format == "ascii":
-            m = parse_scheme.read_one_message(reader)
-        elif format == "rtcm":
-            m = parse_scheme.read_message_from_file(reader)
-        elif format == "binary":
-            m = parse_scheme.read_one_message_withlength(reader)
-
-        if m is None: #done reading
-            break
-
         #print(m)
         if m and m.valid and m.msgtype in EXPORT_MESSAGE_TYPES:
             # put whichever data we want based on message type and write to the csv for that type.
@@ -228,6 +227,7 @@ def export_log_by_format(file_path, format="rtcm"):
             errors_count += 1
             debug_print(f"\ninvalid message on line {line_num}: type = {m.msgtype if hasattr(m, 'msgtype') else 'None'}, valid = {m.valid}")
             debug_print(m)
+    errors_count += bad_frames.get(format, 0)
 
     reader.close()
     ins_out.close()
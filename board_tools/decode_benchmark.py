@@ -0,0 +1,301 @@
+#benchmark for message decoding speed on a synthetic log. no unit needed.
+#usage: python decode_benchmark.py [-n number of messages]
+
+import argparse
+import random
+import struct
+import sys
+import os
+import pathlib
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+parent_dir = str(pathlib.Path(__file__).parent)
+sys.path.append(parent_dir+'/src')
+from tools import *
+from pyrtcm import calc_crc24q
+
+#message mix per second, roughly 200 Hz IMU with INS, GPS and heading
+RTCM_MIX = [(RTCM_MSGTYPE_IMU, RTCM_IMU_PAYLOAD_FIELDS_WITH_SYNC, 200),
+            (RTCM_MSGTYPE_INS, RTCM_INS_PAYLOAD_FIELDS, 20),
+            (RTCM_MSGTYPE_GPS, RTCM_GPS_PAYLOAD_FIELDS, 2),
+            (RTCM_MSGTYPE_HEADING, RTCM_DUAL_ANT_HEAD_FIELDS, 1)]
+
+
+#random value that fits in the struct code
+def random_value(format_code):
+    bits = 8 * struct.calcsize("<" + format_code)
+    if format_code.islower():
+        return random.randint(-(1 << (bits - 2)), (1 << (bits - 2)))
+    return random.randint(0, (1 << (bits - 1)))
+
+
+#one RTCM frame: preamble, 6 bit reserved + 10 bit length, 12 bit 4058 + 4 bit subtype, payload, CRC-24Q
+def build_rtcm_frame(subtype, format_list):
+    values = [random_value(item[1]) for item in format_list]
+    if format_list is RTCM_GPS_PAYLOAD_FIELDS:
+        values[-1] = random.randint(0, 1)  # antenna id
+    payload = PayloadFormat(format_list, ENDIAN).struct.pack(*values)
+    message_data = ((ANELLO_IDENTIFIER << 4) | subtype).to_bytes(TYPE_LENGTH, "big") + payload
+    frame = RTCM_PREAMBLE + len(message_data).to_bytes(LENGTH_LENGTH, "big") + message_data
+    return frame + calc_crc24q(frame).to_bytes(RTCM_CRC_LEN, "big")
+
+
+def build_rtcm_log(num_messages):
+    frames = []
+    per_cycle = sum(count for (subtype, format_list, count) in RTCM_MIX)
+    for i in range(num_messages // per_cycle + 1):
+        for subtype, format_list, count in RTCM_MIX:
+            frames.extend(build_rtcm_frame(subtype, format_list) for j in range(count))
+    return b''.join(frames[:num_messages])
+
+
+#split a log into frames using the length field
+def split_rtcm_frames(log_data):
+    frames = []
+    i = 0
+    while i + 3 <= len(log_data):
+        length = int.from_bytes(log_data[i+1:i+3], "big") & 0x3FF
+        end = i + 3 + length + RTCM_CRC_LEN
+        frames.append(log_data[i:end])
+        i = end
+    return frames
+
+
+#RTCM_Scheme as it was before payload formats were compiled: one unpack and setattr per field
+class LegacyRTCM_Scheme(RTCM_Scheme):
+    def decode_payload_for_type(self, message, msgtype, payload):
+        if message.rtcm_msgtype == RTCM_MSGTYPE_IMU:
+            self.set_fields_from_list_scaled(message, RTCM_IMU_PAYLOAD_FIELDS_WITH_SYNC, payload)
+            if not message.valid:
+                message.valid = True
+                self.set_fields_from_list_scaled(message, RTCM_IMU_PAYLOAD_FIELDS_NO_SYNC, payload)
+        else:
+            super().decode_payload_for_type(message, msgtype, payload)
+
+    def set_fields_from_list_scaled(self, message, format_list, data):
+        if isinstance(format_list, PayloadFormat):
+            format_list = format_list.format_list
+        try:
+            data_offset = 0
+            for item in format_list:
+                name, format_code = item[0], item[1]
+                scale = item[2] if len(item) == 3 else 1
+                format_str = "<" + format_code
+                chunk_size = struct.calcsize(format_str)
+                value = struct.unpack(format_str, data[data_offset:data_offset + chunk_size])[0]
+                data_offset += chunk_size
+                setattr(message, name, scale * value)
+        except Exception as e:
+            message.valid = False
+            message.error = "Length(unpack)"
+
+
+#RTCM_Scheme as it was before compact message classes: a Message with a __dict__ per message, keeping the frame data
+class DictMessageRTCM_Scheme(RTCM_Scheme):
+    def __init__(self):
+        super().__init__(keep_raw=True, lazy=False)
+
+    def new_message(self, data):
+        return Message()
+
+
+def build_ascii_log(num_messages):
+    scheme = ReadableScheme()
+    lines = []
+    for i in range(num_messages):
+        payload = b'APIMU,' + ",".join(f"{random.uniform(-10, 10):.6f}" for j in range(11)).encode()
+        lines.append(READABLE_START + payload + READABLE_CHECKSUM_SEPARATOR
+                     + int_to_ascii(scheme.compute_checksum(payload)) + READABLE_END)
+    return b''.join(lines)
+
+
+#FileReaderConnection as it was before block reads: one file read and one bytes concatenation per byte
+class LegacyFileReaderConnection(FileReaderConnection):
+    def read(self, size=1):
+        return self.reader.read(size)
+
+    def read_until(self, expected='\n', size_limit=2048):
+        out = b''
+        if size_limit is None:
+            while True:
+                data = self.reader.read(1)
+                out += data
+                if data == b'' or out[-len(expected):] == expected:
+                    return out
+        for i in range(max(size_limit, 1)):
+            data = self.reader.read(1)
+            out += data
+            if data == b'' or out[-len(expected):] == expected:
+                break
+        return out
+
+
+def time_parsing(scheme, frames):
+    start = time.perf_counter()
+    valid = 0
+    for frame in frames:
+        if scheme.parse_message(frame).valid:
+            valid += 1
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed, valid
+
+
+#payload decoding only, header already split
+def time_payload_decoding(scheme, frames):
+    messages = [RTCM_Scheme(keep_raw=True, lazy=False).parse_message(frame) for frame in frames]
+    start = time.perf_counter()
+    for m in messages:
+        scheme.decode_payload_for_type(m, m.rtcm_msgtype, m.payload)
+    elapsed = time.perf_counter() - start
+    return len(frames) / elapsed
+
+
+def bench_rtcm_payload(num_messages):
+    print(f"\nRTCM payload decoding, {num_messages} messages:")
+    frames = split_rtcm_frames(build_rtcm_log(num_messages))
+    for name, scheme in [("before (per-field unpack)", LegacyRTCM_Scheme(lazy=False)), ("after (compiled struct)", RTCM_Scheme(lazy=False))]:
+        payload_rate = time_payload_decoding(scheme, frames)
+        rate, valid = time_parsing(scheme, frames)
+        print(f"    {name:<30} payload only: {payload_rate:>12,.0f} msgs/s    full parse: {rate:>10,.0f} msgs/s    ({valid} valid)")
+
+
+#whole log at once into numpy arrays, versus one Message per frame
+def bench_log_arrays(num_messages):
+    print(f"\nwhole-log RTCM decoding, {num_messages} messages:")
+    log_data = build_rtcm_log(num_messages)
+    rate, valid = time_parsing(RTCM_Scheme(lazy=False), split_rtcm_frames(log_data))
+    print(f"    {'Message per frame':<30} {rate:>12,.0f} msgs/s    ({valid} valid)")
+    start = time.perf_counter()
+    arrays = decode_buffer_to_arrays(log_data, "rtcm")
+    elapsed = time.perf_counter() - start
+    decoded = sum(len(a) for a in arrays.values())
+    print(f"    {'decode_buffer_to_arrays':<30} {decoded / elapsed:>12,.0f} msgs/s    ({decoded} valid)")
+
+
+#memory held by parsed messages which are kept, like in the Collector. each frame is copied out as the framer does.
+def bench_message_memory(num_messages):
+    print(f"\nmemory per parsed RTCM message, {num_messages} messages:")
+    frames = split_rtcm_frames(build_rtcm_log(num_messages))
+    for name, scheme in [("before (dict Message, raw kept)", DictMessageRTCM_Scheme()),
+                         ("compact classes, keep_raw", RTCM_Scheme(keep_raw=True, lazy=False)),
+                         ("compact classes", RTCM_Scheme(lazy=False))]:
+        tracemalloc.start()
+        messages = [scheme.parse_message(bytes(frame)) for frame in frames]
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"    {name:<32} {size / len(messages):>8,.0f} bytes/message    ({sum(m.valid for m in messages)} valid)")
+        del messages
+
+
+#parse and count message types only, like the io_loop handoff or skipping data messages for a control response.
+#ascii always decodes while parsing, since that's how a field which doesn't convert is found
+def bench_lazy_decoding(num_messages):
+    print(f"\ncounting message types without reading fields, {num_messages} messages:")
+    logs = [("RTCM", RTCM_Scheme, split_rtcm_frames(build_rtcm_log(num_messages)))]
+    for log_name, scheme_class, frames in logs:
+        for name, lazy in [("eager", False), ("lazy", True)]:
+            scheme = scheme_class(lazy=lazy)
+            counts = {}
+            start = time.perf_counter()
+            for frame in frames:
+                m = scheme.parse_message(frame)
+                if m.valid:
+                    counts[m.msgtype] = counts.get(m.msgtype, 0) + 1
+            elapsed = time.perf_counter() - start
+            print(f"    {log_name + ' ' + name:<30} {len(frames) / elapsed:>12,.0f} msgs/s    ({sum(counts.values())} valid)")
+
+
+#Collector.get_vector for the IMU fields log_final_statistics uses: columns kept as messages arrive,
+#versus building each vector from the stored messages
+def bench_collector_vectors(num_messages):
+    print(f"\nCollector.get_vector on {num_messages} IMU messages:")
+    scheme = RTCM_Scheme(lazy=False)
+    imu_frames = [frame for frame in split_rtcm_frames(build_rtcm_log(num_messages * 2))
+                  if scheme.parse_message(frame).msgtype == b'IMU'][:num_messages]
+    collector = Collector(board=None)
+    messages = [scheme.parse_message(frame) for frame in imu_frames]
+    start = time.perf_counter()
+    for m in messages:
+        collector.add_if_valid(m)
+    store_elapsed = time.perf_counter() - start
+    names = ["accel_x_g", "accel_y_g", "accel_z_g", "angrate_x_dps", "angrate_y_dps", "angrate_z_dps",
+             "fog_angrate_x_dps", "fog_angrate_y_dps", "fog_angrate_z_dps", "imu_time_ms", "delta_t"]
+    start = time.perf_counter()
+    for name in names:
+        np.array([getattr(m, name) for m in collector.messages if hasattr(m, name)])
+    before_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    for name in names:
+        collector.get_vector(name)
+    after_elapsed = time.perf_counter() - start
+    print(f"    {'add_if_valid':<30} {len(messages) / store_elapsed:>12,.0f} msgs/s")
+    print(f"    {len(names)} vectors, before (from messages) {before_elapsed * 1e3:>10,.2f} ms    "
+          f"columns: {after_elapsed * 1e3:>10,.3f} ms")
+
+
+#memory a Collector holds after a run, keeping everything versus a ring buffer of the latest messages
+def bench_collector_retention(num_messages, max_samples=1000):
+    print(f"\nCollector memory after {num_messages} RTCM messages:")
+    scheme = RTCM_Scheme(lazy=False)
+    frames = split_rtcm_frames(build_rtcm_log(num_messages))
+    for name, collector_args in [("keep everything", {}), (f"max_samples={max_samples}", {"max_samples": max_samples})]:
+        tracemalloc.start()
+        collector = Collector(board=None, **collector_args)
+        for frame in frames:
+            collector.add_if_valid(scheme.parse_message(frame))
+        collector.get_vector("imu_time_ms")  # flush pending values
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"    {name:<30} {size / 1e6:>8,.1f} MB    ({collector.statistics.number_valid} valid counted)")
+        del collector
+
+
+#read a whole ascii log with ReadableScheme.read_one_message, which goes through read_until
+def bench_file_reader(num_messages):
+    print(f"\nascii log reading with read_until, {num_messages} messages:")
+    log_file, log_path = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(log_file, 'wb') as f:
+        f.write(build_ascii_log(num_messages))
+    log_size_mb = os.path.getsize(log_path) / 1e6
+    scheme = ReadableScheme(lazy=False)
+    for name, connection_class in [("before (byte at a time)", LegacyFileReaderConnection),
+                                   ("FileReaderConnection", FileReaderConnection),
+                                   ("MappedFileReaderConnection", MappedFileReaderConnection)]:
+        #framing only, then framing and parsing
+        reader = connection_class(log_path)
+        start = time.perf_counter()
+        while reader.read_one_message(start_char=READABLE_START, end_char=READABLE_END):
+            pass
+        read_elapsed = time.perf_counter() - start
+        reader.close()
+
+        reader = connection_class(log_path)
+        start = time.perf_counter()
+        valid = 0
+        while True:
+            m = scheme.read_one_message(reader)
+            if m is None:
+                break
+            valid += m.valid
+        elapsed = time.perf_counter() - start
+        reader.close()
+        print(f"    {name:<30} read only: {log_size_mb / read_elapsed:>8,.1f} MB/s    "
+              f"read and parse: {num_messages / elapsed:>10,.0f} msgs/s    ({valid} valid)")
+    os.remove(log_path)
+
+
+if __name__ == "__main__":
+    argp = argparse.ArgumentParser()
+    argp.add_argument('-n', '--num_messages', type=int, default=200000, help='number of messages in the synthetic log')
+    args = argp.parse_args()
+    random.seed(0)
+    bench_rtcm_payload(args.num_messages)
+    bench_log_arrays(args.num_messages)
+    bench_message_memory(args.num_messages // 10)
+    bench_lazy_decoding(args.num_messages // 4)
+    bench_collector_vectors(args.num_messages // 4)
+    bench_collector_retention(args.num_messages // 4)
+    bench_file_reader(args.num_messages // 10)
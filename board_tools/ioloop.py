@@ -8,9 +8,17 @@ import json
 import subprocess
 import serial
 from multiprocessing import Array, Value, Process, Manager
+import multiprocessing.connection
 import base64
 import socket
 import select
+import selectors
+import collections
+import concurrent.futures
+import errno
+import functools
+import operator
+import math
 
 parent_dir = str(pathlib.Path(__file__).parent)
 sys.path.append(parent_dir+'/src')
@@ -23,70 +31,311 @@ def open_log_file(location, name): #ioloop - goes in that file
     os.makedirs(location, exist_ok=True)
     full_path = os.path.join(location, name)
     try:
+        if LOG_COMPRESSION or LOG_ROTATE_BYTES or LOG_ROTATE_SECONDS:
+            # compressed by the log writer thread as it writes
+            return SegmentedLogFile(full_path, LOG_COMPRESSION, LOG_ROTATE_BYTES, LOG_ROTATE_SECONDS)
         return open(full_path, 'wb')
     except Exception as e:
         print("error trying to open log file: "+location+"/"+name)
         return None
 
 
-def connect_ntrip(num_retries, on, request, ip, port): #ioloop
-    errmsg = "unknown error" # if we get to the end without succeeding or known error type
-    reader = None
-    for i in range(num_retries):
-        debug_print("retry "+str(i))
-        try:
-            debug_print("close_ntrip")
-            close_ntrip(on, reader) #make sure previous connection doesn't interfere
-            debug_print("open socket")
-            reader = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            reader.settimeout(NTRIP_TIMEOUT_SECONDS) #will this prevent connect_ex? maybe set nonzero before, zero after
-            debug_print("connect to ip")
-            debug_print(f"IP:{ip.value.decode()}; port: {port.value}")
-            error = reader.connect_ex((ip.value.decode(), port.value)) #timeout mattters for this
-            if error == 0:  # not an error
-                #reader.settimeout(None) #keep the timeout in case it has an error after connecting
-                debug_print("sending ntrip request:\n"+request.value.decode())
-                reader.sendall(request.value)
-                first_resp = reader.recv(4096) #TODO - can this block logging due to blocking read?
-                debug_print("ntrip response:\n"+first_resp.decode() + "\n")
-                # check the response codes:
-                success = False
-                if first_resp.find(b"SOURCETABLE 200 OK") >= 0:
-                    errmsg = "caster responds with error: wrong mountpoint (sourcetable)" # error message to show when out of retries
-                elif first_resp.find(b"200 OK") >= 0:
-                    debug_print("caster returns success message")
-                    success = True
-                elif first_resp.find(b"404 Not Found") >= 0:
-                    errmsg = "caster responds with error: wrong mountpoint (not found)"
-                elif first_resp.find(b"400 Bad Request") >= 0:
-                    errmsg ="caster responds with error: wrong mountpoint (bad request)"
-                elif first_resp.find(b"401 Unauthorized") >= 0:
-                    errmsg ="caster responds with error: wrong username/password"
-                if success:
-                    on.value = 1
-                    reader.settimeout(0) #back to non-blocking mode, timeout probably not needed when connected.
-                    return reader, "success"
+# NTRIP client states
+NTRIP_IDLE = "idle"
+NTRIP_RESOLVING = "resolving" # looking up the caster address (in a thread: it can take seconds)
+NTRIP_CONNECTING = "connecting" # tcp connect in progress
+NTRIP_HANDSHAKE = "handshake" # request sent, waiting for the caster's response
+NTRIP_STREAMING = "streaming" # caster sends corrections
+NTRIP_BACKOFF = "backoff" # waiting to try again after a failure
+
+# caster responses: error message for each, checked in order. "200 OK" alone is success
+NTRIP_RESPONSE_ERRORS = [(b"SOURCETABLE 200 OK", "caster responds with error: wrong mountpoint (sourcetable)"),
+                         (b"200 OK", None),
+                         (b"404 Not Found", "caster responds with error: wrong mountpoint (not found)"),
+                         (b"400 Bad Request", "caster responds with error: wrong mountpoint (bad request)"),
+                         (b"401 Unauthorized", "caster responds with error: wrong username/password")]
+
+
+# NTRIP connection as a state machine which never blocks, driven by io_loop's selector:
+# idle -> resolving -> connecting -> handshake -> streaming, and backoff after any failure, then connecting again.
+# backoff starts at NTRIP_BACKOFF_START_SECONDS and doubles each failure up to NTRIP_BACKOFF_MAX_SECONDS.
+class NtripClient:
+    def __init__(self):
+        self.state = NTRIP_IDLE
+        self.settings = None # StartNtripCommand
+        self.sock = None
+        self.resolver = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.address = None
+        self.lookup = None # future for the address
+        self.deadline = None # when the current state times out, or backoff ends
+        self.backoff_seconds = NTRIP_BACKOFF_START_SECONDS
+        self.failures = 0 # since the last time it was streaming
+        self.has_streamed = False # since start
+        self.rejected = False # caster answered with an error
+        self.new_connection = False # set when streaming starts, io_loop clears it
+        self.error = ""
+        self.outgoing = b"" # request not sent yet
+        self.response = b""
+
+    def start(self, settings):
+        self.stop()
+        self.settings = settings
+        self.failures = 0
+        self.has_streamed = False
+        self.rejected = False
+        self.backoff_seconds = NTRIP_BACKOFF_START_SECONDS
+        self.address = None
+        self.start_lookup()
+
+    def stop(self):
+        self.close_socket()
+        self.state = NTRIP_IDLE
+        self.deadline = None
+        self.lookup = None
+
+    def close_socket(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def streaming(self):
+        return self.state == NTRIP_STREAMING
+
+    # (fd, selector events) to wait for, or (None, None)
+    def wait_for(self):
+        if self.state == NTRIP_CONNECTING or (self.state == NTRIP_HANDSHAKE and self.outgoing):
+            return self.sock.fileno(), selectors.EVENT_WRITE
+        if self.state in (NTRIP_HANDSHAKE, NTRIP_STREAMING):
+            return self.sock.fileno(), selectors.EVENT_READ
+        return None, None
+
+    # seconds until handle needs to run without any socket event, None if only on socket events
+    def wait_seconds(self):
+        if self.state == NTRIP_RESOLVING:
+            return NTRIP_RESOLVE_POLL_SECONDS
+        if self.deadline is None:
+            return None
+        return max(0, self.deadline - time.time())
+
+    def fail(self, error):
+        debug_print("ntrip failed: "+error)
+        self.close_socket()
+        self.error = error
+        self.failures += 1
+        self.state = NTRIP_BACKOFF
+        self.deadline = time.time() + self.backoff_seconds
+        self.backoff_seconds = min(self.backoff_seconds * 2, NTRIP_BACKOFF_MAX_SECONDS)
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setblocking(False)
+        error = self.sock.connect_ex(self.address)
+        if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, "WSAEWOULDBLOCK", errno.EWOULDBLOCK)):
+            self.fail("could not reach caster: "+os.strerror(error))
+            return
+        self.state = NTRIP_CONNECTING
+        self.deadline = time.time() + NTRIP_TIMEOUT_SECONDS
+
+    # do whatever the state needs. ready: this client's socket was ready for the events from wait_for.
+    # returns caster data received, b"" if none.
+    def handle(self, ready):
+        now = time.time()
+        if self.state == NTRIP_RESOLVING:
+            if not self.lookup.done():
+                return b""
+            try:
+                self.address = self.lookup.result()[0][4]
+            except Exception as e:
+                debug_print(str(type(e))+": "+str(e))
+                self.fail("could not reach caster")
+                return b""
+            self.connect()
+        elif self.state == NTRIP_BACKOFF:
+            if now >= self.deadline:
+                if self.address is None: # lookup failed: try it again
+                    self.start_lookup()
                 else:
-                    continue # wrong response - retry
-            else:
-                errmsg = str(error)
-                continue # error code: retry
-        except Exception as e:
-            # other errors are usually from wrong caster or not internet connected.
-            # TODO - recognize more errors like 10065 when no internet, 11001 for wrong caster? but might depend on OS.
-            debug_print(str(type(e))+": "+str(e))
-            errmsg = str("could not reach caster")
-            continue # exception: retry
-    #out of retries: connection failed
-    close_ntrip(on, reader)
-    debug_print("connect_ntrip failed: "+errmsg)
-    return None, errmsg
-
+                    self.connect()
+        elif self.state in (NTRIP_CONNECTING, NTRIP_HANDSHAKE) and not ready and now >= self.deadline:
+            self.fail("could not reach caster: timed out" if self.state == NTRIP_CONNECTING else "caster did not respond")
+        elif self.state == NTRIP_CONNECTING and ready:
+            error = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error:
+                self.fail("could not reach caster: "+os.strerror(error))
+                return b""
+            debug_print("sending ntrip request:\n"+self.settings.request.decode())
+            self.outgoing = self.settings.request
+            self.response = b""
+            self.state = NTRIP_HANDSHAKE
+            self.deadline = now + NTRIP_TIMEOUT_SECONDS
+        elif self.state == NTRIP_HANDSHAKE and ready:
+            try:
+                if self.outgoing:
+                    self.outgoing = self.outgoing[self.sock.send(self.outgoing):]
+                    return b""
+                data = self.sock.recv(NTRIP_READ_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return b""
+            except OSError as e:
+                self.fail("could not reach caster: "+str(e))
+                return b""
+            if not data:
+                self.fail(self.response_error() or "caster closed the connection")
+                return b""
+            self.response += data
+            return self.check_response()
+        elif self.state == NTRIP_STREAMING and ready:
+            try:
+                data = self.sock.recv(NTRIP_READ_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return b""
+            except OSError as e:
+                data = b""
+            if not data: # empty read means disconnected
+                debug_print("ntrip disconnected")
+                self.failures = 0
+                self.fail("caster disconnected")
+                return b""
+            return data
+        return b""
+
+    def start_lookup(self):
+        self.lookup = self.resolver.submit(socket.getaddrinfo, self.settings.ip, self.settings.port, socket.AF_INET,
+                                           socket.SOCK_STREAM)
+        self.state = NTRIP_RESOLVING
+        self.deadline = None
+
+    # error message for a response with an error code, None if it has none (yet)
+    def response_error(self):
+        for code, error in NTRIP_RESPONSE_ERRORS:
+            if self.response.find(code) >= 0:
+                return error
+        return None
 
-def close_ntrip(on, reader): #ioloop - only used by connect_ntrip currently
-    if reader:
-        reader.close()
-    on.value = 0
+    # once the response header is complete: streaming, or fail with its error. returns data after the header
+    def check_response(self):
+        header_end = self.response.find(b"\r\n\r\n")
+        if header_end >= 0:
+            header_end += 4
+        elif self.response.startswith(b"ICY") and self.response.find(b"\r\n") >= 0:
+            header_end = self.response.find(b"\r\n") + 2 # ntrip 1 casters can send data right after the status line
+        else:
+            return b""
+        header, data = self.response[:header_end], self.response[header_end:]
+        debug_print("ntrip response:\n"+header.decode(errors="replace"))
+        for code, error in NTRIP_RESPONSE_ERRORS:
+            if header.find(code) >= 0:
+                break
+        else:
+            error = "unexpected caster response"
+        if error:
+            self.rejected = True # retrying won't help unless the settings change
+            self.fail(error)
+            return b""
+        debug_print("caster returns success message")
+        self.state = NTRIP_STREAMING
+        self.deadline = None
+        self.failures = 0
+        self.has_streamed = True
+        self.new_connection = True
+        self.backoff_seconds = NTRIP_BACKOFF_START_SECONDS
+        self.response = b""
+        return data
+
+    # start failed: the caster rejected the request, or out of tries before it ever connected
+    def gave_up(self):
+        return not self.has_streamed and (self.rejected or self.failures >= CONNECT_RETRIES)
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+
+
+# RTCM message number: first 12 bits of the message data
+def rtcm_message_number(frame):
+    return (frame[3] << 4) | (frame[4] >> 4)
+
+
+# MSM observation messages: 1071-1077 (GPS), 1081-1087 (GLONASS), ... 1131-1137
+def is_msm(number):
+    return 1071 <= number <= 1137 and 1 <= number % 10 <= 7
+
+
+# MSM epoch time: 30 bits after the 12 bit message number and 12 bit station id
+def msm_epoch(frame):
+    return (int.from_bytes(frame[6:10], "big") >> 2) & 0x3FFFFFFF
+
+
+# bytes per second the unit can take corrections at: NTRIP_MAX_BYTES_PER_SECOND, less on a slow serial link
+def ntrip_forward_rate(data_connection):
+    rate = NTRIP_MAX_BYTES_PER_SECOND
+    if isinstance(data_connection, SerialConnection):
+        rate = min(rate, data_connection.get_baud() / 10 * NTRIP_SERIAL_LINK_SHARE) # 10 bits per byte
+    return rate
+
+
+# paces caster data to the unit as whole RTCM3 messages.
+# the caster stream is framed (checked by crc) and queued. a token bucket refills at rate bytes per second up to
+# NTRIP_BUCKET_SECONDS of data, and messages go out while there are enough tokens, packed into writes of up to
+# NTRIP_MAX_BYTES_PER_WRITE. when the link can't keep up, the newest observations are kept: a new copy of a message
+# replaces an older queued one (for MSM observations: one from an older epoch), and anything queued longer than
+# NTRIP_MAX_QUEUE_SECONDS is dropped.
+class NtripForwarder:
+    def __init__(self, rate):
+        self.rate = rate
+        self.bucket_size = max(rate * NTRIP_BUCKET_SECONDS, NTRIP_MAX_BYTES_PER_WRITE)
+        self.tokens = self.bucket_size
+        self.token_time = time.time()
+        self.framer = StreamFramer()
+        self.framer.set_protocols([FRAME_RTCM])
+        self.queue = collections.deque() # (message number, msm epoch or None, frame, arrival time)
+        self.received_frames = 0
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.replaced_frames = 0 # dropped for a newer copy
+        self.expired_frames = 0 # dropped for waiting too long
+
+    # caster data: queue each whole message in it
+    def add(self, data):
+        now = time.time()
+        for protocol, frame in self.framer.feed(data):
+            frame = bytes(frame)
+            number = rtcm_message_number(frame)
+            epoch = msm_epoch(frame) if is_msm(number) else None
+            self.received_frames += 1
+            # MSM for one epoch can be split over messages with the same number: only replace older epochs
+            stale = [entry for entry in self.queue if entry[0] == number and (epoch is None or entry[1] != epoch)]
+            for entry in stale:
+                self.queue.remove(entry)
+            self.replaced_frames += len(stale)
+            self.queue.append((number, epoch, frame, now))
+        while self.queue and now - self.queue[0][3] > NTRIP_MAX_QUEUE_SECONDS:
+            self.queue.popleft()
+            self.expired_frames += 1
+
+    def refill(self, now):
+        self.tokens = min(self.bucket_size, self.tokens + (now - self.token_time) * self.rate)
+        self.token_time = now
+
+    # write the queued messages the tokens allow, using write(data)
+    def send(self, write):
+        self.refill(time.time())
+        while self.queue and len(self.queue[0][2]) <= self.tokens:
+            frames = []
+            length = 0
+            while self.queue and length + len(self.queue[0][2]) <= min(self.tokens, NTRIP_MAX_BYTES_PER_WRITE):
+                frame = self.queue.popleft()[2]
+                frames.append(frame)
+                length += len(frame)
+            write(b"".join(frames))
+            self.tokens -= length
+            self.sent_frames += len(frames)
+            self.sent_bytes += length
+
+    # how long until the next queued message can be sent, None if nothing is queued
+    def wait_seconds(self):
+        if not self.queue:
+            return None
+        return max(0, (len(self.queue[0][2]) - self.tokens) / self.rate)
 
 
 # read gps message, return bytes to send as GGA message
@@ -106,55 +355,295 @@ def close_ntrip(on, reader): #ioloop - only used by connect_ntrip currently
 #     ("diffAge", float),		leave blank
 #     ("diffStation", float)]	leave blank
 
+# GGA quality from carrier solution status: none -> 1 (gps fix), float -> 5, fix -> 4
+GGA_FIX_TYPES = {0: b'1', 1: b'5', 2: b'4'}
+METERS_PER_DEGREE = 111320 # of latitude, or of longitude at the equator
+
+
+# builds GGA messages with integer formatting, and the HHMMSS part cached per second
+class GgaBuilder:
+    def __init__(self):
+        self.utc_second = None
+        self.utc_hhmmss = b""
+
+    def build(self, gps_message):
+        # dummy with correct format:
+        #return b'$GNGGA,024416.00,3723.94891,N,12158.75467,W,1,12,1.09,3.9,M,-29.9,M,,*7B\r\n'
+        if not gps_message or not gps_message.valid:
+            # TODO - give an error here? can't make gga without the GPS message
+            raise ValueError
+        #time: HHMMSS.SS. subtract 18 leap seconds to go from GPS to UTC
+        utc_centiseconds = round(gps_message.gps_time_ns * 1e-7) - 1800
+        utc_second, centiseconds = divmod(utc_centiseconds, 100)
+        if utc_second != self.utc_second:
+            self.utc_second = utc_second
+            self.utc_hhmmss = time.strftime("%H%M%S", time.gmtime(utc_second)).encode()
+
+        lat_float = gps_message.lat_deg
+        lon_float = gps_message.lon_deg
+        if gps_message.num_sats >= 4:
+            fixtype = GGA_FIX_TYPES.get(gps_message.carrier_solution_status, b'1') #lookup with default = 1
+        else:
+            fixtype = b'0'
+        # lat DDMM.MMMMM, lon DDDMM.MMMMM. HDOP is PDOP: not the same but should be close.
+        # sep (geoid separation), diffAge and diffStation are left empty
+        payload = b'GNGGA,%s.%02d,%s,%s,%s,%s,%s,%02d,%.2f,%.2f,M,,M,,' % (
+            self.utc_hhmmss, centiseconds,
+            degrees_minutes(lat_float, 2), b'N' if lat_float > 0 else b'S',
+            degrees_minutes(lon_float, 3), b'E' if lon_float > 0 else b'W',
+            fixtype, gps_message.num_sats, gps_message.PDOP, gps_message.alt_msl_m)
+        checksum = functools.reduce(operator.xor, payload, 0)
+        return b'$%s*%02X\r\n' % (payload, checksum)
+
+
+# abs(degrees) as DDMM.MMMMM (or DDDMM.MMMMM), rounded to the last minutes digit
+def degrees_minutes(degrees, degree_digits):
+    minutes_e5 = round(abs(degrees) * 6000000)
+    whole_degrees, minutes_e5 = divmod(minutes_e5, 6000000)
+    return b'%0*d%02d.%05d' % (degree_digits, whole_degrees, minutes_e5 // 100000, minutes_e5 % 100000)
+
+
+gga_builder = GgaBuilder()
+
+
+# read gps message, return bytes to send as GGA message
 def build_gga(gps_message): #ioloop
-    # dummy with correct format:
-    #return b'$GNGGA,024416.00,3723.94891,N,12158.75467,W,1,12,1.09,3.9,M,-29.9,M,,*7B\r\n'
-    if not gps_message or not gps_message.valid:
-        # TODO - give an error here? can't make gga without the GPS message
-        raise ValueError
-    #time: HHMMSS.SS
-    utc_time_s = (gps_message.gps_time_ns * 1e-9) - 18.0 #subtract 18 leap seconds to go from GPS to UTC
-    utc_time = time.strftime("%H%M%S", time.gmtime(utc_time_s)).encode()
-    frac_second_str = f"{utc_time_s % 1:.2f}"[1:].encode() #fractional part starting from decimal point, like ".25"
-    utc_time = utc_time + frac_second_str
-
-    # lat: format to DDMM.MMMMM
-    lat_float = gps_message.lat_deg
-    NS = b'N' if lat_float > 0 else b'S'
-    lat_deg = "{:0>2d}".format(abs(int(lat_float)))
-    lat_min = "{:08.5f}".format(60 * abs(lat_float - int(lat_float)))
-    lat = (lat_deg+lat_min).encode()
-
-    # lon: format to DDDMM.MMMMM
-    lon_float = gps_message.lon_deg
-    EW = b'E' if lon_float > 0 else b'W'
-    lon_deg = "{:0>3d}".format(abs(int(lon_float)))
-    lon_min = "{:08.5f}".format(60 * abs(lon_float - int(lon_float)))
-    lon = (lon_deg+lon_min).encode()
-
-    carr_soln_conversion = {0: b'1', 1: b'5', 2: b'4'}
-    if gps_message.num_sats >= 4:
-        fixtype = carr_soln_conversion.get(gps_message.carrier_solution_status, b'1') #lookup with default = 1
-    else:
-        fixtype = b'0'
-
-
-    numsv = "{:0>2d}".format(gps_message.num_sats).encode() # numSV: send to 2 digits
-    HDOP = "{:.2f}".format(gps_message.PDOP).encode() #not the same but should be close.
-    alt_msl = "{:.2f}".format(gps_message.alt_msl_m).encode()  #2 decimal places.
-
-    altUnit = b'M'
-    sep = b'' # TODO - should this be alt_msl - alt_ellipsoid_m , opposite of that, or something else?
-    sepunit = b'M'
-    diffAge = b'' #example didn't have
-    diffStation = b''
-    # build payload. later - could assemble a Message() with the GGA fields and use ReadableScheme to build payload?
-    payload = b'GNGGA,'+utc_time+b','+lat+b','+NS+b','+lon+b','+EW+b','+fixtype+b','+numsv+b','+HDOP+b','+alt_msl+b','+\
-        altUnit+b','+sep+b','+sepunit+b','+diffAge+b','+diffStation
-    checksum = int_to_ascii(ReadableScheme().compute_checksum(payload))
-    gga_data = b'$'+payload+b'*'+checksum+b'\r\n'
-    #debug_print(gga_data)
-    return gga_data
+    return gga_builder.build(gps_message)
+
+
+# decides when to send GGA to the caster: the first one after connecting, then once the interval has passed
+# or the unit moved move_meters from the last one sent. casters only need a rough position now and then.
+class GgaScheduler:
+    def __init__(self, interval_seconds=NTRIP_GGA_INTERVAL_SECONDS, move_meters=NTRIP_GGA_MOVE_METERS):
+        self.interval_seconds = interval_seconds
+        self.move_meters = move_meters
+        self.reset()
+
+    # next GPS message sends right away, like after connecting
+    def reset(self):
+        self.last_time = None
+        self.last_lat = None
+        self.last_lon = None
+
+    def due(self, gps_message, now):
+        if self.last_time is None or now - self.last_time >= self.interval_seconds:
+            return True
+        if self.move_meters is None:
+            return False
+        # flat earth distance is close enough at this scale
+        north = (gps_message.lat_deg - self.last_lat) * METERS_PER_DEGREE
+        east = (gps_message.lon_deg - self.last_lon) * METERS_PER_DEGREE * math.cos(math.radians(self.last_lat))
+        return north * north + east * east >= self.move_meters * self.move_meters
+
+    def sent(self, gps_message, now):
+        self.last_time = now
+        self.last_lat = gps_message.lat_deg
+        self.last_lon = gps_message.lon_deg
+
+
+# opens the data connection a ConnectCommand asks for. baud: instead of the command's one
+def open_data_connection(command, baud=None): #ioloop
+    if command.con_type == "COM":
+        debug_print("io_loop connect COM")
+        return ThreadedSerialConnection(command.com_port, baud or command.com_baud) # reads the port from its own thread
+    elif command.con_type == "UDP":
+        debug_print("io_loop connect UDP")
+        return UDPConnection(command.udp_ip, UDP_LOCAL_DATA_PORT, command.udp_port)
+    return None
+
+
+# reopens the data connection after it was lost, like a USB serial port going away in a vehicle brownout.
+# tries again after a backoff which starts at DATA_RECONNECT_BACKOFF_START_SECONDS and doubles up to
+# DATA_RECONNECT_BACKOFF_MAX_SECONDS, until it works or the user disconnects.
+# serial ports reopen at the baud they had. if nothing read there frames as a valid message, it tries the other
+# ALLOWED_BAUD rates like auto_detect_baud does, but on the data port: the control port belongs to the user program.
+class DataReconnector:
+    def __init__(self):
+        self.keep(None)
+
+    # keep the connection of this ConnectCommand up. None: stop reconnecting
+    def keep(self, command):
+        self.command = command
+        self.baud = command.com_baud if command else None
+        self.lost_time = None # set while reconnecting
+        self.deadline = None
+        self.backoff_seconds = DATA_RECONNECT_BACKOFF_START_SECONDS
+        self.attempts = 0 # during the current outage
+        self.reconnects = 0
+        self.downtime_seconds = 0 # of past outages
+        self.gap = None # (lost, reconnected) times of the last outage
+        self.error = ""
+        self.unframed_bytes = None # read at this baud without a valid message since reconnecting. None: baud is fine
+        self.untried_bauds = []
+
+    def reconnecting(self):
+        return self.lost_time is not None
+
+    def lost(self, error):
+        if self.command is None:
+            return
+        self.lost_time = time.time()
+        self.error = error
+        self.attempts = 0
+        self.backoff_seconds = DATA_RECONNECT_BACKOFF_START_SECONDS
+        self.deadline = self.lost_time + self.backoff_seconds
+        self.unframed_bytes = None
+
+    # seconds until the next try, None if not reconnecting
+    def wait_seconds(self):
+        if not self.reconnecting():
+            return None
+        return max(0, self.deadline - time.time())
+
+    # try to reopen the connection if the backoff is over. returns the new connection, or None
+    def try_reconnect(self):
+        if not self.reconnecting() or time.time() < self.deadline:
+            return None
+        self.attempts += 1
+        try:
+            connection = open_data_connection(self.command, self.baud)
+        except Exception as e:
+            debug_print("reconnect failed: "+str(type(e))+": "+str(e))
+            self.error = str(e)
+            self.deadline = time.time() + self.backoff_seconds
+            self.backoff_seconds = min(self.backoff_seconds * 2, DATA_RECONNECT_BACKOFF_MAX_SECONDS)
+            return None
+        now = time.time()
+        self.gap = (self.lost_time, now)
+        self.downtime_seconds += now - self.lost_time
+        self.reconnects += 1
+        self.lost_time = None
+        if self.command.con_type == "COM":
+            self.unframed_bytes = 0
+            self.untried_bauds = [baud for baud in ALLOWED_BAUD if baud != self.baud] + [self.baud]
+        return connection
+
+    # after reconnecting on serial: data was read with this many valid messages in it.
+    # returns the next baud to try when the current one only reads garbage, None to stay.
+    def check_baud(self, length, valid_messages):
+        if self.unframed_bytes is None:
+            return None
+        if valid_messages or not self.untried_bauds: # found the baud, or tried them all and back at the first
+            self.unframed_bytes = None
+            return None
+        self.unframed_bytes += length
+        if self.unframed_bytes < DATA_RECONNECT_BAUD_CHECK_BYTES:
+            return None
+        self.baud = self.untried_bauds.pop(0)
+        self.unframed_bytes = 0
+        return self.baud
+
+    # ascii GAP message to put in the log where the data stopped and started again
+    def gap_marker(self, ascii_scheme):
+        gap_message = Message({"msgtype": b'GAP', "lost_time_s": self.gap[0], "reconnect_time_s": self.gap[1],
+                               "reconnects": self.reconnects})
+        return READABLE_START + ascii_scheme.build_message_general(gap_message) + READABLE_END
+
+    def stats(self):
+        outage_seconds = time.time() - self.lost_time if self.reconnecting() else 0
+        return {"reconnecting": self.reconnecting(),
+                "outage_seconds": outage_seconds,
+                "attempts": self.attempts,
+                "reconnects": self.reconnects,
+                "downtime_seconds": self.downtime_seconds + outage_seconds,
+                "error": self.error}
+
+
+# commands from the user program to io_loop. io_loop answers each one with an IOResponse.
+class ConnectCommand:
+    def __init__(self, con_type, com_port=None, com_baud=None, udp_ip=None, udp_port=None):
+        self.con_type = con_type  # "COM" or "UDP"
+        self.com_port, self.com_baud = com_port, com_baud
+        self.udp_ip, self.udp_port = udp_ip, udp_port
+
+
+class DisconnectCommand:
+    pass
+
+
+class StartLogCommand:
+    def __init__(self, log_name):
+        self.log_name = log_name
+
+
+class StopLogCommand:
+    pass
+
+
+# response data is the log writer's stats, None if not logging
+class LogStatusCommand:
+    pass
+
+
+# response data is the data connection's reconnect stats and its own stats (as "connection"), None if not connected
+class ConnectionStatusCommand:
+    pass
+
+
+class StartNtripCommand:
+    def __init__(self, ip, port, request, gga):
+        self.ip, self.port, self.request, self.gga = ip, port, request, gga
+
+
+class StopNtripCommand:
+    pass
+
+
+class ExitCommand:
+    pass
+
+
+class IOResponse:
+    def __init__(self, success=True, message="", data=None):
+        self.success = success
+        self.message = message
+        self.data = data
+
+    def __repr__(self):
+        return "IOResponse: "+str(self.__dict__)
+
+
+# command and response channel between the user program and io_loop.
+# a socket pair so io_loop can wait on it with select on Windows too, and it can be passed to the io_loop Process.
+class IOChannel:
+    def __init__(self):
+        user_end, io_end = socket.socketpair()
+        self.user_end = multiprocessing.connection.Connection(user_end.detach())
+        self.io_end = multiprocessing.connection.Connection(io_end.detach())
+
+    # user program side: send a command and wait until io_loop has done it
+    def send(self, command):
+        self.user_end.send(command)
+        return self.user_end.recv()
+
+    # io_loop side: all commands waiting, in the order they were sent. respond to each one before the next.
+    def commands(self):
+        while self.io_end.poll():
+            yield self.io_end.recv()
+
+    def respond(self, response):
+        self.io_end.send(response)
+
+    def fileno(self):
+        return self.io_end.fileno()
+
+
+# keep one selector entry per name pointed at the given file descriptor (None for no entry).
+# registered by fd number and re-registered when the connection object changes, since a closed fd can be reused.
+def watch(selector, watched, name, owner, fd, events=selectors.EVENT_READ):
+    if watched.get(name, (None, None, None)) == (owner, fd, events):
+        return
+    if name in watched:
+        selector.unregister(watched.pop(name)[1])
+    if fd is not None:
+        selector.register(fd, events, name)
+        watched[name] = (owner, fd, events)
+
+
+# whether the last wait found data for this entry, and it's still the same connection
+def is_ready(ready, watched, name, owner):
+    return name in ready and watched.get(name, (None,))[0] is owner
+
 
 #put into logs folder with sub-directory by date, eg: logs/Monday_5_24_2021
 def log_path():
@@ -166,173 +655,186 @@ def log_path():
     day_dir = str(ltime.tm_mday)
     return os.path.join("..", "logs", month_dir, day_dir)
 
-def io_loop(exitflag, con_on, con_start, con_stop, con_succeed,
-            con_type, com_port, com_baud, udp_ip, udp_port, gps_received,
-            log_on, log_start, log_stop, log_name,
-            ntrip_on, ntrip_start, ntrip_stop, ntrip_succeed,
-            ntrip_ip, ntrip_port, ntrip_gga, ntrip_req,
-            last_ins_msg, last_gps_msg, last_gp2_msg, last_imu_msg, last_hdg_msg,
-            last_imu_time,
-            shared_serial_number
+# con_on, log_on, ntrip_on, gps_received and data_format show io_loop's state to the user program: only io_loop sets them.
+def io_loop(con_on, gps_received, log_on, ntrip_on, data_format,
+            latest_state,
+            shared_serial_number,
+            io_channel
     ):
 
     data_connection = None
-    ntrip_reader = None
-    ntrip_retrying = False
-    ntrip_stop_time = 0
-    log_file = None
-    flush_counter=0
+    data_reconnector = DataReconnector() # reopens the data connection if it's lost
+    ntrip_client = NtripClient() # connects and reconnects without blocking
+    ntrip_start_pending = False # StartNtripCommand gets its response once connected or failed
+    gga_scheduler = GgaScheduler() # GGA to the caster on connect, then by time or movement
+    log_writer = None # writes the log file from its own thread
     #last_valid_gps = None
     ascii_scheme = ReadableScheme()
-    binary_scheme = Binary_Scheme()
-    rtcm_scheme = RTCM_Scheme()
+    binary_scheme = Binary_Scheme(checked_frames=True)  # framer checks binary and rtcm checksums
+    rtcm_scheme = RTCM_Scheme(checked_frames=True)
     serialnum = ""
 
-    last_ntrip_read_window_time = time.time()
-    ntrip_bytes_count = 0
+    ntrip_forwarder = None # queues and paces the caster data while ntrip is connected
 
-    buffered_partial_message = b''
+    framer = StreamFramer()
+    parse_schemes = {FRAME_ASCII: ascii_scheme, FRAME_RTCM: rtcm_scheme, FRAME_BINARY: binary_scheme}
+    sniffer = FormatSniffer(framer) # once the output format is clear, only search for that one
+    shown_format = None
+    data_format.value = b""
+
+    # wait for data connection, ntrip or commands instead of polling
+    selector = selectors.DefaultSelector()
+    watched = {}
+    selector.register(io_channel.fileno(), selectors.EVENT_READ, "commands")
 
     while True:
-        time.sleep(1e-3) #slow down loop to reduce cpu use, 1 ms wait should be fine
+        # only wait on the data and ntrip sockets when they would be read, or the wait would return right away
+        data_fd = data_connection.fileno() if (con_on.value and data_connection) else None
+        watch(selector, watched, "data", data_connection, data_fd)
+        ntrip_fd, ntrip_events = ntrip_client.wait_for()
+        watch(selector, watched, "ntrip", ntrip_client.sock, ntrip_fd, ntrip_events)
+        ntrip_active = ntrip_client.streaming() and con_on.value and data_connection
+
+        # wait with no timeout unless something is due
+        waits = []
+        if con_on.value and data_connection and data_fd is None:
+            waits.append(IO_POLL_SECONDS)
+        if data_reconnector.wait_seconds() is not None: # next data connection reopen try
+            waits.append(data_reconnector.wait_seconds())
+        if ntrip_client.wait_seconds() is not None: # connect timeout, end of backoff, or address lookup
+            waits.append(ntrip_client.wait_seconds())
+        if ntrip_active and ntrip_forwarder.queue: # corrections waiting for tokens
+            waits.append(ntrip_forwarder.wait_seconds())
+        ready = {key.data for key, events in selector.select(min(waits) if waits else None)}
 
         serialnum = shared_serial_number.value.decode()
-        #first handle all start/stop signals.
-        if con_stop.value: #TODO - currently not using this since I release before new connection anyway
-            debug_print("io_loop con stop")
-            if data_connection:
-                data_connection.close()
-                data_connection = None
-            con_stop.value = 0
-        elif log_stop.value:
-            debug_print("io_loop log stop")
-            if log_file:
-                log_file.close()
-                log_file = None
-            log_stop.value = 0
-        elif ntrip_stop.value:
-            debug_print("io_loop ntrip stop")
-            if ntrip_reader:
-                ntrip_reader.close()
-                ntrip_reader=None
-            ntrip_stop.value = 0
-        # handle exit after stops just in case.
-        elif exitflag.value:
-            # exit should release everything in case not released
-            if data_connection:
-                data_connection.close()
-            if ntrip_reader:
-                ntrip_reader.close()
-            if log_file:
-                log_file.close()
-            exit()
-        elif con_start.value:
-            con_start.value = 0
-            try:
-                # release existing connection:
+        #first handle all commands which were sent, in order.
+        commands = io_channel.commands() if "commands" in ready else []
+        for command in commands:
+            response = IOResponse()
+            if isinstance(command, DisconnectCommand):
+                debug_print("io_loop con stop")
+                data_reconnector.keep(None)
                 if data_connection:
                     data_connection.close()
-                debug_print("io_loop con start")
-                if con_type.value == b"COM":
-                    debug_print("io_loop connect COM")
-                    data_connection = SerialConnection(com_port.value.decode(), com_baud.value)
-                elif con_type.value == b"UDP":
-                    debug_print("io_loop connect UDP")
-                    data_connection = UDPConnection(udp_ip.value.decode(), UDP_LOCAL_DATA_PORT, udp_port.value)
-                con_succeed.value = 1 # success
-            except Exception as e:
-                debug_print(str(type(e))+": "+str(e))
-                con_succeed.value = 2  # fail
+                    data_connection = None
+                con_on.value = 0
+            elif isinstance(command, StopLogCommand):
+                debug_print("io_loop log stop")
+                if log_writer:
+                    log_writer.close()
+                    log_writer = None
+                log_on.value = 0
+            elif isinstance(command, StopNtripCommand):
+                debug_print("io_loop ntrip stop")
+                ntrip_client.stop()
+                ntrip_forwarder = None
+                ntrip_on.value = 0
+            elif isinstance(command, ExitCommand):
+                # exit should release everything in case not released
                 if data_connection:
                     data_connection.close()
-        elif log_start.value:
-            debug_print("io_loop log start")
-            log_file = open_log_file(log_path(), log_name.value.decode())
-            log_start.value = 0
-        elif ntrip_start.value:
-            debug_print("io_loop ntrip start")
-            ntrip_reader, ntrip_connect_result = connect_ntrip(CONNECT_RETRIES, ntrip_on, ntrip_req, ntrip_ip, ntrip_port)
-            #print(ntrip_connect_result) #this will show when user connects.
-            if ntrip_reader: # signal success to ntrip_start in user thread
-                ntrip_succeed.value = 1
-            else: # failed
-                print("ntrip connect failed: "+ntrip_connect_result)
-                ntrip_succeed.value = 2
-            ntrip_start.value = 0
-
-        #debug_print("ioloop doing work: ntrip_on = "+str(ntrip_on.value)+", ntrip_reader = "+str(ntrip_reader))
-        if ntrip_retrying:
-            # reconnect after a delay, but keep logging and everything else until then
-            if time.time() - ntrip_stop_time >= NTRIP_RETRY_SECONDS:
-                ntrip_stop_time = time.time()
-                ntrip_reader, ntrip_connect_result = connect_ntrip(1, ntrip_on, ntrip_req, ntrip_ip, ntrip_port)
-                if ntrip_reader:
-                    ntrip_retrying = False
-                    debug_print("ntrip reconnected")
-                else:
-                    debug_print("ntrip reconnect failed")
-
-        if ntrip_on.value and con_on.value and data_connection and ntrip_reader and ntrip_reader.fileno() >= 0:
-            try:
-                # read and send the NTRIP data as fast as possible, without altering or parsing
-                # but limit the total data to 10,000 bytes in 1 second window.
-
-                # every 1 second , set NTRIP read counter to 0 and reset the timer
-                current_time = time.time()
-                time_since_last_read_window = current_time - last_ntrip_read_window_time
-                #debug_print(f"time since last read window: {time_since_last_read_window}")
-                if time_since_last_read_window >= NTRIP_READ_INTERVAL_SECONDS:
-                    last_ntrip_read_window_time = current_time
-                    debug_print(f"ntrip read interval of {time_since_last_read_window :.2f} seconds had {ntrip_bytes_count} bytes")
-                    ntrip_bytes_count = 0
-
-                # read NTRIP data if there is any (select.select check)
-                # don't read if we already exceeded the allowed bytes in 1 second -> wait for next cycle
-                # this select can raise ValueError when ntrip turns off, but fileno() >=0 check should prevent it.
-                reads, writes, errors = select.select([ntrip_reader], [], [], 0)
-                if ntrip_reader in reads and (ntrip_bytes_count <= NTRIP_MAX_BYTES_PER_INTERVAL):
-                    # use max bytes per interval as the max read size too. so if more than that much data arrives at once, send none.
-                    ntrip_data = ntrip_reader.recv(NTRIP_MAX_BYTES_PER_INTERVAL+1) # TODO can this block logging? hopefully not at timeout 0.
-                    read_length = len(ntrip_data)
-                    ntrip_bytes_count += read_length
-
-                    if not ntrip_data:
-                        #empty read means disconnected: go to the catch
-                        raise ConnectionResetError
-
-                    # if read reaches the max size, discard it to avoid flooding ublox. then discard all available data.
-                    if ntrip_bytes_count <= NTRIP_MAX_BYTES_PER_INTERVAL:
-                        # send all the data in 1024 byte chunks
-                        debug_print("writing ntrip data (len "+str(read_length)+"):")
-                        for i in range(0, read_length, NTRIP_MAX_BYTES_PER_WRITE):
-                            if i + NTRIP_MAX_BYTES_PER_WRITE > read_length:
-                                debug_print(f"writing {read_length - i} bytes")
-                                data_connection.write(ntrip_data[i:read_length])
-                            else:
-                                debug_print(f"writing {NTRIP_MAX_BYTES_PER_WRITE} bytes")
-                                data_connection.write(ntrip_data[i:i+NTRIP_MAX_BYTES_PER_WRITE])
-
-                        debug_print("")
-
-                    else:
-                        debug_print(f"\nNTRIP hit limit of {NTRIP_MAX_BYTES_PER_INTERVAL} bytes in {NTRIP_READ_INTERVAL_SECONDS} seconds")
-                        debug_print("clearing all NTRIP data with repeated read until empty")
-                        last_data = ntrip_data
-                        while len(last_data) > 0:
-                            try:
-                                last_data = ntrip_reader.recv(NTRIP_MAX_BYTES_PER_INTERVAL)
-                                print(f"clearing NTRIP: read length = {len(last_data)}")
-                                # TODO limit iterations to avoid infinite loop? should terminate since timeout is 0.
-                            except Exception as e:  # BlockingIOError for read when not read -> should be clear.
-                                break
-            except ConnectionResetError:
-                debug_print("ntrip disconnected")
+                ntrip_client.stop()
+                if log_writer:
+                    log_writer.close()
+                io_channel.respond(response)
+                exit()
+            elif isinstance(command, ConnectCommand):
+                try:
+                    # release existing connection:
+                    con_on.value = 0
+                    data_reconnector.keep(None)
+                    if data_connection:
+                        data_connection.close()
+                        data_connection = None
+                    framer.reset() # don't join old partial data onto the new connection's data
+                    sniffer.reset()
+                    shown_format = None
+                    data_format.value = b""
+                    gps_received.value = 0 # need to see gps message again after each connect
+                    debug_print("io_loop con start")
+                    data_connection = open_data_connection(command)
+                    data_reconnector.keep(command) # reopen it if it's lost
+                    con_on.value = 1 # success
+                except Exception as e:
+                    debug_print(str(type(e))+": "+str(e))
+                    response = IOResponse(False, str(e))  # fail
+                    if data_connection:
+                        data_connection.close()
+                        data_connection = None
+            elif isinstance(command, StartLogCommand):
+                debug_print("io_loop log start")
+                if log_writer:
+                    log_writer.close()
+                    log_writer = None
+                log_file = open_log_file(log_path(), command.log_name)
+                if log_file:
+                    log_writer = LogWriter(log_file, fsync_bytes=LOG_FSYNC_BYTES, fsync_seconds=LOG_FSYNC_SECONDS)
+                log_on.value = 1 if log_writer else 0
+                response = IOResponse(bool(log_writer))
+            elif isinstance(command, LogStatusCommand):
+                response = IOResponse(bool(log_writer), data=log_writer.stats() if log_writer else None)
+            elif isinstance(command, ConnectionStatusCommand):
+                connected = data_reconnector.command is not None
+                response = IOResponse(connected, data=data_reconnector.stats() if connected else None)
+                if connected: # with the connection's own counters, like UDP drops
+                    response.data["connection"] = data_connection.stats() if data_connection else None
+            elif isinstance(command, StartNtripCommand):
+                debug_print("io_loop ntrip start")
                 ntrip_on.value = 0
-                ntrip_retrying = True
-                ntrip_stop_time = time.time()
-
-            except Exception as e: #catchall - assume its a single bad read/write. only stop if we know it disconnected.
-                debug_print(str(type(e))+": "+str(e))
+                ntrip_forwarder = None
+                ntrip_client.start(command)
+                ntrip_start_pending = True
+                continue # responds when connected, or when it gives up. data is still read meanwhile
+            io_channel.respond(response)
+
+        # ntrip: move the connection along, and forward any caster data
+        ntrip_data = ntrip_client.handle(is_ready(ready, watched, "ntrip", ntrip_client.sock))
+        if ntrip_client.new_connection:
+            ntrip_client.new_connection = False
+            ntrip_forwarder = NtripForwarder(ntrip_forward_rate(data_connection))
+            gga_scheduler.reset() # caster needs a position soon after each connect
+            ntrip_on.value = 1
+            debug_print("ntrip connected")
+            if ntrip_start_pending:
+                ntrip_start_pending = False
+                io_channel.respond(IOResponse(True, "success"))
+        elif ntrip_on.value and not ntrip_client.streaming(): # disconnected: it reconnects after a backoff
+            ntrip_on.value = 0
+            ntrip_forwarder = None
+        if ntrip_start_pending and ntrip_client.gave_up():
+            print("ntrip connect failed: "+ntrip_client.error)
+            ntrip_start_pending = False
+            io_channel.respond(IOResponse(False, ntrip_client.error))
+            ntrip_client.stop()
+
+        if ntrip_forwarder:
+            # the forwarder frames caster data into whole RTCM messages and paces them to the unit,
+            # dropping stale ones if the link can't keep up.
+            if ntrip_data:
+                ntrip_forwarder.add(ntrip_data)
+            if ntrip_active and ntrip_forwarder.queue:
+                try:
+                    sent_before = ntrip_forwarder.sent_bytes
+                    ntrip_forwarder.send(data_connection.write)
+                    if ntrip_forwarder.sent_bytes > sent_before:
+                        debug_print(f"wrote {ntrip_forwarder.sent_bytes - sent_before} bytes of ntrip data, "
+                                    f"{len(ntrip_forwarder.queue)} messages queued")
+                except Exception as e: # assume it's a single bad write. data connection errors are handled when reading
+                    debug_print(str(type(e))+": "+str(e))
+
+        # data connection was lost: reopen it once the backoff is over
+        if data_reconnector.reconnecting():
+            data_connection = data_reconnector.try_reconnect()
+            if data_connection:
+                print(f"data connection is back after {data_reconnector.gap[1] - data_reconnector.gap[0]:.1f} s")
+                framer.reset()
+                sniffer.reset()
+                shown_format = None
+                data_format.value = b""
+                con_on.value = 1
+                if log_writer: # same log continues, with a marker where the data is missing
+                    log_writer.write(data_reconnector.gap_marker(ascii_scheme))
 
         # A1 has output: log it
         #if log_on.value and data_connection and data_connection.read_ready():
@@ -340,87 +842,67 @@ def io_loop(exitflag, con_on, con_start, con_stop, con_succeed,
             try:
                 #TODO - verify connection state? read_ready fails on COM if disconnected, but no error on UDP lost here
                 read_ready = data_connection.read_ready()
+                if is_ready(ready, watched, "data", data_connection) and not read_ready and not data_connection.reader_thread:
+                    # serial port which selects as readable with nothing to read: unplugged. don't keep waking on it
+                    raise serial.SerialException("device reports readiness to read but has no data")
                 if read_ready: # read whether logging or not to keep buffer clear
 
                     #use readall to make sure it's up to date. could read one or multiple messages.
                     in_data = data_connection.readall()
                     #debug_print(f"\nin data: <{in_data}>")
 
-                    data_for_monitor = buffered_partial_message + in_data # combine with any leftover data
-                    # debug_print(f"\ndata for monitor: {data_for_monitor}")
-
-                    #try handling as ascii and rtcm and do whichever works. TODO - make a combined parser?
-                    last_parts_all_formats = []
-
-                    for parse_scheme, start_char in [(ascii_scheme, READABLE_START), (rtcm_scheme, RTCM_PREAMBLE), (binary_scheme, BINARY_PREAMBLE)]:
-                        parts = data_for_monitor.split(start_char) #TODO - do a read_one_message from buffer instead? this will split on start char in message.
-                        #debug_print(f"parts splitting on {start_char}:")
-                        for part in parts:
-                            #debug_print(f"\t{part}")
-                            part = start_char + part
-                            last_msg = parse_scheme.parse_message(part)
-                            #print(f"last_msg: {last_msg}")
-                            if not last_msg.valid:
-                                #debug print invalid?
-                                continue #todo - could try to recombine split messages here.
-                            #debug_print(last_msg)
-                            elif last_msg.msgtype == b'INS':
-                                last_ins_msg.value = part #send valid INS message to monitor
-                                #debug_print(f"\nlast_ins_msg {type(parse_scheme)}:\n{last_msg}")
-                            elif last_msg.msgtype in [b'IMU', b'IM1']:
-                                last_imu_time.value = last_msg.imu_time_ms
-                                last_imu_msg.value = part #send valid IMU message to monitor
-                                #debug_print(f"\nlast_imu_msg {type(parse_scheme)}:\n{last_msg}")
-                            elif last_msg.msgtype == b'HDG':
-                                last_hdg_msg.value = part
-                                #debug_print(f"\nlast_hdg_msg {type(parse_scheme)}:\n{last_msg}")
-                            elif last_msg.msgtype == b'GPS':
-                                #debug_print(f"\nlast_gps_msg {type(parse_scheme)}:\n{last_msg}")
-                                last_gps_msg.value = part # save if needed for ntrip start or delayed sending
-                                gps_received.value = 1 #will allow setting gga on in ntrip
-                                #build and send GGA message if ntrip on
-                                if ntrip_on.value and ntrip_reader and ntrip_gga:
-                                    # build GGA
+                    # frame each message once, then parse it with the scheme for its protocol.
+                    # partial messages at the end stay in the framer until the next read.
+                    sniffer.add_data(len(in_data))
+                    valid_messages = 0
+                    for protocol, frame in framer.feed(in_data):
+                        part = bytes(frame)
+                        last_msg = parse_schemes[protocol].parse_message(part)
+                        #print(f"last_msg: {last_msg}")
+                        sniffer.add_frame(protocol, last_msg.valid)
+                        if not last_msg.valid:
+                            #debug print invalid?
+                            continue
+                        valid_messages += 1
+                        #debug_print(last_msg)
+                        # decoded fields of INS, IMU/IM1, GPS, GP2, HDG go to the monitor and other readers.
+                        # a message it can't store must not stop logging and ntrip
+                        try:
+                            latest_state.update(last_msg)
+                        except Exception as e:
+                            debug_print(f"latest state update failed for {last_msg.msgtype}: {e}")
+                        if last_msg.msgtype == b'GPS':
+                            #debug_print(f"\nlast_gps_msg {protocol}:\n{last_msg}")
+                            gps_received.value = 1 #will allow setting gga on in ntrip
+                            #build and send GGA message if ntrip on, and it's time for one or the unit moved
+                            if ntrip_client.streaming() and ntrip_client.settings.gga:
+                                now = time.time()
+                                if gga_scheduler.due(last_msg, now):
                                     gga_message = build_gga(last_msg)
                                     try:
-                                        ntrip_reader.sendall(gga_message)
+                                        ntrip_client.sendall(gga_message)
+                                        gga_scheduler.sent(last_msg, now)
                                     except Exception as e: #ntrip error, not data_connection
                                         #TODO - handle this as if ntrip disconnected? then close (if open) and retry
                                         debug_print("error sending gga message")
-                            elif last_msg.msgtype == b'GP2':
-                                #print(f"\nlast_gp2_msg {type(parse_scheme)}:\n{part}")
-                                last_gp2_msg.value = part # save if needed for ntrip start or delayed sending
-
-                        # if the last part is not a complete message, keep it to finish later.
-                        last_part = parts[-1]
-                        if last_msg.valid:
-                            last_parts_all_formats.append(b'') # empty 'last part' if complete, so it is shortest
-                        else:
-                            #debug_print(f"\ninvalid last part for {start_char}: {last_part}\n")
-                            #print(f"invalid last message: {last_msg}")
-                            last_parts_all_formats.append(last_part)
-
-                    # use the smaller of the invalid last parts which should match the correct format.
-                    # TODO - could this be wrong if # appears in RTCM message? may need other check for right format.
-                    #print(f"last_parts_all_formats: {last_parts_all_formats}")
-                    last_part = min(last_parts_all_formats, key=lambda x: len(x))
-                    #debug_print(f"\nsmaller last part: {last_part}")
-                    buffered_partial_message = last_part
-
-                    if log_on and log_file: #TODO - what about close in mid-write? could pass message and close here. or catch exception
-                        #pass
+                    next_baud = data_reconnector.check_baud(len(in_data), valid_messages)
+                    if next_baud: # reconnected serial port reads garbage: the unit may have come back at another baud
+                        debug_print(f"no valid messages after reconnecting, trying baud {next_baud}")
+                        data_connection.set_baud(next_baud)
+                        framer.reset()
+                        sniffer.reset()
+                    if sniffer.protocol != shown_format: # format is shown once locked onto it
+                        shown_format = sniffer.protocol
+                        data_format.value = (shown_format or "").encode()
+
+                    if log_writer:
                         #debug_print(in_data.decode())
-                        #log_file.write("< " + str(flush_counter) + " >")
-                        log_file.write(in_data)
-                        #periodically flush so we see file size progress
-                        flush_counter += 1
-                        #debug_print("< "+str(flush_counter)+" >")
-                        if flush_counter >= FLUSH_FREQUENCY:
-                            flush_counter = 0
-                            log_file.flush()
-                            os.fsync(log_file.fileno())
+                        log_writer.write(in_data) # queued for the writer thread, which flushes and fsyncs
             except (socket.error, socket.herror, socket.gaierror, socket.timeout, serial.SerialException, serial.SerialTimeoutException) as e:
                 # connection errors: indicate connection lost. I only saw the the serial errors happen here.
-                print("connection error: "+str(e)+"\nplease reconnect") #TODO - auto-reconnect after error?
+                # logging and ntrip keep going while it reconnects.
+                print("connection error: "+str(e)+"\nreconnecting")
                 data_connection.close()
+                data_connection = None
                 con_on.value = 0
+                data_reconnector.lost(str(e))
@@ -1,20 +1,36 @@
 try:  # importing from inside the package
     import message_scheme
-    from message_scheme import Message
+    from message_scheme import Message, PayloadFormat
+    from message_types import CompactMessage, ImuMessage, ImuOneMessage, InsMessage, GpsMessage, HdgMessage
     from class_configs import *
     from readable_scheme import ReadableScheme, int_to_ascii, ascii_to_int
     from rtcm_scheme import RTCM_Scheme
     from binary_scheme import Binary_Scheme
-    from connection import SerialConnection, FileReaderConnection, FileWriterConnection, UDPConnection
+    from connection import SerialConnection, ThreadedSerialConnection, FileReaderConnection, MappedFileReaderConnection, MappedLogConnection, FileWriterConnection, UDPConnection
     from board import IMUBoard
     from collector import Collector, SessionStatistics, RealTimePlot
+    from log_arrays import decode_log_to_arrays, decode_buffer_to_arrays
+    from stream_framer import StreamFramer, FormatSniffer, mapped_log_frames, FRAME_ASCII, FRAME_RTCM, FRAME_BINARY
+    from latest_state import LatestState
+    from log_writer import LogWriter
+    from log_files import SegmentedLogFile, open_log
+    from async_connection import AsyncUDPConnection, AsyncSerialConnection, AsyncLogConnection
+    from async_board import AsyncIMUBoard
 except ModuleNotFoundError:  # importing from outside of the package
     import tools.message_scheme
-    from tools.message_scheme import Message
+    from tools.message_scheme import Message, PayloadFormat
+    from tools.message_types import CompactMessage, ImuMessage, ImuOneMessage, InsMessage, GpsMessage, HdgMessage
     from tools.class_configs import *
     from tools.readable_scheme import ReadableScheme, int_to_ascii, ascii_to_int
     from tools.rtcm_scheme import RTCM_Scheme
     from tools.binary_scheme import Binary_Scheme
-    from tools.connection import SerialConnection, FileReaderConnection, FileWriterConnection, UDPConnection
+    from tools.connection import SerialConnection, ThreadedSerialConnection, FileReaderConnection, MappedFileReaderConnection, MappedLogConnection, FileWriterConnection, UDPConnection
     from tools.board import IMUBoard
     from tools.collector import Collector, SessionStatistics, RealTimePlot
+    from tools.log_arrays import decode_log_to_arrays, decode_buffer_to_arrays
+    from tools.stream_framer import StreamFramer, FormatSniffer, mapped_log_frames, FRAME_ASCII, FRAME_RTCM, FRAME_BINARY
+    from tools.latest_state import LatestState
+    from tools.log_writer import LogWriter
+    from tools.log_files import SegmentedLogFile, open_log
+    from tools.async_connection import AsyncUDPConnection, AsyncSerialConnection, AsyncLogConnection
+    from tools.async_board import AsyncIMUBoard
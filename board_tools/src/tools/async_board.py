@@ -0,0 +1,219 @@
+import asyncio
+from collections import deque
+try:  # importing from inside the package
+    from readable_scheme import *
+    from rtcm_scheme import RTCM_Scheme
+    from binary_scheme import Binary_Scheme
+    from message_scheme import Message
+    from stream_framer import StreamFramer, FormatSniffer, FRAME_ASCII, FRAME_RTCM, FRAME_BINARY
+    from async_connection import AsyncUDPConnection, AsyncSerialConnection, AsyncLogConnection
+    from class_configs.board_config import *
+except ModuleNotFoundError:  # importing from outside the package
+    from tools.readable_scheme import *
+    from tools.rtcm_scheme import RTCM_Scheme
+    from tools.binary_scheme import Binary_Scheme
+    from tools.message_scheme import Message
+    from tools.stream_framer import StreamFramer, FormatSniffer, FRAME_ASCII, FRAME_RTCM, FRAME_BINARY
+    from tools.async_connection import AsyncUDPConnection, AsyncSerialConnection, AsyncLogConnection
+    from tools.class_configs.board_config import *
+
+#IMUBoard for asyncio programs, sharing the event loop with their other I/O:
+#   board = await AsyncIMUBoard.from_udp(ip, data_port, control_port)   # or from_serial, from_log
+#   print(await board.get_version())
+#   async for message in board:  # decoded output messages in any format: ascii, rtcm or binary
+#       ...
+#the data format is detected like io_loop does. control commands wait for their response without blocking the loop,
+#and run one at a time so responses can't be mixed up.
+
+CONTROL_RESPONSE_TIMEOUT = 1.0  # seconds to wait for the response to a control message
+# output messages, which some firmware versions also send on the control port: not responses
+OUTPUT_MSGTYPES = [b'CAL', b'IMU', b'IM1', b'INS', b'GPS', b'GP2', b'HDG']
+
+
+class AsyncIMUBoard:
+    def __init__(self, data_connection=None, control_connection=None, odometer_connection=None,
+                 control_scheme=ReadableScheme(), timeout=CONTROL_RESPONSE_TIMEOUT):
+        self.data_connection = data_connection
+        self.control_connection = control_connection
+        self.odometer_connection = odometer_connection
+        self.control_scheme = control_scheme
+        self.timeout = timeout
+        self.control_lock = asyncio.Lock()
+        self.control_framer = StreamFramer()
+        self.control_framer.set_protocols([FRAME_ASCII])
+        self.control_messages = deque()  # parsed from the control connection, not taken yet
+        self.parse_schemes = {FRAME_ASCII: ReadableScheme(), FRAME_RTCM: RTCM_Scheme(checked_frames=True),
+                              FRAME_BINARY: Binary_Scheme(checked_frames=True)}
+        self.framer = StreamFramer()
+        self.sniffer = FormatSniffer(self.framer)  # once the output format is clear, only search for that one
+        self.valid_messages = 0
+        self.invalid_messages = 0
+
+    def __repr__(self):
+        return "AsyncIMUBoard: "+str(self.__dict__)
+
+    # connections like IMUBoard.from_udp: the unit's ports data_port, control_port are also the local ports
+    @classmethod
+    async def from_udp(cls, ip, data_port, control_port, odometer_port=None):
+        data_connection = await AsyncUDPConnection.open(ip, UDP_LOCAL_DATA_PORT, data_port) if data_port else None
+        control_connection = await AsyncUDPConnection.open(ip, UDP_LOCAL_CONFIG_PORT, control_port) if control_port else None
+        odometer_connection = await AsyncUDPConnection.open(ip, UDP_LOCAL_ODOMETER_PORT, odometer_port) if odometer_port else None
+        return cls(data_connection, control_connection, odometer_connection)
+
+    @classmethod
+    async def from_serial(cls, data_port, control_port, baud=DEFAULT_BAUD):
+        data_connection = await AsyncSerialConnection.open(data_port, baud) if data_port else None
+        control_connection = await AsyncSerialConnection.open(control_port, baud) if control_port else None
+        return cls(data_connection, control_connection)
+
+    # replay a log file: messages() ends at the end of the file. there is no control connection
+    @classmethod
+    async def from_log(cls, path):
+        return cls(await AsyncLogConnection.open(path))
+
+    def __aiter__(self):
+        return self.messages()
+
+    # decoded messages from the data connection as they arrive. ends when a log is finished or the connection is
+    # closed, and raises the connection's error if it is lost (like a serial port unplugged).
+    async def messages(self, include_invalid=False):
+        while True:
+            data = await self.data_connection.read()
+            if not data:
+                frames = self.framer.finish()
+            else:
+                self.sniffer.add_data(len(data))
+                frames = self.framer.feed(data)
+            for protocol, frame in frames:
+                message = self.parse_schemes[protocol].parse_message(bytes(frame))
+                self.sniffer.add_frame(protocol, message.valid)
+                if message.valid:
+                    self.valid_messages += 1
+                else:
+                    self.invalid_messages += 1
+                    if not include_invalid:
+                        continue
+                yield message
+            if not data:
+                return
+
+    # output format detected: FRAME_ASCII, FRAME_RTCM, FRAME_BINARY, or None while still detecting
+    def data_format(self):
+        return self.sniffer.protocol
+
+    # send a message on the control channel and wait for the response.
+    # gives an invalid message with error "Timeout" if there is none.
+    async def send_control_message(self, message):
+        async with self.control_lock:
+            self.control_connection.readall()  # clear any old responses
+            self.control_framer.reset()
+            self.control_messages.clear()
+            self.control_scheme.write_one_message(message, self.control_connection)
+            try:
+                return await asyncio.wait_for(self.read_one_control_message(), self.timeout)
+            except asyncio.TimeoutError:
+                m = Message()
+                m.valid = False
+                m.error = "Timeout"
+                return m
+
+    # send and don't wait for response- use this for odo message
+    def send_control_no_wait(self, message):
+        self.control_scheme.write_one_message(message, self.control_connection)
+
+    async def read_one_control_message(self):
+        while True:
+            while self.control_messages:
+                resp = self.control_messages.popleft()
+                # skip any output types, for firmware versions that output on both ports
+                if hasattr(resp, "msgtype") and resp.msgtype in OUTPUT_MSGTYPES:
+                    continue
+                return resp
+            data = await self.control_connection.read()
+            if not data:
+                raise ConnectionError("control connection closed")
+            for protocol, frame in self.control_framer.feed(data):
+                self.control_messages.append(self.control_scheme.parse_message(bytes(frame)))
+
+    # methods to build and send messages by type, like IMUBoard. awaiting them gives the response message.
+    async def get_version(self):
+        return await self.send_control_message(Message({'msgtype': b'VER'}))
+
+    async def get_serial(self):
+        return await self.send_control_message(Message({'msgtype': b'SER'}))
+
+    async def get_pid(self):
+        return await self.send_control_message(Message({'msgtype': b'PID'}))
+
+    async def get_ihw(self):
+        return await self.send_control_message(Message({'msgtype': b'IHW'}))
+
+    async def get_fhw(self):
+        return await self.send_control_message(Message({'msgtype': b'FHW'}))
+
+    async def get_fsn(self):
+        return await self.send_control_message(Message({'msgtype': b'FSN'}))
+
+    async def set_cfg(self, configurations):
+        return await self.send_control_message(Message({'msgtype': b'CFG', 'mode': WRITE_RAM, 'configurations': configurations}))
+
+    async def set_cfg_flash(self, configurations):
+        return await self.send_control_message(Message({'msgtype': b'CFG', 'mode': WRITE_FLASH, 'configurations': configurations}))
+
+    async def get_cfg(self, names_list):
+        return await self.send_control_message(Message({'msgtype': b'CFG', 'mode': READ_RAM, 'configurations': names_list}))
+
+    async def get_cfg_flash(self, names_list):
+        return await self.send_control_message(Message({'msgtype': b'CFG', 'mode': READ_FLASH, 'configurations': names_list}))
+
+    async def set_veh_flash(self, configurations):
+        return await self.send_control_message(Message({'msgtype': b'VEH', 'mode': WRITE_FLASH, 'configurations': configurations}))
+
+    async def get_veh_flash(self, names_list):
+        return await self.send_control_message(Message({'msgtype': b'VEH', 'mode': READ_FLASH, 'configurations': names_list}))
+
+    async def get_sensor(self, names_list):
+        return await self.send_control_message(Message({'msgtype': b'SEN', 'mode': READ_FLASH, 'configurations': names_list}))
+
+    async def unlock_flash(self):
+        return await self.send_control_message(Message({'msgtype': b'UNL', 'password': UNLOCK_FLASH_CODE}))
+
+    async def get_status(self):
+        return await self.send_control_message(Message({'msgtype': b'STA'}))
+
+    async def ping(self):
+        return await self.send_control_message(Message({'msgtype': b'PNG'}))
+
+    async def echo(self, contents):
+        return await self.send_control_message(Message({'msgtype': b'ECH', 'contents': contents}))
+
+    # after reset it may not respond
+    def send_reset(self, code):
+        self.send_control_no_wait(Message({'msgtype': b'RST', 'code': code}))
+
+    def send_reset_regular(self):
+        self.send_reset(0)
+
+    def enter_bootloading(self):
+        self.send_reset(2)
+
+    # over the odometer connection if there is one, else the control connection
+    def send_odometer(self, speed):
+        m = Message({'msgtype': b'ODO', 'speed': speed})
+        self.control_scheme.write_one_message(m, self.odometer_connection or self.control_connection)
+
+    # rtcm corrections from a caster go to the unit over the data connection, like io_loop does for ntrip
+    def send_corrections(self, data):
+        self.data_connection.write(data)
+
+    def stats(self):
+        return {"valid_messages": self.valid_messages,
+                "invalid_messages": self.invalid_messages,
+                "data_format": self.data_format(),
+                "data": self.data_connection.stats() if self.data_connection else None,
+                "control": self.control_connection.stats() if self.control_connection else None}
+
+    def close(self):
+        for connection in [self.data_connection, self.control_connection, self.odometer_connection]:
+            if connection:
+                connection.close()
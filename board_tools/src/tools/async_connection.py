@@ -0,0 +1,267 @@
+import asyncio
+import os
+import socket
+from collections import deque
+from threading import Thread
+import serial
+try:  # importing from inside the package
+    from class_configs.board_config import *
+    from connection import udp_kernel_drops, UDP_RECEIVE_BUFFER_SIZE, UDP_MAX_BUFFERED_BYTES, SERIAL_THREAD_READ_TIMEOUT
+    from log_files import open_log
+except ModuleNotFoundError:  # importing from outside the package
+    from tools.class_configs.board_config import *
+    from tools.connection import udp_kernel_drops, UDP_RECEIVE_BUFFER_SIZE, UDP_MAX_BUFFERED_BYTES, SERIAL_THREAD_READ_TIMEOUT
+    from tools.log_files import open_log
+
+#connections for asyncio programs: data is received by the event loop as it arrives, without a thread or process
+#per connection, and read with await:
+#   connection = await AsyncUDPConnection.open(ip, UDP_LOCAL_DATA_PORT, data_port)
+#   data = await connection.read()  # everything received since the last read, b"" at the end of a file
+#   connection.write(data)
+#usually these are used through AsyncIMUBoard, which frames and parses the data.
+
+ASYNC_MAX_BUFFERED_BYTES = UDP_MAX_BUFFERED_BYTES  # unread data kept per connection, dropping the oldest
+SERIAL_FD_READ_SIZE = 64 * 1024  # AsyncSerialConnection takes up to this much per read of the port
+FILE_CHUNK_SIZE = 64 * 1024  # AsyncLogConnection reads the file this much at a time
+
+
+class AsyncConnection:
+    def __init__(self, max_buffered_bytes=ASYNC_MAX_BUFFERED_BYTES):
+        self.max_buffered_bytes = max_buffered_bytes
+        self.chunks = deque()  # received and not read yet
+        self.buffered_bytes = 0
+        self.received_bytes = 0
+        self.overflow_bytes = 0  # dropped because more than max_buffered_bytes was waiting to be read
+        self.waiter = None  # future read() is waiting on
+        self.error = None  # exception which ended the connection, raised by read() after the data before it
+        self.closed = False
+
+    # called from the event loop with each piece of data received
+    def feed(self, data):
+        self.chunks.append(data)
+        self.buffered_bytes += len(data)
+        self.received_bytes += len(data)
+        while self.buffered_bytes > self.max_buffered_bytes and len(self.chunks) > 1:
+            dropped = self.chunks.popleft()
+            self.buffered_bytes -= len(dropped)
+            self.overflow_bytes += len(dropped)
+        self.wake()
+
+    # connection ended: error None for a normal close
+    def lost(self, error):
+        if error is not None and self.error is None:
+            self.error = error
+        self.closed = True
+        self.wake()
+
+    def wake(self):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    # wait for data, then return all of it. b"" once closed, or raises the error the connection ended with
+    async def read(self):
+        while not self.chunks:
+            if self.error is not None:
+                raise self.error
+            if self.closed:
+                return b""
+            self.waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self.waiter
+            finally:
+                self.waiter = None
+        return self.readall()
+
+    # everything received so far, without waiting
+    def readall(self):
+        if not self.chunks:
+            return b""
+        data = self.chunks[0] if len(self.chunks) == 1 else b"".join(self.chunks)
+        self.chunks.clear()
+        self.buffered_bytes = 0
+        return data
+
+    def reset_input_buffer(self):
+        self.readall()
+
+    def write(self, data):
+        raise Exception("AsyncConnection has no write")
+
+    def close(self):
+        self.lost(None)
+
+    def stats(self):
+        return {"received_bytes": self.received_bytes,
+                "buffered_bytes": self.buffered_bytes,
+                "overflow_bytes": self.overflow_bytes}
+
+
+# UDP through the event loop's datagram transport. like UDPConnection: bound to local_port, writes go to
+# remote_ip, remote_port, and the receive buffer is enlarged for bursts.
+class AsyncUDPConnection(AsyncConnection, asyncio.DatagramProtocol):
+    def __init__(self, remote_ip, remote_port, local_port, max_buffered_bytes=ASYNC_MAX_BUFFERED_BYTES):
+        super().__init__(max_buffered_bytes)
+        self.remote_ip = remote_ip
+        self.remote_port = remote_port
+        self.local_port = local_port
+        self.addr = (remote_ip, remote_port)
+        self.transport = None
+        self.sock = None
+        self.datagrams = 0
+        self.send_error = None  # last error from sending, like ICMP port unreachable. doesn't end the connection
+
+    @classmethod
+    async def open(cls, remote_ip, remote_port, local_port, receive_buffer_size=UDP_RECEIVE_BUFFER_SIZE):
+        connection = cls(remote_ip, remote_port, local_port)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer_size)
+        except OSError:
+            pass
+        sock.bind(('', local_port))
+        sock.setblocking(False)
+        connection.sock = sock
+        await asyncio.get_running_loop().create_datagram_endpoint(lambda: connection, sock=sock)
+        return connection
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.datagrams += 1
+        self.feed(data)
+
+    def error_received(self, exc):
+        self.send_error = exc
+
+    def connection_lost(self, exc):
+        self.lost(exc)
+
+    def write(self, data):
+        self.transport.sendto(data, self.addr)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()  # connection_lost follows
+        self.lost(None)
+
+    def __repr__(self):
+        return f"AsyncUDPConnection: {self.remote_ip}:{self.remote_port} from port {self.local_port}"
+
+    def stats(self):
+        stats = super().stats()
+        stats["datagrams"] = self.datagrams
+        stats["kernel_drops"] = udp_kernel_drops(self.sock) if self.sock and not self.closed else None
+        stats["receive_buffer_size"] = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) if self.sock and not self.closed else None
+        return stats
+
+
+# serial port read by the event loop: the port's fd is watched with add_reader and read without blocking when it
+# has data. where the loop can't watch it (Windows), a thread reads the port and hands the data to the loop.
+# an unplugged port ends the connection with its error, raised by read() after the data before it.
+class AsyncSerialConnection(AsyncConnection):
+    def __init__(self, port, baud=DEFAULT_BAUD, write_timeout=TIMEOUT_REGULAR,
+                 max_buffered_bytes=ASYNC_MAX_BUFFERED_BYTES):
+        super().__init__(max_buffered_bytes)
+        self.loop = asyncio.get_running_loop()
+        self.watch_fd = os.name == "posix" and hasattr(self.loop, "add_reader")
+        read_timeout = 0 if self.watch_fd else SERIAL_THREAD_READ_TIMEOUT
+        self.connection = serial.Serial(port, baud, timeout=read_timeout, write_timeout=write_timeout)
+        self.connection.reset_input_buffer()  # clear any old data when connecting
+        self.reads = 0
+        self.thread = None
+        if self.watch_fd:
+            self.fd = self.connection.fileno()
+            self.loop.add_reader(self.fd, self.read_fd)
+        else:
+            self.thread = Thread(target=self.read_thread, daemon=True)
+            self.thread.start()
+
+    @classmethod
+    async def open(cls, port, baud=DEFAULT_BAUD):
+        return cls(port, baud)
+
+    # fd is readable: take everything it has in one read. pyserial opens it non-blocking
+    def read_fd(self):
+        try:
+            data = os.read(self.fd, SERIAL_FD_READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:  # like EIO when unplugged
+            self.stop_reading(e)
+            return
+        if not data:  # readable with no data: the device is gone
+            self.stop_reading(serial.SerialException("device reports readiness to read but returned no data"
+                                                     " (device disconnected?)"))
+            return
+        self.reads += 1
+        self.feed(data)
+
+    def read_thread(self):
+        while not self.closed:
+            try:
+                data = self.connection.read(self.connection.in_waiting or 1)
+            except Exception as e:
+                if not self.closed:
+                    self.loop.call_soon_threadsafe(self.lost, e)
+                return
+            if data:
+                self.reads += 1
+                self.loop.call_soon_threadsafe(self.feed, data)
+
+    def stop_reading(self, error):
+        if self.watch_fd and not self.closed:
+            self.loop.remove_reader(self.fd)
+        self.lost(error)
+
+    def write(self, data):
+        return self.connection.write(data)
+
+    def reset_input_buffer(self):
+        if self.connection.is_open:
+            self.connection.reset_input_buffer()
+        self.readall()
+
+    def close(self):
+        self.stop_reading(None)
+        if hasattr(self.connection, "cancel_read"):
+            self.connection.cancel_read()
+        if self.thread is not None:
+            self.thread.join(2 * SERIAL_THREAD_READ_TIMEOUT + 1)
+        self.connection.close()
+
+    def __repr__(self):
+        return "AsyncSerialConnection: "+str(self.connection)
+
+    def stats(self):
+        stats = super().stats()
+        stats["reads"] = self.reads
+        return stats
+
+
+# log file (plain, compressed or a rotated log's manifest) as a data source: read() gives the next chunk, reading the
+# file in the loop's default executor so the loop keeps running, then b"" at the end.
+class AsyncLogConnection(AsyncConnection):
+    def __init__(self, path, chunk_size=FILE_CHUNK_SIZE):
+        super().__init__()
+        self.path = path
+        self.chunk_size = chunk_size
+        self.file = open_log(path)
+
+    @classmethod
+    async def open(cls, path, chunk_size=FILE_CHUNK_SIZE):
+        return cls(path, chunk_size)
+
+    async def read(self):
+        if self.closed:
+            return b""
+        data = await asyncio.get_running_loop().run_in_executor(None, self.file.read, self.chunk_size)
+        self.received_bytes += len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+        self.lost(None)
+
+    def __repr__(self):
+        return "AsyncLogConnection: "+self.path
@@ -1,7 +1,6 @@
 from ctypes import *
 import os
 import struct
-from bitstring import Bits
 from pyrtcm import RTCMReader, crc2bytes, calc_crc24q
 try:  # importing from inside the package
     #from pyrtcm import RTCMReader, RTCMParseError
@@ -9,13 +8,25 @@ try:  # importing from inside the package
     from class_configs.binary_scheme_config import * #TODO make config file with fomats
     from readable_scheme import extract_flags_HDG
     from message_scheme import Scheme, Message
+    from message_types import COMPACT_MESSAGE_CLASSES
 except ModuleNotFoundError:  # importing from outside the package
     from tools.class_configs.binary_scheme_config import *
     from tools.readable_scheme import extract_flags_HDG
     from tools.message_scheme import Scheme, Message
+    from tools.message_types import COMPACT_MESSAGE_CLASSES
 
 #decoder for our custom binary messages, shorter than RTCM format
 
+# compact message class by binary message type number
+BINARY_MESSAGE_CLASSES = {number: COMPACT_MESSAGE_CLASSES[msgtype]
+                          for number, msgtype in BINARY_EQUIVALENT_MESSAGE_TYPES.items() if msgtype in COMPACT_MESSAGE_CLASSES}
+
+# payload size of each type, checked with the frame so lazy decoding can't fail on length later
+BINARY_PAYLOAD_SIZES = {number: struct.calcsize("<" + "".join(NUMBER_TYPES[item[1]] for item in format_list if len(item) in (2, 3)))
+                        for number, format_list in [(BINARY_MSGTYPE_IMU, BINARY_FORMAT_IMU), (BINARY_MSGTYPE_INS, BINARY_FORMAT_INS),
+                                                    (BINARY_MSGTYPE_GPS, BINARY_FORMAT_GPS), (BINARY_MSGTYPE_GP2, BINARY_FORMAT_GP2),
+                                                    (BINARY_MSGTYPE_HDG, BINARY_FORMAT_HDG)]}
+
 class Binary_Scheme(Scheme):
 
     # simple version by getting data between preambles. TODO - use state machine and check the length
@@ -27,9 +38,7 @@ class Binary_Scheme(Scheme):
         # TODO - sometimes preamble ends in C5 or 50 byte, so this causes about 2/256 checksum fails.
 
         if read_data:
-            parsed_msg = Message()
-            self.set_fields_general(parsed_msg, read_data)
-            return parsed_msg
+            return self.parse_message(read_data)
 
     # try using length field -> do actual state machine or just go through all steps in one function call?
     # TODO - reading fixed number of characters may not work on UDP connection -> add a buffer?
@@ -98,6 +107,13 @@ class Binary_Scheme(Scheme):
     #         message.error = "parsing error: "+str(e)
     #     return message
 
+    # type number is after the preamble, if the data has it
+    def new_message(self, data):
+        type_index = len(BINARY_PREAMBLE) if data[:len(BINARY_PREAMBLE)] == BINARY_PREAMBLE else 0
+        if len(data) <= type_index:
+            return Message()
+        return BINARY_MESSAGE_CLASSES.get(data[type_index], Message)()
+
     def set_fields_general(self, message, raw_data):
         #split into preamble/lentgh/payload/crc , then check_valid
         try:
@@ -107,22 +123,24 @@ class Binary_Scheme(Scheme):
             # TODO - sometimes checksum ends in C5 or 50 byte, so this causes about 2/256 checksum fails.
 
             # take preamble off if it starts with preamble. no need to remove from end
+            # slices are views so nothing is copied, whether raw_data is bytes or a view of a log
+            view = memoryview(raw_data)
             preamble_length = len(BINARY_PREAMBLE)
-            if raw_data[:preamble_length] == BINARY_PREAMBLE:
-                raw_data = raw_data[preamble_length:]
+            if view[:preamble_length] == BINARY_PREAMBLE:
+                view = view[preamble_length:]
 
             # data here is:  msgtype, length, payload, checksum  (preamble already removed)
             msgtype_ind = 0
             length_ind = BINARY_TYPE_LENGTH
             payload_ind = BINARY_TYPE_LENGTH + BINARY_LENGTH_LENGTH
 
-            msgtype_bytes = raw_data[msgtype_ind: length_ind] #[0: BINARY_TYPE_LENGTH]
+            msgtype_bytes = view[msgtype_ind: length_ind] #[0: BINARY_TYPE_LENGTH]
             #print(f"msgtype bytes: {msgtype_bytes}")
             binary_msgtype = int.from_bytes(msgtype_bytes, BINARY_ENDIAN)
             #print(f'msgtype number: {binary_msgtype}')
             message.binary_msgtype = binary_msgtype
 
-            length_bytes = raw_data[length_ind: payload_ind]
+            length_bytes = view[length_ind: payload_ind]
             #print(f"length bytes: {length_bytes}")
             payload_length = int.from_bytes(length_bytes, BINARY_ENDIAN)
             message.payload_length = payload_length
@@ -131,18 +149,18 @@ class Binary_Scheme(Scheme):
             checksum_ind = BINARY_TYPE_LENGTH + BINARY_LENGTH_LENGTH + payload_length
             end_ind = BINARY_TYPE_LENGTH + BINARY_LENGTH_LENGTH + payload_length + BINARY_CRC_LEN
 
-            message.payload = raw_data[payload_ind: checksum_ind]
-            checksum_bytes = raw_data[checksum_ind: end_ind]
+            message.payload = view[payload_ind: checksum_ind]
+            checksum_bytes = view[checksum_ind: end_ind]
             message.checksum = checksum_bytes  # int.from_bytes(checksum_bytes, BINARY_ENDIAN, signed=True)
 
             # the preamble bytes and checksum itself are not used in checksum : so is it type, length, payload?
             # preamble was already removed, so this is everything before the checksum
-            message.checksum_input = raw_data[:checksum_ind]
+            message.checksum_input = view[:checksum_ind]
             #print(f"data for checksum calc: {message.checksum_input}")
 
             #message.data: up to expected end, ignore extras after. should it do anythinig with the extras?
-            message.raw_data = raw_data
-            message.data = raw_data[: end_ind]
+            message.raw_data = view
+            message.data = view[: end_ind]
 
             #tag as message types equivalent to ascii messages, including GPS/GP2 depending on gps message antenna id
             equivalent_type = BINARY_EQUIVALENT_MESSAGE_TYPES.get(message.binary_msgtype, b'Unknown')
@@ -150,8 +168,17 @@ class Binary_Scheme(Scheme):
             #print(f"equivalent message type: {equivalent_type}")
 
             if self.check_valid(message):
-                self.decode_payload_for_type(message, message.binary_msgtype, message.payload)
-                #pass
+                self.decode_fields(message, self.decode_payload, message.binary_msgtype, message.payload)
+
+        except Exception as e:
+            print(f"error in set_fields_general for data: {raw_data}")
+            print(e)
+            message.valid=False
+
+    #payload fields and the ones computed from them
+    def decode_payload(self, message, msgtype, payload):
+        try:
+            self.decode_payload_for_type(message, msgtype, payload)
 
             #Binary GPS/GP2: 4 bit carrsoln, 4 bit fix type
             if hasattr(message, "carrsoln_and_fix"):
@@ -179,11 +206,8 @@ class Binary_Scheme(Scheme):
 
                 for rate_attr in ["angrate_x_dps", "angrate_y_dps", "angrate_z_dps"]:
                     setattr(message, rate_attr, message.rate_range * getattr(message, rate_attr))
-
-
-
         except Exception as e:
-            print(f"error in set_fields_general for data: {raw_data}")
+            print(f"error in decode_payload for payload: {bytes(payload)}")
             print(e)
             message.valid=False
 
@@ -206,13 +230,16 @@ class Binary_Scheme(Scheme):
                 message.valid = False
                 message.error = "Checksum Fail"
                 #print(f"checksum failed on message: {message}")
+            elif message.payload_length < BINARY_PAYLOAD_SIZES.get(message.binary_msgtype, 0):
+                message.valid = False
+                message.error = "Length(unpack)"
             else:
                 #print("checksum pass")
                 message.valid = True
                 message.error = None
             return message.valid
         except Exception as err:
-            #print("exception checking message with data: "+str(message.data)+" , len = "+str(len(message.data)))
+            #print("exception checking message with data: "+str(bytes(message.data))+" , len = "+str(len(message.data)))
             message.valid = False
             message.error = "Check Error: "+str(err)
 
@@ -302,6 +329,8 @@ class Binary_Scheme(Scheme):
             message.error = "Length(unpack)"
 
     def checksum_passes(self, message):
+        if self.checked_frames:
+            return True
         #print(f"checksum passes: message = {message}")
         computed_checksum = binary_checksum(message.checksum_input)
         #print(f"computed checksum: {computed_checksum}")
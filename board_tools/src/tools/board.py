@@ -486,12 +486,8 @@ class IMUBoard:
         # When UDP is used it returns empty messages. This while loop is used to ensure there is a message 
         # before exiting
         attempt_count = 0 
-        while message == None or message.__dict__ == {}: 
-            if hasattr(self, "msg_format") and self.msg_format == b"4" and hasattr(self.data_connection, "sock"):
-                #   When UDP and RTCM is use we can only get message this way 
-                message = self.data_scheme.read_one_message(self.data_connection.sock)
-            else:
-                message = self.data_scheme.read_one_message(self.data_connection)
+        while message == None or not message.fields(): 
+            message = self.data_scheme.read_one_message(self.data_connection)
             if debug: print(message)
             if attempt_count >= num_attempts:
                 debug_print(f"attempt count: {attempt_count}")
@@ -174,6 +174,14 @@ FORMAT_STA = [
     ("overall", bytes)
 ]
 
+# gap marker, written into logs by io_loop when the data connection was lost and came back. not sent by the unit:
+#APGAP,1718000000.123,1718000004.567,1*CS  is lost at, reconnected at (unix seconds), reconnects so far
+FORMAT_GAP = [
+    ("lost_time_s", float),
+    ("reconnect_time_s", float),
+    ("reconnects", int)
+]
+
 # Reset has a code for reset type: 0-processor, 1-algorithm
 
 FORMAT_RST = [
@@ -14,6 +14,7 @@ TYPE_LENGTH = 2 #12 bit message number + 4 bit subtype = 16bit = 2 bytes
 LENGTH_LENGTH = 2 #10 bit length + 6 bit reserved = 16 bit = 2 bytes
 ENDIAN = "little"
 RTCM_CRC_LEN = 3
+RTCM_CRC24Q_POLY = 0x1864CFB #CRC-24Q generator polynomial
 
 #rtcm message types are numbers
 ANELLO_IDENTIFIER = 4058
@@ -1,4 +1,4 @@
-from threading import Thread
+from threading import Thread, Lock
 import collections
 import matplotlib
 matplotlib.use("TkAgg") #supposed to fix hang issues on large plots
@@ -14,16 +14,30 @@ import math
 import os
 
 PLOT_WIDTH_IN, PLOT_HEIGHT_IN = 19, 9
+READ_WAIT_SECONDS = 1e-3 # wait when the board had no new data, instead of spinning
+COLUMN_START_CAPACITY = 1024 # values per column before the first doubling
 
 try:  # importing from inside the package
     import readable_scheme
     from message_scheme import Message
+    from message_types import RAW_FIELDS
+    from readable_scheme import ReadableScheme
+    from rtcm_scheme import RTCM_Scheme
+    from binary_scheme import Binary_Scheme
+    from stream_framer import StreamFramer, FRAME_ASCII, FRAME_RTCM, FRAME_BINARY
     import connection
+    from connection import FILE_READ_BLOCK_SIZE
     from class_configs.board_config import *
 except ModuleNotFoundError:  # importing from outside the package
     import tools.readable_scheme as readable_scheme
     from tools.message_scheme import Message
+    from tools.message_types import RAW_FIELDS
+    from tools.readable_scheme import ReadableScheme
+    from tools.rtcm_scheme import RTCM_Scheme
+    from tools.binary_scheme import Binary_Scheme
+    from tools.stream_framer import StreamFramer, FRAME_ASCII, FRAME_RTCM, FRAME_BINARY
     import tools.connection
+    from tools.connection import FILE_READ_BLOCK_SIZE
     from tools.class_configs.board_config import *
 
 
@@ -45,20 +59,229 @@ def format_num(num, sigfigs=4):
     return np.format_float_positional(num, precision=sigfigs, unique=True, fractional=False, trim='k', sign=False)
 
 
+# numpy array of one field's values, in message order. appends go to a list, which moves into spare room at the
+# end of the array when it's long or the values are read. the room doubles when it runs out, so appending is
+# O(1) on average. numbers stay numeric types like np.array would give, anything else makes it an object column.
+# the reader thread flushes from append and the main thread from values, so flushing holds the lock.
+class GrowableColumn:
+    def __init__(self, capacity=COLUMN_START_CAPACITY):
+        self.array = np.empty(capacity, dtype=np.int64)
+        self.length = 0
+        self.pending = []
+        self.lock = Lock()
+
+    # now: arrival time, only used by RingColumn
+    def append(self, value, now=None):
+        self.pending.append(value)
+        if len(self.pending) >= COLUMN_START_CAPACITY:
+            self.flush()
+
+    # move the pending values into the array. values appended meanwhile by another thread stay pending.
+    def flush(self):
+        with self.lock:
+            count = len(self.pending)
+            if count == 0:
+                return
+            chunk = self.pending[:count]
+            del self.pending[:count]
+            self.store(self.to_array(chunk))
+
+    def to_array(self, values):
+        if {type(value) for value in values} <= {int, float, bool}:
+            return np.array(values)
+        return np.fromiter(values, dtype=object, count=len(values))
+
+    # dtype which holds the stored values and the new ones
+    def combined_dtype(self, chunk):
+        if self.length == 0:
+            return chunk.dtype
+        elif self.array.dtype.kind == "O" or chunk.dtype.kind == "O":
+            return np.dtype(object)
+        return np.result_type(self.array.dtype, chunk.dtype)
+
+    def store(self, chunk):
+        dtype = self.combined_dtype(chunk)
+        end = self.length + len(chunk)
+        if end > len(self.array) or dtype != self.array.dtype:
+            capacity = len(self.array)
+            while capacity < end:
+                capacity *= 2
+            array = np.empty(capacity, dtype=dtype)
+            array[:self.length] = self.array[:self.length]
+            self.array = array
+        self.array[self.length: end] = chunk
+        self.length = end
+
+    # the values so far, as a view: nothing is copied. later values go after them, so the view doesn't change
+    def values(self):
+        self.flush()
+        with self.lock:
+            return self.array[:self.length]
+
+
+# only the latest values of one field: at most max_samples, and none from more than max_seconds before the newest.
+# a ring buffer which writes each value twice, at i and i + capacity, so the values in the ring are always one
+# contiguous view. with only max_seconds, the ring doubles while its oldest value is newer than that, then stays.
+class RingColumn(GrowableColumn):
+    def __init__(self, max_samples=None, max_seconds=None):
+        self.capacity = max_samples or COLUMN_START_CAPACITY
+        super().__init__(2 * self.capacity)
+        self.fixed_size = max_samples is not None
+        self.max_seconds = max_seconds
+        self.times = np.empty(2 * self.capacity) if max_seconds is not None else None
+        self.total = 0  # values ever added. self.length is the number in the ring
+
+    def append(self, value, now=None):
+        # value and time as one item, so a flush from another thread can't split them
+        self.pending.append((value, now) if self.max_seconds is not None else value)
+        if len(self.pending) >= COLUMN_START_CAPACITY:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            count = len(self.pending)
+            if count == 0:
+                return
+            chunk = self.pending[:count]
+            del self.pending[:count]
+            if self.max_seconds is not None:
+                values, times = zip(*chunk)
+                self.store(self.to_array(values), np.array(times))
+            else:
+                self.store(self.to_array(chunk))
+
+    def store(self, chunk, times=None):
+        dtype = self.combined_dtype(chunk)
+        if dtype != self.array.dtype:
+            self.array = self.array.astype(dtype)
+        count = len(chunk)
+        if not self.fixed_size and self.length + count > self.capacity and \
+                times[-1] - self.times[self.oldest_index()] <= self.max_seconds:
+            self.grow(self.length + count)
+        if count > self.capacity:  # more than fits: only the last ones stay anyway
+            self.total += count - self.capacity
+            chunk, count = chunk[-self.capacity:], self.capacity
+            times = times[-self.capacity:] if times is not None else None
+        self.write(self.array, chunk, self.total)
+        if times is not None:
+            self.write(self.times, times, self.total)
+        self.total += count
+        self.length = min(self.length + count, self.capacity)
+
+    # values numbered from first on, in their ring places and the copies after them
+    def write(self, array, chunk, first):
+        positions = (first + np.arange(len(chunk))) % self.capacity
+        array[positions] = chunk
+        array[positions + self.capacity] = chunk
+
+    def oldest_index(self):
+        return (self.total - self.length) % self.capacity
+
+    # bigger ring with the same values, for max_seconds
+    def grow(self, needed):
+        start, end = self.oldest_index(), self.oldest_index() + self.length
+        values, times = self.array[start: end], self.times[start: end]
+        while self.capacity < needed:
+            self.capacity *= 2
+        self.array = np.empty(2 * self.capacity, dtype=self.array.dtype)
+        self.times = np.empty(2 * self.capacity)
+        self.write(self.array, values, self.total - self.length)
+        self.write(self.times, times, self.total - self.length)
+
+    # a copy, since later values overwrite the ring in place
+    def values(self):
+        self.flush()
+        with self.lock:
+            start = self.oldest_index()
+            values = self.array[start: start + self.length]
+            if self.max_seconds is not None and self.length:
+                times = self.times[start: start + self.length]
+                values = values[np.searchsorted(times, times[-1] - self.max_seconds):]
+            return values.copy()
+
+
+# latest messages of one group, like Collector.messages: at most maxlen, and none more than max_seconds older
+# than the newest. a deque otherwise, so len, [-1] and iterating work like on the list it replaces.
+class MessageRing(collections.deque):
+    def __init__(self, iterable=(), maxlen=None, max_seconds=None):
+        super().__init__(iterable, maxlen)
+        self.max_seconds = max_seconds
+        self.times = collections.deque(maxlen=maxlen)
+
+    def add(self, message, now):
+        self.append(message)
+        if self.max_seconds is not None:
+            self.times.append(now)
+            while now - self.times[0] > self.max_seconds:
+                self.times.popleft()
+                self.popleft()
+
+
+# the fields of one group of messages (like all IMU messages) as GrowableColumns, or RingColumns with a
+# max_samples or max_seconds limit. a message without some field adds nothing to its column,
+# same as skipping it with hasattr.
+class MessageColumns:
+    def __init__(self, max_samples=None, max_seconds=None):
+        self.columns = {}
+        self.count = 0  # number of messages added, including ones the rings have dropped
+        self.max_samples = max_samples
+        self.max_seconds = max_seconds
+
+    def append(self, message, now=None):
+        for name, value in message.fields().items():
+            if name in RAW_FIELDS:
+                continue
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = self.new_column()
+            column.append(value, now)
+        self.count += 1
+
+    def new_column(self):
+        if self.max_samples is None and self.max_seconds is None:
+            return GrowableColumn()
+        return RingColumn(self.max_samples, self.max_seconds)
+
+    def values(self, name):
+        column = self.columns.get(name)
+        if column is None:
+            return np.array([])
+        return column.values()
+
+
 # Gets messages from a Board, stores and plots them
+# each message's fields go into numpy columns per message group, which get_vector returns.
+# keep_messages=False stores only the columns and the last message of each group, to save memory on long runs.
+# max_samples / max_seconds: keep only that many of the latest messages and values per group, for long runs.
+#   a number for every group, or a dict by group: "imu" (also CAL), "gps", "gp2", "ins", "hdg", "invalid".
+#   statistics still count every message.
 class Collector:
     def __init__(self, board, log_messages=False, message_file_name=None, log_detailed=False, log_debug=False,
-                 debug_file_name=None, detect_misses_with_counters=False, transformation=None):
+                 debug_file_name=None, detect_misses_with_counters=False, transformation=None, keep_messages=True,
+                 max_samples=None, max_seconds=None):
         self.board = board
         self.isRun = True
         self.isReceiving = False
         self.thread = None
-        self.messages = [] #for IMU or CAl, should just have one type
-        self.gps_messages = []
-        self.gp2_messages = []
-        self.ins_messages = []
-        self.hdg_messages = []
-        self.invalid_messages = []
+        self.keep_messages = keep_messages
+        self.max_samples = max_samples
+        self.max_seconds = max_seconds
+        self.messages = self.new_message_list("imu") #for IMU or CAl, should just have one type
+        self.gps_messages = self.new_message_list("gps")
+        self.gp2_messages = self.new_message_list("gp2")
+        self.ins_messages = self.new_message_list("ins")
+        self.hdg_messages = self.new_message_list("hdg")
+        self.invalid_messages = self.new_message_list("invalid")
+        self.columns = {group: MessageColumns(*self.retention(group)) for group in ["imu", "gps", "gp2", "ins", "hdg"]}
+        self.last_messages = {}
+
+        # frames from the board's data stream, any output format. extra messages wait in pending_messages.
+        self.framer = StreamFramer()
+        # every field of the valid messages is kept, so decode them right away
+        self.schemes = {FRAME_ASCII: ReadableScheme(lazy=False), FRAME_RTCM: RTCM_Scheme(lazy=False),
+                        FRAME_BINARY: Binary_Scheme(lazy=False)}
+        self.pending_messages = collections.deque()
+        self.bad_frames = 0  # framer's frames with a wrong checksum which are already in pending_messages
 
         self.log_messages = log_messages
         self.message_file_name = message_file_name
@@ -89,7 +312,8 @@ class Collector:
         self.stop_reading()
         self.board.reset_connections()
         self.__init__(self.board, self.log_messages, self.message_file_name, self.log_messages_detailed, self.log_debug,
-                      self.debug_file_name, self.detect_misses_with_counters, self.transformation)
+                      self.debug_file_name, self.detect_misses_with_counters, self.transformation, self.keep_messages,
+                      self.max_samples, self.max_seconds)
         self.start_reading()  # should this start, or start separately?
 
         # wait for first new message - might not be necessary since it passed without this
@@ -149,59 +373,109 @@ class Collector:
 
     # get one message from board's data channel, save it
     def read_one_message(self):
-        message = self.board.read_one_message()
-        if message:
-            self.add_if_valid(message)
+        if not self.pending_messages:
+            self.read_messages()
+        if not self.pending_messages:
+            return None
+        message = self.pending_messages.popleft()
+        self.add_if_valid(message)
         return message
 
+    # read everything waiting on the data channel and parse each complete frame once
+    def read_messages(self):
+        in_data = self.board.data_connection.readall()
+        if in_data is None:
+            # file connections have no readall (so clear_inputs doesn't drop the log): take the next block instead
+            in_data = self.board.data_connection.read(FILE_READ_BLOCK_SIZE)
+        if not in_data:
+            time.sleep(READ_WAIT_SECONDS)
+            return
+        for protocol, frame in self.framer.feed(in_data):
+            self.add_bad_frames()  # the ones before this frame, so the statistics see them in order
+            self.pending_messages.append(self.schemes[protocol].parse_message(bytes(frame)))
+        self.add_bad_frames()
+
+    # frames the framer dropped for a wrong checksum go in as invalid messages, so they count like other invalid ones
+    def add_bad_frames(self):
+        bad_frames = sum(self.framer.bad_frames.values())
+        for i in range(bad_frames - self.bad_frames):
+            message = Message()
+            message.valid = False
+            message.error = "Checksum Fail"
+            message.data = b""
+            self.pending_messages.append(message)
+        self.bad_frames = bad_frames
+
     # if message is valid,add it to self.valid, do transformations, update statistics
     # called only on the streaming messages - may not work on control message responses
     def add_if_valid(self, message):
         if message.valid:
             if message.msgtype == b'GPS' or message.msgtype == b'GP':
                 self.add_delta_t_gps(message)
-                self.gps_messages.append(message)
+                self.store_message(message, "gps", self.gps_messages)
             if message.msgtype == b'GP2' or message.msgtype == b'G2':
                 self.add_delta_t_gp2(message)
-                self.gp2_messages.append(message)
+                self.store_message(message, "gp2", self.gp2_messages)
             elif message.msgtype == b'CAL' or message.msgtype == b'CA':
                 self.add_delta_t_cal(message)
                 #self.transform_message_data(message)
-                self.messages.append(message)
+                self.store_message(message, "imu", self.messages)
             elif message.msgtype in [b'IMU', b'IM1', b'IM']:
                 self.add_delta_t_imu(message)
                 #self.transform_message_data(message)
-                self.messages.append(message)
+                self.store_message(message, "imu", self.messages)
             elif message.msgtype == b'INS' or message.msgtype == b'IN':
                 # do delta t from previous INS message?
                 self.add_delta_t_ins(message)
-                self.ins_messages.append(message)
+                self.store_message(message, "ins", self.ins_messages)
                 pass
             elif message.msgtype == b'HDG':
                 self.add_delta_t_hdg(message)
-                self.hdg_messages.append(message)
+                self.store_message(message, "hdg", self.hdg_messages)
             if self.log_messages_detailed:
-                self.log_line("Message: " + str(message.__dict__))
+                self.log_line("Message: " + str(message.fields()))
             else:
-                #self.log_line((readable_scheme.READABLE_START+message.data).decode())
+                #self.log_line((readable_scheme.READABLE_START+bytes(message.data)).decode())
                 pass #don't show it if not "detailed"
             self.statistics.count_valid(message)
         else:
-            self.invalid_messages.append(message)
-            self.debug_line("invalid message: error = " + str(message.error) + ", data = " + str(message.data))
+            self.add_to_list(self.invalid_messages, message, time.monotonic())
+            self.debug_line("invalid message: error = " + str(message.error) + ", data = " + str(bytes(message.data)))
             self.statistics.count_invalid()
         return message.valid
 
+    # (max_samples, max_seconds) for one group
+    def retention(self, group):
+        return tuple(limit.get(group) if isinstance(limit, dict) else limit
+                     for limit in (self.max_samples, self.max_seconds))
+
+    # a list, or a MessageRing if the group has a retention limit
+    def new_message_list(self, group):
+        max_samples, max_seconds = self.retention(group)
+        if max_samples is None and max_seconds is None:
+            return []
+        return MessageRing(maxlen=max_samples, max_seconds=max_seconds)
+
+    def add_to_list(self, message_list, message, now):
+        if isinstance(message_list, MessageRing):
+            message_list.add(message, now)
+        else:
+            message_list.append(message)
+
+    # group is "imu" (also CAL), "gps", "gp2", "ins" or "hdg"
+    def store_message(self, message, group, message_list):
+        now = time.monotonic()
+        self.columns[group].append(message, now)
+        self.last_messages[group] = message
+        if self.keep_messages:
+            self.add_to_list(message_list, message, now)
+
     # get the last message. used for real time plot.
     def last_message(self):
-        if len(self.messages) > 0:
-            return self.messages[-1]
-        return None
+        return self.last_messages.get("imu")
 
     def last_gps_message(self):
-        if len(self.gps_messages) > 0:
-            return self.gps_messages[-1]
-        return None
+        return self.last_messages.get("gps")
 
     def stop_reading(self):
         self.isRun = False
@@ -359,59 +633,46 @@ class Collector:
     def print_messages(self):
         print("messages:\n")
         for i, m in enumerate(self.messages):
-            print("message "+str(i)+": "+str(m.__dict__)+"\n")
+            print("message "+str(i)+": "+str(m.fields())+"\n")
 
-    # get vector of some variable for all messages
-    # TODO - cache vectors when calling this, or update vectors on receiving message?
+    # get vector of some variable for all messages which have it, in order.
+    # without retention limits it's a view of the stored column, so don't modify it in place.
     def get_vector(self, var_name):
-        #return np.array([getattr(m, var_name) for m in self.messages if hasattr(m, var_name)])
-
-        #longer version to show when anything is missing
-        #print("get vector: "+str(var_name))
-        values = []
-        for m in self.messages:
-            if hasattr(m, var_name):
-                values.append(getattr(m, var_name))
-            else:
-                #print("missing attribute "+str(var_name)+ " in message: "+str(m)) #too many prints in some uses.
-                pass
-        return np.array(values)
+        return self.columns["imu"].values(var_name)
 
     def get_vector_gps(self, var_name):
-        return np.array([getattr(m, var_name) for m in self.gps_messages if hasattr(m, var_name)])
+        return self.columns["gps"].values(var_name)
 
     def get_vector_gp2(self, var_name):
-        return np.array([getattr(m, var_name) for m in self.gp2_messages if hasattr(m, var_name)])
+        return self.columns["gp2"].values(var_name)
 
     def get_vector_ins(self, var_name):
-        return np.array([getattr(m, var_name) for m in self.ins_messages if hasattr(m, var_name)])
+        return self.columns["ins"].values(var_name)
 
     def get_vector_hdg(self, var_name):
-        return np.array([getattr(m, var_name) for m in self.hdg_messages if hasattr(m, var_name)])
+        return self.columns["hdg"].values(var_name)
 
     def num_messages(self):
-        return len(self.messages)
+        return self.columns["imu"].count
 
     def num_ins_messages(self):
-        return len(self.ins_messages)
+        return self.columns["ins"].count
 
     def num_gps_messages(self):
-        return len(self.gps_messages)
+        return self.columns["gps"].count
 
     def num_gp2_messages(self):
-        return len(self.gp2_messages)
+        return self.columns["gp2"].count
 
     def num_hdg_messages(self):
-        return len(self.hdg_messages)
+        return self.columns["hdg"].count
 
     # plotting collected data with one variable against another
     def plot(self, independentVar, dependentVar, gps=False, show=True):
         if gps:
-            messages_copy = copy.deepcopy(self.gps_messages)
             independent_data = self.get_vector_gps(independentVar)  # [getattr(m, independentVar) for m in messages_copy]
             dependent_data = self.get_vector_gps(dependentVar)
         else:
-            messages_copy = copy.deepcopy(self.messages)  # copy in case messages are still coming in
             independent_data = self.get_vector(independentVar)  # [getattr(m, independentVar) for m in messages_copy]
             dependent_data = self.get_vector(dependentVar)  # [getattr(m, dependentVar) for m in messages_copy]
             if dependentVar == "delta_t":
@@ -463,13 +724,11 @@ class Collector:
     # plot multiple variables versus 1. dependentVars is a list of variable name strings.
     def plot_multi_together(self, independentVar, dependentVars, gps=False):
         if gps:
-            messages_copy = copy.deepcopy(self.gps_messages)
             independent_data = self.get_vector_gps(independentVar)  # [getattr(m, independentVar) for m in messages_copy]
             for var in dependentVars:
                 dependent_data = self.get_vector_gps(var)  # [getattr(m, var) for m in messages_copy]
                 plt.plot(independent_data, dependent_data, label=var)
         else:
-            messages_copy = copy.deepcopy(self.messages)
             independent_data = self.get_vector(independentVar)  # [getattr(m, independentVar) for m in messages_copy]
             for var in dependentVars:
                 dependent_data = self.get_vector(var)  # [getattr(m, var) for m in messages_copy]
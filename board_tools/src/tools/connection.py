@@ -2,19 +2,40 @@ import serial
 from abc import ABC
 try:  # importing from inside the package
 	from class_configs.board_config import *
+	from log_files import open_log, open_log_mappable
 except ModuleNotFoundError:  # importing from outside the package
 	from tools.class_configs.board_config import *
+	from tools.log_files import open_log, open_log_mappable
 
 from builtins import input
 import socket
 import sys
 import select
+import mmap
+import os
+import struct
+import time
+from collections import deque
+from threading import Thread, Event
 
 
 READ_SIZE = 1024 # excessively large to get whole buffer
+FILE_READ_BLOCK_SIZE = 1024 * 1024 # FileReaderConnection reads the file this much at a time
+SERIAL_RING_SIZE = 4 * 1024 * 1024 # ThreadedSerialConnection holds up to this much data its reader thread read
+SERIAL_THREAD_READ_TIMEOUT = 0.1 # the reader thread's serial read returns this often without data, to check for close
+UDP_RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024 # SO_RCVBUF UDPConnection asks for, so bursts aren't dropped by the OS
+UDP_MAX_DATAGRAM_SIZE = 65536 # room kept free for the next datagram: larger than any UDP payload, so none are cut off
+UDP_MAX_BUFFERED_BYTES = 16 * 1024 * 1024 # UDPConnection keeps at most this much unread data, dropping the oldest
+UDP_TIMESTAMP_HISTORY = 4096 # arrival times kept for the latest datagrams, when timestamps are on
+# host receive timestamps from the kernel. python only names the option on some versions, 35 is its value on linux
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35 if sys.platform.startswith("linux") else None)
+TIMESPEC_STRUCT = struct.Struct("@ll")  # seconds, nanoseconds
+MAPPED_RELEASE_SIZE = 16 * 1024 * 1024 # MappedLogConnection gives pages it has read back to the OS this much at a time
 
 # abstract connection class
 class Connection(ABC):
+	reader_thread = False  # True if a thread reads the data in the background: see ThreadedSerialConnection
+
 	def __init__(self, port=None, baud=DEFAULT_BAUD, timeout=TIMEOUT_REGULAR, write_timeout=TIMEOUT_REGULAR):
 		pass
 
@@ -31,6 +52,10 @@ class Connection(ABC):
 	def read_ready(self):
 		pass
 
+	# file descriptor to wait on for data, None if it can't be waited on
+	def fileno(self):
+		return None
+
 	#read a single message. optional start and end char arguments
 	def read_one_message(self, start_char=None, end_char=None):
 		raise Exception("base or dummy Connection has no read_one_message")
@@ -68,6 +93,10 @@ class Connection(ABC):
 	def get_timeout(self):
 		pass
 
+	# counters for the connection's statistics, None if it has none
+	def stats(self):
+		return None
+
 
 # dummy for when we don't need data connection - configuration and bringup tools
 class DummyConnection(Connection):
@@ -99,6 +128,13 @@ class SerialConnection(Connection):
 	def read_until(self, expected='\n', size=None):
 		return self.connection.read_until(expected, size)
 
+	# None on Windows, where serial ports can't be used with select
+	def fileno(self):
+		try:
+			return self.connection.fileno()
+		except Exception as e:
+			return None
+
 	def read_ready(self):
 		try:
 			return self.connection.in_waiting > 0
@@ -146,11 +182,279 @@ class SerialConnection(Connection):
 		return self.connection.timeout
 
 
-class UDPConnection(Connection):
-	def __init__(self, remote_ip, remote_port, local_port, timeout=0):
+# read, read_until and readall for connections which receive into a buffer first, working like Serial's:
+# they wait up to timeout seconds for the data (None: no limit), then return what they have.
+# subclasses set self.timeout, call init_buffer, and implement receive, which adds whatever has arrived to
+# buffer[end:] and returns False if nothing had, and wait_for_data(seconds), which returns when more may have arrived.
+class BufferedStream:
+	def init_buffer(self, size):
+		self.buffer = bytearray(size)  # buffer[position:end] is received and not read yet
+		self.view = memoryview(self.buffer)
+		self.position = 0
+		self.end = 0
+
+	# move unread data to the start of buffer, and grow it if that doesn't leave room bytes free after it
+	def make_room(self, room):
+		unread = self.end - self.position
+		if unread and self.position:
+			self.buffer[:unread] = bytes(self.view[self.position: self.end])
+		self.position, self.end = 0, unread
+		if len(self.buffer) - unread < room:
+			self.view.release()  # bytearray can't change size while viewed
+			self.buffer.extend(bytes(max(len(self.buffer), room)))
+			self.view = memoryview(self.buffer)
+
+	# receive until new data arrives or the deadline from time.monotonic passes (None: wait forever). False on timeout
+	def receive_more(self, deadline):
+		while not self.receive():
+			wait = None if deadline is None else deadline - time.monotonic()
+			if wait is not None and wait <= 0:
+				return False
+			self.wait_for_data(wait)
+		return True
+
+	def deadline(self):
+		return None if self.timeout is None else time.monotonic() + self.timeout
+
+	# unread data from position up to end, and move past it
+	def take(self, end):
+		data = bytes(self.view[self.position: end])
+		self.position = end
+		if self.position == self.end:  # all read: next data goes to the start again
+			self.position = self.end = 0
+		return data
+
+	# read <size> bytes, or less if they don't arrive within timeout
+	def read(self, size=1):
+		if self.end - self.position < size:
+			deadline = self.deadline()
+			while self.end - self.position < size and self.receive_more(deadline):
+				pass
+		return self.take(min(self.position + size, self.end))
+
+	def read_one_message(self, start_char=None, end_char=None):
+		before = self.read_until(start_char)
+		#TODO: handle whatever came before start code?
+		data = self.read_until(end_char)
+		return data
+
+	# all data received so far, without waiting
+	def readall(self):
+		self.receive()
+		return self.take(self.end)
+
+	# read until <expected> or until <size> bytes if not None, like Serial.read_until: returns what it has on timeout.
+	def read_until(self, expected='\n', size=None):
+		if isinstance(expected, str):
+			expected = expected.encode()
+		deadline = self.deadline()
+		searched = 0  # bytes after position already searched, except a possible partial match at the end
+		while True:
+			search_end = self.end
+			if size is not None:
+				search_end = min(search_end, self.position + size)
+			found = self.buffer.find(expected, self.position + searched, search_end)
+			if found >= 0:
+				return self.take(found + len(expected))
+			if size is not None and search_end == self.position + size:
+				return self.take(search_end)
+			searched = max(0, search_end - self.position - len(expected) + 1)
+			if not self.receive_more(deadline):
+				return self.take(self.end)
+
+	def get_timeout(self):
+		return self.timeout
+
+	def set_timeout(self, timeout):
+		self.timeout = timeout
+
+
+# byte ring buffer between one writer thread and one reader thread, without locks: only the writer changes
+# written and only the reader changes read_count, each after copying its data.
+class ByteRing:
+	def __init__(self, size):
+		self.size = size
+		self.buffer = bytearray(size)
+		self.written = 0  # bytes written since the start
+		self.read_count = 0  # bytes read since the start
+
+	def available(self):
+		return self.written - self.read_count
+
+	# writer side: add as much of data as fits, returns how much that was
+	def write(self, data):
+		length = min(len(data), self.size - self.available())
+		start = self.written % self.size
+		first = min(length, self.size - start)
+		self.buffer[start: start + first] = data[:first]
+		if length > first:  # wraps around
+			self.buffer[:length - first] = data[first:length]
+		self.written += length
+		return length
+
+	# reader side: move what is available into target, as much as fits. returns the length
+	def read_into(self, target):
+		length = min(self.available(), len(target))
+		start = self.read_count % self.size
+		first = min(length, self.size - start)
+		target[:first] = self.buffer[start: start + first]
+		if length > first:
+			target[first:length] = self.buffer[:length - first]
+		self.read_count += length
+		return length
+
+	# reader side: drop everything available
+	def clear(self):
+		self.read_count = self.written
+
+
+# serial connection where a background thread does the reading: it reads whatever the port has in large
+# reads into a ByteRing, so the UART buffer is emptied at full baud no matter how slowly messages are parsed.
+# read, read_until and readall are then served from memory instead of pyserial calls per byte or message.
+# fileno is a socket the thread signals on new data, so it can be waited on with select on Windows too.
+# errors in the thread, like the port being unplugged, are raised by read_ready, read and read_until once the data
+# read before them is used up.
+class ThreadedSerialConnection(BufferedStream, SerialConnection):
+	reader_thread = True
+
+	def __init__(self, port=None, baud=DEFAULT_BAUD, timeout=TIMEOUT_REGULAR, write_timeout=TIMEOUT_REGULAR,
+				 ring_size=SERIAL_RING_SIZE):
+		self.connection = serial.Serial(port, baud, timeout=SERIAL_THREAD_READ_TIMEOUT, write_timeout=write_timeout)
+		self.connection.reset_input_buffer()  # clear any old data when connecting
+		self.timeout = timeout
+		self.ring = ByteRing(ring_size)
+		self.init_buffer(64 * 1024)
+		self.error = None  # exception which stopped the thread
+		self.reads = 0
+		self.received_bytes = 0
+		self.overflow_bytes = 0  # read from the port but dropped because the ring was full
+		self.data_event = Event()  # for read and read_until waiting in this process
+		self.wake_receiver, self.wake_sender = socket.socketpair()  # for select
+		self.wake_receiver.setblocking(False)
+		self.signaled = False  # wake byte sent and not taken yet
+		self.closing = False
+		self.thread = Thread(target=self.read_thread, daemon=True)
+		self.thread.start()
+
+	def read_thread(self):
+		while not self.closing:
+			try:
+				# wait for a byte, then take everything else the port has with it
+				data = self.connection.read(1)
+				waiting = self.connection.in_waiting if data else 0
+				if waiting:
+					data += self.connection.read(waiting)
+			except Exception as e:
+				if not self.closing:
+					self.error = e
+					self.signal()
+				return
+			if data:
+				self.reads += 1
+				self.received_bytes += len(data)
+				self.overflow_bytes += len(data) - self.ring.write(data)
+				self.signal()
+
+	def signal(self):
+		self.data_event.set()
+		if not self.signaled:
+			self.signaled = True
+			try:
+				self.wake_sender.send(b"\0")
+			except OSError:  # closed
+				pass
+
+	# move what the thread read into buffer. False if there was nothing
+	def receive(self):
+		if self.signaled:
+			try:
+				while self.wake_receiver.recv(4096):
+					pass
+			except OSError:  # BlockingIOError when there is no more
+				pass
+			self.signaled = False  # after taking the wake bytes: new data from here on sends one
+		available = self.ring.available()
+		if not available:
+			return False
+		if len(self.buffer) - self.end < available:
+			self.make_room(available)
+		self.end += self.ring.read_into(self.view[self.end:])
+		return True
+
+	def wait_for_data(self, seconds):
+		if self.error:
+			raise self.error
+		self.data_event.wait(seconds)
+
+	def receive_more(self, deadline):
+		self.data_event.clear()  # before checking: data which comes after this sets it again
+		return super().receive_more(deadline)
+
+	def fileno(self):
+		return self.wake_receiver.fileno()
+
+	def read_ready(self):
+		if self.end > self.position or self.ring.available():
+			return True
+		if self.error:
+			raise self.error
+		return False
+
+	def reset_input_buffer(self):
+		if self.connection.is_open:
+			self.connection.reset_input_buffer()
+		self.ring.clear()
+		self.position = self.end = 0
+
+	def close(self):
+		self.closing = True
+		if hasattr(self.connection, "cancel_read"):
+			self.connection.cancel_read()
+		self.thread.join(2 * SERIAL_THREAD_READ_TIMEOUT + 1)
+		self.connection.close()
+		self.wake_receiver.close()
+		self.wake_sender.close()
+		self.view.release()
+
+	def __repr__(self):
+		return "ThreadedSerialConnection: "+str(self.connection)
+
+	def stats(self):
+		return {"reads": self.reads,
+				"received_bytes": self.received_bytes,
+				"buffered_bytes": self.ring.available() + self.end - self.position,
+				"overflow_bytes": self.overflow_bytes}
+
+
+# datagrams the OS dropped on a UDP socket because its receive buffer was full, from the drops column of
+# /proc/net/udp for the socket's inode. None where that isn't available (not linux).
+def udp_kernel_drops(sock):
+	try:
+		inode = os.fstat(sock.fileno()).st_ino
+		for path in ("/proc/net/udp", "/proc/net/udp6"):
+			with open(path) as table:
+				next(table)  # header
+				for line in table:
+					fields = line.split()
+					if int(fields[9]) == inode:
+						return int(fields[12])
+	except (OSError, ValueError, IndexError):
+		pass
+	return None
+
+
+# UDP as a byte stream like a serial port: each wakeup receives every waiting datagram (recv_into) straight into
+# one buffer which is reused, so read(n) and read_until can take any amount no matter how the data was split.
+# timeout 0 (the default) only takes what has already arrived.
+# timestamps: keep the kernel's receive time of each datagram (SO_TIMESTAMPNS, or the time it was read where the
+# OS doesn't have it), see arrival_time_ns.
+class UDPConnection(BufferedStream, Connection):
+	def __init__(self, remote_ip, remote_port, local_port, timeout=0, receive_buffer_size=UDP_RECEIVE_BUFFER_SIZE,
+				 timestamps=False):
 		self.remote_ip = remote_ip
 		self.remote_port = remote_port
 		self.local_port = local_port
+		self.timeout = timeout
 		self.sock = None
 		self.addr = (remote_ip, remote_port)
 		family_addr = socket.AF_INET
@@ -158,38 +462,87 @@ class UDPConnection(Connection):
 		#try:
 		# allow this to except and catch it at higher level
 		self.sock = socket.socket(family_addr, socket.SOCK_DGRAM)
+		try:  # room for bursts which arrive while we are not reading. the OS may give less, or count it double
+			self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer_size)
+		except OSError:
+			pass
+		self.receive_buffer_size = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
 		self.sock.bind(('', self.local_port))
 		self.sock.setblocking(False)
-		self.sock.settimeout(0) #needs to be 0 so readall gets only the available data, otherwise could read forever
 		# except socket.error:
 		# 	print('Failed to create socket')
 
-	def read(self, size=1):
-		try:
-			reply, addr = self.sock.recvfrom(size) # buffsize < message length will error
-			return reply
-		except Exception as e: #would be BlockingIOError when no data and timeout 0
-			return None
-		# need internal buffer to read smaller amounts?
-
-	# reads only one message up to length READ_SIZE
-	def read_one_message(self, start_char=None, end_char=None):
-		return self.read(READ_SIZE) #don't need the start and end char args for this
-
-	def readall(self):
-		all_data = b''
-		last_msg_data = self.read_one_message()
-		while last_msg_data:
-			all_data += last_msg_data
-			last_msg_data = self.read_one_message()
-		return all_data
-
-	def read_until(self, expected='\n', size=None):
-		# either need a sock read_until method, or loop reading one at a time until expected reached
-		return self.read(READ_SIZE) #temporary fix, should implement actual read_until
-		#pass
+		self.kernel_timestamps = False
+		if timestamps and SO_TIMESTAMPNS is not None:
+			try:
+				self.sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+				self.kernel_timestamps = True
+			except OSError:
+				pass
+		self.timestamps = timestamps
+		self.arrival_times = deque(maxlen=UDP_TIMESTAMP_HISTORY)  # (stream offset of the datagram, ns since epoch)
+
+		self.init_buffer(2 * UDP_MAX_DATAGRAM_SIZE)
+		self.datagrams = 0
+		self.received_bytes = 0
+		self.overflow_bytes = 0  # dropped because more than UDP_MAX_BUFFERED_BYTES was waiting to be read
+
+	# move all datagrams waiting in the socket into buffer. False if there were none
+	def receive(self):
+		received = False
+		while True:
+			if len(self.buffer) - self.end < UDP_MAX_DATAGRAM_SIZE:
+				self.make_room(UDP_MAX_DATAGRAM_SIZE)
+			try:
+				if self.timestamps:
+					length, ancillary, flags, address = self.sock.recvmsg_into([self.view[self.end:]], 64)
+				else:
+					length = self.sock.recv_into(self.view[self.end:])
+			except OSError:  # BlockingIOError when there is no more data
+				break
+			if self.timestamps:
+				self.arrival_times.append((self.received_bytes, self.kernel_time_ns(ancillary) or time.time_ns()))
+			self.end += length
+			self.datagrams += 1
+			self.received_bytes += length
+			received = True
+		overflow = self.end - self.position - UDP_MAX_BUFFERED_BYTES
+		if overflow > 0:  # nobody is reading: keep the newest data
+			self.overflow_bytes += overflow
+			self.position += overflow
+		return received
+
+	def kernel_time_ns(self, ancillary):
+		for level, kind, data in ancillary:
+			if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(data) >= TIMESPEC_STRUCT.size:
+				seconds, nanoseconds = TIMESPEC_STRUCT.unpack_from(data)
+				return seconds * 1000000000 + nanoseconds
+		return None
+
+	# stream offset of the next byte read: received_bytes counts from 0 when the connection was opened
+	def read_offset(self):
+		return self.received_bytes - (self.end - self.position)
+
+	# receive time (ns since epoch) of the datagram which had the byte at this stream offset.
+	# None if timestamps are off or it's older than the last UDP_TIMESTAMP_HISTORY datagrams.
+	def arrival_time_ns(self, offset):
+		for datagram_offset, time_ns in reversed(self.arrival_times):
+			if datagram_offset <= offset:
+				return time_ns
+		return None
+
+	def kernel_drops(self):
+		return udp_kernel_drops(self.sock)
+
+	def wait_for_data(self, seconds):
+		select.select([self.sock], [], [], seconds)
+
+	def fileno(self):
+		return self.sock.fileno()
 
 	def read_ready(self):
+		if self.end > self.position:
+			return True
 		reads, writes, errors = select.select([self.sock], [], [], 0)
 		return reads != []
 
@@ -197,74 +550,88 @@ class UDPConnection(Connection):
 		self.sock.sendto(data, self.addr)
 
 	def reset_input_buffer(self):
-		#no built in reset, so read the whole buffer
-		temp_timeout = self.sock.gettimeout()
-		self.sock.settimeout(0)
-		while True:
-			try:
-				self.sock.recv(1024)
-			except Exception as e:
-				#print(str(type(e))+": "+str(e))
-				break
-		self.sock.settimeout(temp_timeout)
+		self.receive()
+		self.position = self.end = 0
 
 	def open(self):
 		pass
 
 	def close(self):
+		self.view.release()
 		self.sock.close()
 
-	def __str__(self):
-		return type(self).__name__ +": "+str(self.__dict__)
+	def __str__(self):  # not the buffers
+		return type(self).__name__ +": "+str({"remote": self.addr, "local_port": self.local_port, "timeout": self.timeout})
+
+	def stats(self):
+		return {"datagrams": self.datagrams,
+				"received_bytes": self.received_bytes,
+				"buffered_bytes": self.end - self.position,
+				"overflow_bytes": self.overflow_bytes,
+				"kernel_drops": self.kernel_drops(),
+				"receive_buffer_size": self.receive_buffer_size}
 
 	# def set_port(self, port):
 	# 	pass
 	#
 	# def get_port(self):
 	# 	pass
-	#
-	# def set_timeout(self):
-	# 	pass
-	#
-	# def get_timeout(self):
-	# 	pass
 
 
 # fake a serial connection to read byte data from a file
 # does not use an actual or virtual com port, just writes/reads file.
+# reads the file in big blocks and serves read/read_until from memory.
+# compressed (.gz, .zst) logs and segment manifests are read as the original bytes.
 class FileReaderConnection(Connection):
 	# TODO check if it's ok for init to have different arguments. should it emulate timeout behavior?
 	def __init__(self, filename):
 		# open the file to read bytes
 		self.filename = filename
-		self.reader = open(filename, 'rb')
+		self.reader = open_log(filename)
+		self.buffer = b''
+		self.position = 0  # next unread byte in buffer
+
+	# add the next block of the file to the unread data. False at end of file.
+	def fill_buffer(self):
+		block = self.reader.read(FILE_READ_BLOCK_SIZE)
+		if not block:
+			return False
+		self.buffer = self.buffer[self.position:] + block
+		self.position = 0
+		return True
+
+	# unread data from position up to end, and move past it
+	def take(self, end):
+		data = self.buffer[self.position: end]
+		self.position = end
+		return data
 
 	# read <size> bytes from the file
 	def read(self, size=1):
-		return self.reader.read(size)
+		while len(self.buffer) - self.position < size and self.fill_buffer():
+			pass
+		return self.take(min(self.position + size, len(self.buffer)))
 
-	# read until <expected> or until <size> bytes if not None
+	# read until <expected> or until <size> bytes if not None. like Serial.read_until, but end of file acts as timeout:
+	# returns whatever was read, then b'' from then on.
 	def read_until(self, expected='\n', size_limit=2048):
-		out = b''
-		if size_limit is None:
-			while(True):
-				data = self.reader.read(1)
-				out += data
-				if data == b'':  # end of file - return b'' from then on, as if connection is timing out
-					return out
-				if out[-len(expected):] == expected:
-					break
-		else:
-			if size_limit < 1:
-				size_limit = 1  # match behavior of Serial.read_until
-			for i in range(size_limit):
-				data = self.reader.read(1)
-				out += data
-				if data == b'':
-					return out
-				if out[-len(expected):] == expected:
-					break
-		return out
+		if isinstance(expected, str):
+			expected = expected.encode()
+		if size_limit is not None and size_limit < 1:
+			size_limit = 1  # match behavior of Serial.read_until
+		searched = 0  # bytes after position already searched, except a possible partial match at the end
+		while True:
+			search_end = len(self.buffer)
+			if size_limit is not None:
+				search_end = min(search_end, self.position + size_limit)
+			found = self.buffer.find(expected, self.position + searched, search_end)
+			if found >= 0:
+				return self.take(found + len(expected))
+			if size_limit is not None and search_end == self.position + size_limit:
+				return self.take(search_end)
+			searched = max(0, search_end - self.position - len(expected) + 1)
+			if not self.fill_buffer():
+				return self.take(len(self.buffer))
 
 	def read_one_message(self, start_char=None, end_char=None):
 		before = self.read_until(start_char)
@@ -276,6 +643,59 @@ class FileReaderConnection(Connection):
 		self.reader.close()
 
 
+# FileReaderConnection on a memory map of the whole file, for very large logs.
+# no block copies: read and read_until slice the map directly, and the OS pages the file in and out.
+# compressed logs are decompressed into a temporary file first, which is mapped instead.
+class MappedFileReaderConnection(FileReaderConnection):
+	def __init__(self, filename):
+		self.filename = filename
+		self.reader = open_log_mappable(filename)
+		try:
+			self.buffer = mmap.mmap(self.reader.fileno(), 0, access=mmap.ACCESS_READ)
+		except ValueError:  # empty file can't be mapped
+			self.buffer = b''
+		self.position = 0
+
+	def fill_buffer(self):
+		return False  # whole file is already mapped
+
+	def close(self):
+		if isinstance(self.buffer, mmap.mmap):
+			self.buffer.close()
+		self.reader.close()
+
+
+# log file as a memory map, giving out memoryview slices of it instead of copies.
+# pages which were read are given back to the OS as it goes, so RSS stays flat even for multi-GB logs.
+# views handed out stay valid: dropped pages are read from the file again if used.
+class MappedLogConnection(MappedFileReaderConnection):
+	def __init__(self, filename):
+		super().__init__(filename)
+		self.view = memoryview(self.buffer)
+		self.released = 0  # pages before this were given back
+
+	def take(self, end):
+		data = self.view[self.position: end]
+		self.advance_to(end)
+		return data
+
+	# move past data which was used directly from view (like by mapped_log_frames)
+	def advance_to(self, position):
+		self.position = position
+		if self.position - self.released < MAPPED_RELEASE_SIZE or not hasattr(mmap, "MADV_DONTNEED"):
+			return
+		release_end = self.position - self.position % mmap.PAGESIZE
+		self.buffer.madvise(mmap.MADV_DONTNEED, self.released, release_end - self.released)
+		self.released = release_end
+
+	def close(self):
+		self.view.release()
+		try:
+			super().close()
+		except BufferError:  # messages still hold views of the map: it closes when the last one is gone
+			self.reader.close()
+
+
 # connection for writing bytes to a file - could use this to test message forming
 class FileWriterConnection(Connection):
 	def __init__(self, filename):
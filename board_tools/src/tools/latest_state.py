@@ -0,0 +1,144 @@
+import struct
+import os
+from multiprocessing import shared_memory, resource_tracker
+try:  # importing from inside the package
+    from message_types import COMPACT_MESSAGE_CLASSES
+except ModuleNotFoundError:  # importing from outside the package
+    from tools.message_types import COMPACT_MESSAGE_CLASSES
+
+#latest decoded message of each type, in a shared memory block with a fixed layout.
+#io_loop parses each message once and writes its fields here. readers in other processes get a consistent copy
+#of the latest fields without parsing or locks:
+#   state = LatestState(name)  # name from the process which created it: state.name
+#   sequence, ins_message = state.read(b'INS')  # ins_message is None until the first INS
+#
+#layout, little endian: one slot per type at the offsets in state.offsets.
+#slot: sequence (uint64), msgtype (3 bytes), one flag byte per field (1 if the message had it), then the fields.
+#the sequence is odd while the writer is changing the slot, and goes up by 2 per message (seqlock).
+#readers copy the slot and retry if the sequence was odd or changed during the copy.
+
+# fields stored for each type: "d" for float, "q" for int. fields a message doesn't have are flagged as missing.
+LATEST_STATE_FIELDS = {
+    b'INS': [("imu_time_ms", "d"), ("gps_time_ns", "q"), ("ins_solution_status", "q"), ("lat_deg", "d"),
+             ("lon_deg", "d"), ("alt_m", "d"), ("velocity_north_mps", "d"), ("velocity_east_mps", "d"),
+             ("velocity_down_mps", "d"), ("roll_deg", "d"), ("pitch_deg", "d"), ("heading_deg", "d"),
+             ("zupt_flag", "q")],
+    b'GPS': [("imu_time_ms", "d"), ("gps_time_ns", "q"), ("lat_deg", "d"), ("lon_deg", "d"),
+             ("alt_ellipsoid_m", "d"), ("alt_msl_m", "d"), ("speed_mps", "d"), ("heading_deg", "d"),
+             ("accuracy_horizontal_m", "d"), ("accuracy_vertical_m", "d"), ("PDOP", "d"), ("gnss_fix_type", "q"),
+             ("num_sats", "q"), ("speed_accuracy_mps", "d"), ("heading_accuracy_deg", "d"),
+             ("carrier_solution_status", "q")],
+    b'IMU': [("imu_time_ms", "d"), ("sync_time_ms", "d"), ("accel_x_g", "d"), ("accel_y_g", "d"), ("accel_z_g", "d"),
+             ("angrate_x_dps", "d"), ("angrate_y_dps", "d"), ("angrate_z_dps", "d"), ("fog_angrate_x_dps", "d"),
+             ("fog_angrate_y_dps", "d"), ("fog_angrate_z_dps", "d"), ("odometer_speed_mps", "d"),
+             ("odometer_time_ms", "d"), ("temperature_c", "d")],
+    b'HDG': [("imu_time_ms", "d"), ("gps_time_ns", "q"), ("relPosN_m", "d"), ("relPosE_m", "d"), ("relPosD_m", "d"),
+             ("relPosLen_m", "d"), ("relPosHeading_deg", "d"), ("relPosLenAcc_m", "d"), ("relPosHeadingAcc_deg", "d"),
+             ("flags", "q"), ("gnssFixOK", "q"), ("diffSoln", "q"), ("relPosValid", "q"), ("carrSoln", "q"),
+             ("isMoving", "q"), ("refPosMiss", "q"), ("refObsMiss", "q"), ("relPosHeading_Valid", "q"),
+             ("relPos_Normalized", "q")],
+}
+LATEST_STATE_FIELDS[b'GP2'] = LATEST_STATE_FIELDS[b'GPS']
+
+# slot for each msgtype. IM1 shares the IMU slot, its msgtype in the slot tells them apart.
+LATEST_STATE_SLOTS = {b'INS': b'INS', b'GPS': b'GPS', b'GP2': b'GP2', b'IMU': b'IMU', b'IM1': b'IMU', b'HDG': b'HDG'}
+
+SEQUENCE_STRUCT = struct.Struct("<Q")
+INT_FIELD_MIN, INT_FIELD_MAX = -2 ** 63, 2 ** 63 - 1  # "q" range: larger values, like an all ones uint64, are missing
+
+
+class LatestStateSlot:
+    def __init__(self, fields, offset):
+        self.names = [name for name, code in fields]
+        self.converters = [float if code == "d" else int for name, code in fields]
+        self.is_int = [code == "q" for name, code in fields]
+        self.offset = offset
+        # fields go after the sequence: msgtype, flags, values
+        self.struct = struct.Struct("<3s" + "?" * len(fields) + "".join(code for name, code in fields))
+        self.sequence = 0  # writer's count, so it doesn't read back from the block
+
+    def size(self):
+        return SEQUENCE_STRUCT.size + self.struct.size
+
+
+class LatestState:
+    # no name: create a new block. name: attach to the block another process created.
+    # child_process is for the io_loop Process of the creator, which shares its shared memory tracking.
+    def __init__(self, name=None, child_process=False):
+        self.slots = {}
+        self.offsets = {}
+        offset = 0
+        for msgtype, fields in LATEST_STATE_FIELDS.items():
+            self.slots[msgtype] = LatestStateSlot(fields, offset)
+            self.offsets[msgtype] = offset
+            offset += -(-self.slots[msgtype].size() // 8) * 8  # keep each sequence 8 byte aligned
+        self.creator = name is None
+        if self.creator:
+            self.memory = shared_memory.SharedMemory(create=True, size=offset)  # starts as zeros: no messages
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            if os.name == "posix" and not child_process:
+                # otherwise this process's tracker removes the block when it exits, while the creator still uses it
+                resource_tracker.unregister(self.memory._name, "shared_memory")
+        self.name = self.memory.name
+        self.buffer = self.memory.buf
+        for slot in self.slots.values():  # continue the sequences if a new writer attaches
+            slot.sequence = SEQUENCE_STRUCT.unpack_from(self.buffer, slot.offset)[0] & ~1
+
+    # when passed to a Process: attach by name there
+    def __reduce__(self):
+        return (LatestState, (self.name, True))
+
+    # writer side: store a valid message's fields. only one process should write.
+    def update(self, message):
+        msgtype = LATEST_STATE_SLOTS.get(message.msgtype)
+        if msgtype is None:
+            return
+        slot = self.slots[msgtype]
+        flags, values = [], []
+        for name, converter, is_int in zip(slot.names, slot.converters, slot.is_int):
+            value = getattr(message, name, None)
+            try:
+                value = converter(value)  # int of inf raises OverflowError, of nan ValueError
+                if is_int and not INT_FIELD_MIN <= value <= INT_FIELD_MAX:
+                    raise OverflowError(f"{name} out of range")
+                values.append(value)
+                flags.append(True)
+            except (TypeError, ValueError, OverflowError):
+                values.append(converter())
+                flags.append(False)
+        SEQUENCE_STRUCT.pack_into(self.buffer, slot.offset, slot.sequence + 1)
+        slot.struct.pack_into(self.buffer, slot.offset + SEQUENCE_STRUCT.size, message.msgtype, *flags, *values)
+        slot.sequence += 2
+        SEQUENCE_STRUCT.pack_into(self.buffer, slot.offset, slot.sequence)
+
+    # sequence of the latest message of this type, 0 if none yet. check this to see if there is a new one.
+    def sequence(self, msgtype):
+        return SEQUENCE_STRUCT.unpack_from(self.buffer, self.slots[LATEST_STATE_SLOTS[msgtype]].offset)[0]
+
+    # reader side: (sequence, message) for the latest message of this type, message is None if none yet.
+    def read(self, msgtype):
+        slot = self.slots[LATEST_STATE_SLOTS[msgtype]]
+        while True:
+            sequence = SEQUENCE_STRUCT.unpack_from(self.buffer, slot.offset)[0]
+            if sequence % 2:
+                continue  # being written
+            values = slot.struct.unpack_from(self.buffer, slot.offset + SEQUENCE_STRUCT.size)
+            if SEQUENCE_STRUCT.unpack_from(self.buffer, slot.offset)[0] == sequence:
+                break
+        if sequence == 0:
+            return 0, None
+        message_msgtype, flags, values = values[0], values[1: len(slot.names) + 1], values[len(slot.names) + 1:]
+        message = COMPACT_MESSAGE_CLASSES[message_msgtype]()
+        message.valid = True
+        message.msgtype = message_msgtype
+        for name, present, value in zip(slot.names, flags, values):
+            if present:
+                setattr(message, name, value)
+        return sequence, message
+
+    def close(self):
+        self.buffer = None
+        self.memory.close()
+        if self.creator:
+            self.memory.unlink()
@@ -0,0 +1,292 @@
+import numpy as np
+try:  # importing from inside the package
+    from class_configs.rtcm_scheme_config import *
+    from class_configs.binary_scheme_config import *
+    from class_configs.readable_scheme_config import HEADING_FLAGS
+    from message_scheme import PayloadFormat
+    from rtcm_scheme import RTCM_PAYLOAD_FORMATS, RTCM_IMU_FORMAT_WITH_SYNC, RTCM_IMU_FORMAT_NO_SYNC, CRC24Q_TABLE
+    from log_files import open_log, is_compressed_log
+except ModuleNotFoundError:  # importing from outside the package
+    from tools.class_configs.rtcm_scheme_config import *
+    from tools.class_configs.binary_scheme_config import *
+    from tools.class_configs.readable_scheme_config import HEADING_FLAGS
+    from tools.message_scheme import PayloadFormat
+    from tools.rtcm_scheme import RTCM_PAYLOAD_FORMATS, RTCM_IMU_FORMAT_WITH_SYNC, RTCM_IMU_FORMAT_NO_SYNC, CRC24Q_TABLE
+    from tools.log_files import open_log, is_compressed_log
+
+#decode a whole RTCM or binary log at once into numpy structured arrays, one per message type.
+#for offline work on big logs: no Message object per frame.
+#   arrays = decode_log_to_arrays("output.txt")
+#   arrays[b'IMU']["accel_x_g"], arrays[b'INS']["lat_deg"], ...
+
+SEARCH_CHUNK_BYTES = 64 * 1024 * 1024  # search for preambles this much at a time to limit temporary arrays
+DECODE_BATCH_FRAMES = 100000  # frames gathered into one array at a time
+
+# struct codes -> numpy type codes, same sizes as struct standard sizes
+STRUCT_TO_NUMPY = {'b': 'i1', 'B': 'u1', 'h': 'i2', 'H': 'u2', 'i': 'i4', 'I': 'u4', 'l': 'i4', 'L': 'u4',
+                   'q': 'i8', 'Q': 'u8'}
+
+BINARY_PAYLOAD_FORMATS = {
+    BINARY_MSGTYPE_IMU: PayloadFormat(BINARY_FORMAT_IMU, BINARY_ENDIAN, NUMBER_TYPES),
+    BINARY_MSGTYPE_INS: PayloadFormat(BINARY_FORMAT_INS, BINARY_ENDIAN, NUMBER_TYPES),
+    BINARY_MSGTYPE_GPS: PayloadFormat(BINARY_FORMAT_GPS, BINARY_ENDIAN, NUMBER_TYPES),
+    BINARY_MSGTYPE_GP2: PayloadFormat(BINARY_FORMAT_GP2, BINARY_ENDIAN, NUMBER_TYPES),
+    BINARY_MSGTYPE_HDG: PayloadFormat(BINARY_FORMAT_HDG, BINARY_ENDIAN, NUMBER_TYPES),
+}
+
+CRC24Q_TABLE_ARRAY = np.array(CRC24Q_TABLE, dtype=np.uint32)
+
+
+#numpy dtype for the raw (unscaled) payload of a PayloadFormat
+def payload_dtype(payload_format):
+    endian_char = payload_format.struct.format[0]
+    codes = payload_format.struct.format[1:]
+    return np.dtype([(name, endian_char + STRUCT_TO_NUMPY[code]) for name, code in zip(payload_format.names, codes)])
+
+
+#read the log and decode it. log_format is "rtcm" or "binary", or None to detect it.
+#returns {msgtype: structured array}, with msgtype like b'IMU' to match Message.msgtype
+def decode_log_to_arrays(path, log_format=None):
+    if is_compressed_log(path):  # .gz, .zst or a segment manifest
+        with open_log(path) as reader:
+            data = np.frombuffer(reader.read(), dtype=np.uint8)
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+    return decode_buffer_to_arrays(data, log_format)
+
+
+def decode_buffer_to_arrays(data, log_format=None):
+    data = np.frombuffer(data, dtype=np.uint8)
+    if log_format == "rtcm":
+        return decode_rtcm_arrays(data)
+    elif log_format == "binary":
+        return decode_binary_arrays(data)
+    elif log_format is None:
+        # whichever format finds more valid frames
+        rtcm_arrays = decode_rtcm_arrays(data)
+        binary_arrays = decode_binary_arrays(data)
+        rtcm_count = sum(len(a) for a in rtcm_arrays.values())
+        binary_count = sum(len(a) for a in binary_arrays.values())
+        return rtcm_arrays if rtcm_count >= binary_count else binary_arrays
+    else:
+        raise ValueError(f"unknown format {log_format}, must be rtcm or binary")
+
+
+#positions of a 1 or 2 byte preamble, searched in chunks
+def find_preambles(data, preamble):
+    found = []
+    for chunk_start in range(0, len(data), SEARCH_CHUNK_BYTES):
+        chunk = data[chunk_start: chunk_start + SEARCH_CHUNK_BYTES + len(preamble) - 1]
+        matches = chunk[:len(chunk) - len(preamble) + 1] == preamble[0]
+        for i in range(1, len(preamble)):
+            matches &= chunk[i:len(chunk) - len(preamble) + 1 + i] == preamble[i]
+        found.append(np.flatnonzero(matches) + chunk_start)
+    if not found:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(found).astype(np.int64)
+
+
+#frames as rows of a 2D array. all starts must have the same length
+def gather_rows(data, starts, length):
+    return np.lib.stride_tricks.sliding_window_view(data, length)[starts]
+
+
+#drop frames which start inside the previous frame (preamble byte inside a payload that also passed the check)
+def drop_overlaps(starts, ends):
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    keep = np.ones(len(starts), dtype=bool)
+    keep[1:] = starts[1:] >= ends[:-1]
+    return starts[keep], ends[keep]
+
+
+def rtcm_crc_passes(rows):
+    crc = np.zeros(len(rows), dtype=np.uint32)
+    for column in rows.T:
+        crc = ((crc << 8) & 0xFFFFFF) ^ CRC24Q_TABLE_ARRAY[(crc >> 16) ^ column]
+    return crc == 0
+
+
+def binary_checksum_passes(rows):
+    # checksum a is the sum of type/length/payload bytes, b is the sum of the running sums of a
+    summed = rows[:, :-BINARY_CRC_LEN].astype(np.int64)
+    weights = np.arange(summed.shape[1], 0, -1)
+    checksum_a = summed.sum(axis=1) % 256
+    checksum_b = (summed * weights).sum(axis=1) % 256
+    return (checksum_a == rows[:, -2]) & (checksum_b == rows[:, -1])
+
+
+#find valid RTCM frames: preamble, known Anello subtype, length fits, CRC passes
+#returns starts, subtypes and payload lengths of the valid frames
+def find_rtcm_frames(data):
+    header_length = len(RTCM_PREAMBLE) + LENGTH_LENGTH + TYPE_LENGTH
+    starts = find_preambles(data, RTCM_PREAMBLE)
+    starts = starts[starts + header_length + RTCM_CRC_LEN <= len(data)]
+    header = np.zeros(len(starts), dtype=np.uint32)
+    for i in range(1, header_length):
+        header = (header << 8) | data[starts + i]
+    reserved, rtcm_length = header >> 26, (header >> 16) & 0x3FF
+    company_code, subtype = (header >> 4) & 0xFFF, header & 0xF
+    frame_lengths = (header_length - TYPE_LENGTH + rtcm_length + RTCM_CRC_LEN).astype(np.int64)
+    known_type = np.isin(subtype, [RTCM_MSGTYPE_IMU] + list(RTCM_PAYLOAD_FORMATS))
+    plausible = (reserved == 0) & (company_code == ANELLO_IDENTIFIER) & known_type & (starts + frame_lengths <= len(data))
+    starts, frame_lengths = starts[plausible], frame_lengths[plausible]
+
+    valid = np.zeros(len(starts), dtype=bool)
+    for length in np.unique(frame_lengths):
+        group = np.flatnonzero(frame_lengths == length)
+        for batch in np.array_split(group, max(1, len(group) // DECODE_BATCH_FRAMES)):
+            valid[batch] = rtcm_crc_passes(gather_rows(data, starts[batch], length))
+    starts, ends = drop_overlaps(starts[valid], starts[valid] + frame_lengths[valid])
+    frame_lengths = ends - starts
+    subtypes = data[starts + header_length - 1] & 0xF
+    return starts, subtypes, frame_lengths - header_length - RTCM_CRC_LEN
+
+
+#find valid binary frames: preamble, known type, length fits, checksum passes
+#returns starts, msgtypes and payload lengths of the valid frames
+def find_binary_frames(data):
+    header_length = len(BINARY_PREAMBLE) + BINARY_TYPE_LENGTH + BINARY_LENGTH_LENGTH
+    starts = find_preambles(data, BINARY_PREAMBLE)
+    starts = starts[starts + header_length + BINARY_CRC_LEN <= len(data)]
+    msgtypes = data[starts + len(BINARY_PREAMBLE)]
+    payload_lengths = data[starts + len(BINARY_PREAMBLE) + BINARY_TYPE_LENGTH].astype(np.int64)
+    frame_lengths = header_length + payload_lengths + BINARY_CRC_LEN
+    plausible = np.isin(msgtypes, list(BINARY_PAYLOAD_FORMATS)) & (starts + frame_lengths <= len(data))
+    starts, frame_lengths = starts[plausible], frame_lengths[plausible]
+
+    valid = np.zeros(len(starts), dtype=bool)
+    for length in np.unique(frame_lengths):
+        group = np.flatnonzero(frame_lengths == length)
+        for batch in np.array_split(group, max(1, len(group) // DECODE_BATCH_FRAMES)):
+            # checksum covers type, length and payload: skip the preamble
+            valid[batch] = binary_checksum_passes(gather_rows(data, starts[batch] + len(BINARY_PREAMBLE), length - len(BINARY_PREAMBLE)))
+    starts, ends = drop_overlaps(starts[valid], starts[valid] + frame_lengths[valid])
+    frame_lengths = ends - starts
+    msgtypes = data[starts + len(BINARY_PREAMBLE)]
+    return starts, msgtypes, frame_lengths - header_length - BINARY_CRC_LEN
+
+
+#decode frames of one payload format: gather the payloads, view as the raw dtype, then scale as vectors
+#returns a dict of name -> column
+def decode_payload_columns(data, payload_starts, payload_format):
+    raw_dtype = payload_dtype(payload_format)
+    raw_parts = []
+    for batch in np.array_split(payload_starts, max(1, len(payload_starts) // DECODE_BATCH_FRAMES)):
+        rows = np.ascontiguousarray(gather_rows(data, batch, payload_format.size))
+        raw_parts.append(np.frombuffer(rows, dtype=raw_dtype))
+    raw = np.concatenate(raw_parts) if raw_parts else np.zeros(0, dtype=raw_dtype)
+    columns = {}
+    for name, scale in zip(payload_format.names, payload_format.scales):
+        columns[name] = raw[name] * scale if scale != 1 else raw[name].astype(raw_dtype[name].newbyteorder("="))
+    return columns
+
+
+#extra fields the schemes compute after decoding, done on whole columns
+def add_time_ms_columns(columns):
+    for ns_name in ["imu_time_ns", "odometer_time_ns", "sync_time_ns"]:
+        if ns_name in columns:
+            columns[ns_name[:-3] + "_ms"] = columns[ns_name] / 1e6
+
+
+def add_heading_flag_columns(columns):
+    flags = columns["flags"].astype(np.int64)
+    for bit, flag_name in HEADING_FLAGS.items():
+        columns[flag_name] = (flags >> bit) & 1
+    columns["carrSoln"] = 2 * columns["carrSoln_bit2"] + columns["carrSoln_bit1"]
+
+
+def columns_to_structured(columns):
+    names = list(columns)
+    dtype = np.dtype([(name, columns[name].dtype) for name in names])
+    length = len(columns[names[0]]) if names else 0
+    out = np.empty(length, dtype=dtype)
+    for name in names:
+        out[name] = columns[name]
+    return out
+
+
+#combine decoded parts of one msgtype (like IMU with and without sync time) in log order.
+#fields missing from a part are 0 for integers, nan for floats.
+def merge_parts(parts):
+    if len(parts) == 1:
+        return columns_to_structured(parts[0][1])
+    starts = np.concatenate([part_starts for part_starts, columns in parts])
+    order = np.argsort(starts, kind="stable")
+    merged = {}
+    for part_starts, columns in parts:
+        for name, column in columns.items():
+            merged.setdefault(name, column.dtype)
+    merged_columns = {}
+    for name, dtype in merged.items():
+        pieces = []
+        for part_starts, columns in parts:
+            if name in columns:
+                pieces.append(columns[name])
+            else:
+                pieces.append(np.full(len(part_starts), np.nan if dtype.kind == "f" else 0, dtype=dtype))
+        merged_columns[name] = np.concatenate(pieces)[order]
+    return columns_to_structured(merged_columns)
+
+
+def decode_rtcm_arrays(data):
+    data = np.frombuffer(data, dtype=np.uint8)
+    starts, subtypes, payload_lengths = find_rtcm_frames(data)
+    payload_offset = len(RTCM_PREAMBLE) + LENGTH_LENGTH + TYPE_LENGTH
+    parts = {}
+    for subtype in np.unique(subtypes):
+        in_type = subtypes == subtype
+        if subtype == RTCM_MSGTYPE_IMU:
+            # with/without sync time by payload length, same as RTCM_Scheme
+            with_sync = payload_lengths >= RTCM_IMU_FORMAT_WITH_SYNC.size
+            no_sync = (payload_lengths >= RTCM_IMU_FORMAT_NO_SYNC.size) & ~with_sync
+            groups = [(in_type & with_sync, RTCM_IMU_FORMAT_WITH_SYNC), (in_type & no_sync, RTCM_IMU_FORMAT_NO_SYNC)]
+        else:
+            payload_format = RTCM_PAYLOAD_FORMATS[subtype]
+            groups = [(in_type & (payload_lengths >= payload_format.size), payload_format)]
+        for selected, payload_format in groups:
+            if not selected.any():
+                continue
+            columns = decode_payload_columns(data, starts[selected] + payload_offset, payload_format)
+            add_time_ms_columns(columns)
+            if subtype == RTCM_MSGTYPE_HEADING:
+                add_heading_flag_columns(columns)
+            if subtype == RTCM_MSGTYPE_GPS:
+                # GPS or GP2 by antenna id, like RTCM_Scheme
+                antenna_1 = columns["antenna_id"] == 0
+                for msgtype, rows in [(b'GPS', antenna_1), (b'GP2', ~antenna_1)]:
+                    if rows.any():
+                        row_columns = {name: column[rows] for name, column in columns.items()}
+                        parts.setdefault(msgtype, []).append((starts[selected][rows], row_columns))
+            else:
+                parts.setdefault(EQUIVALENT_MESSAGE_TYPES[subtype], []).append((starts[selected], columns))
+    return {msgtype: merge_parts(type_parts) for msgtype, type_parts in parts.items()}
+
+
+def decode_binary_arrays(data):
+    data = np.frombuffer(data, dtype=np.uint8)
+    starts, msgtypes, payload_lengths = find_binary_frames(data)
+    payload_offset = len(BINARY_PREAMBLE) + BINARY_TYPE_LENGTH + BINARY_LENGTH_LENGTH
+    arrays = {}
+    for binary_msgtype in np.unique(msgtypes):
+        payload_format = BINARY_PAYLOAD_FORMATS[binary_msgtype]
+        selected = (msgtypes == binary_msgtype) & (payload_lengths >= payload_format.size)
+        if not selected.any():
+            continue
+        columns = decode_payload_columns(data, starts[selected] + payload_offset, payload_format)
+        add_time_ms_columns(columns)
+        if "carrsoln_and_fix" in columns:
+            columns["carrier_solution_status"] = columns["carrsoln_and_fix"] // 16
+            columns["gnss_fix_type"] = columns["carrsoln_and_fix"] % 16
+        if binary_msgtype == BINARY_MSGTYPE_IMU:
+            # MEMS ranges: 5 bits accel range, 11 bits rate range, like Binary_Scheme
+            columns["accel_range"] = columns["mems_ranges"] // pow(2, 11)
+            columns["rate_range"] = columns["mems_ranges"] - (columns["accel_range"] * pow(2, 11))
+            for accel_name in ["accel_x_g", "accel_y_g", "accel_z_g"]:
+                columns[accel_name] = columns["accel_range"] * columns[accel_name]
+            for rate_name in ["angrate_x_dps", "angrate_y_dps", "angrate_z_dps"]:
+                columns[rate_name] = columns["rate_range"] * columns[rate_name]
+        if binary_msgtype == BINARY_MSGTYPE_HDG:
+            add_heading_flag_columns(columns)
+        arrays[BINARY_EQUIVALENT_MESSAGE_TYPES[binary_msgtype]] = columns_to_structured(columns)
+    return arrays
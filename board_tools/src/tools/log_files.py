@@ -0,0 +1,189 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+try:  # zstd is optional: without the zstandard package, logs use gzip and .zst logs can't be read
+    import zstandard
+except ModuleNotFoundError:
+    zstandard = None
+
+#compressed and rotated log files.
+#SegmentedLogFile is written like a file, but compresses as it writes and can start a new segment file after
+#some size or time. rotated logs get a manifest listing the segments in order:
+#   log = SegmentedLogFile("logs/a1_log.txt", compression="gzip", rotate_bytes=100 * 1024 * 1024)
+#   -> logs/a1_log_0001.txt.gz, logs/a1_log_0002.txt.gz, ... and logs/a1_log_manifest.json
+#
+#open_log opens any of those for reading as the original bytes: plain, .gz, .zst, or a manifest for all its segments.
+
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+MANIFEST_SUFFIX = "_manifest.json"
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def zstd_available():
+    return zstandard is not None
+
+
+class SegmentedLogFile:
+    # compression: None, "gzip" or "zstd" ("zstd" uses gzip if zstandard isn't installed)
+    # rotate_bytes, rotate_seconds: start a new segment after this much data or time. both None: one file.
+    def __init__(self, path, compression=None, rotate_bytes=None, rotate_seconds=None):
+        if compression == "zstd" and not zstd_available():
+            compression = "gzip"
+        if compression is not None and compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError(f"unknown compression {compression}, must be gzip, zstd or None")
+        self.path = path
+        self.compression = compression
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.rotating = rotate_bytes is not None or rotate_seconds is not None
+        self.segments = []  # manifest entry for each segment, the last one is open
+        self.raw = None
+        self.stream = None
+        self.open_segment()
+
+    def segment_path(self, number):
+        if not self.rotating:
+            return self.path + COMPRESSION_EXTENSIONS.get(self.compression, "")
+        stem, extension = os.path.splitext(self.path)
+        return f"{stem}_{number:04d}{extension}" + COMPRESSION_EXTENSIONS.get(self.compression, "")
+
+    def manifest_path(self):
+        return os.path.splitext(self.path)[0] + MANIFEST_SUFFIX
+
+    def open_segment(self):
+        path = self.segment_path(len(self.segments) + 1)
+        self.raw = open(path, 'wb')
+        # the compressed stream writes into raw. raw is kept to fsync and close it
+        if self.compression == "gzip":
+            self.stream = gzip.GzipFile(filename=os.path.basename(path)[:-len(".gz")], mode='wb', fileobj=self.raw,
+                                        compresslevel=GZIP_LEVEL)
+        elif self.compression == "zstd":
+            self.stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = self.raw
+        self.segment_start = time.time()
+        self.segment_bytes = 0
+        self.segments.append({"file": os.path.basename(path), "start_time": self.segment_start, "end_time": None,
+                              "bytes": 0})
+
+    def close_segment(self):
+        if self.stream is not self.raw:
+            self.stream.close()  # writes the end of the compressed stream
+        if not self.raw.closed:
+            self.raw.flush()
+            os.fsync(self.raw.fileno())
+            self.raw.close()
+        segment = self.segments[-1]
+        segment["end_time"] = time.time()
+        segment["bytes"] = self.segment_bytes
+        segment["stored_bytes"] = os.path.getsize(os.path.join(os.path.dirname(self.path), segment["file"]))
+
+    def write_manifest(self):
+        manifest = {"log": os.path.basename(self.path), "compression": self.compression, "segments": self.segments}
+        temp_path = self.manifest_path() + ".tmp"
+        with open(temp_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(temp_path, self.manifest_path())  # readers never see a half written manifest
+
+    def rotate_due(self):
+        if self.rotate_bytes is not None and self.segment_bytes >= self.rotate_bytes:
+            return True
+        return self.rotate_seconds is not None and time.time() - self.segment_start >= self.rotate_seconds
+
+    # segments can split a message: read them back in order (or through the manifest) to get it whole.
+    def write(self, data):
+        if self.rotating and self.segment_bytes and self.rotate_due():
+            self.close_segment()
+            self.open_segment()
+            self.write_manifest()
+        self.stream.write(data)
+        self.segment_bytes += len(data)
+        return len(data)
+
+    def flush(self):
+        self.stream.flush()
+        if self.stream is not self.raw:
+            self.raw.flush()
+
+    def fileno(self):
+        return self.raw.fileno()
+
+    def close(self):
+        self.close_segment()
+        if self.rotating:
+            self.write_manifest()
+
+    # files written so far, in order
+    def files(self):
+        return [os.path.join(os.path.dirname(self.path), segment["file"]) for segment in self.segments]
+
+
+# segment files of a manifest, in order
+def manifest_files(manifest_path):
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+    location = os.path.dirname(manifest_path)
+    return [os.path.join(location, segment["file"]) for segment in manifest["segments"]]
+
+
+def is_compressed_log(path):
+    return path.endswith(MANIFEST_SUFFIX) or any(path.endswith(extension) for extension in COMPRESSION_EXTENSIONS.values())
+
+
+# reads the files one after another, like one file
+class ChainedLogReader(io.RawIOBase):
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                if not self.paths:
+                    return 0
+                self.current = open_log(self.paths.pop(0))
+            count = self.current.readinto(buffer)
+            if count:
+                return count
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        super().close()
+
+
+# open a log for reading its original bytes: plain, .gz, .zst, or a _manifest.json for all its segments
+def open_log(path):
+    if path.endswith(MANIFEST_SUFFIX):
+        return io.BufferedReader(ChainedLogReader(manifest_files(path)))
+    if path.endswith(COMPRESSION_EXTENSIONS["gzip"]):
+        return gzip.open(path, 'rb')
+    if path.endswith(COMPRESSION_EXTENSIONS["zstd"]):
+        if not zstd_available():
+            raise ModuleNotFoundError("reading .zst logs needs the zstandard package: pip install zstandard")
+        return zstandard.open(path, 'rb')
+    return open(path, 'rb')
+
+
+# file with the original bytes of the log which can be memory mapped: the log itself if it's not compressed,
+# otherwise a temporary file it was decompressed into, which is deleted when closed.
+def open_log_mappable(path):
+    if not is_compressed_log(path):
+        return open(path, 'rb')
+    decompressed = tempfile.TemporaryFile()
+    with open_log(path) as reader:
+        shutil.copyfileobj(reader, decompressed, 1024 * 1024)
+    decompressed.flush()
+    decompressed.seek(0)
+    return decompressed
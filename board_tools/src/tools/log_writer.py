@@ -0,0 +1,117 @@
+import os
+import queue
+import time
+from threading import Thread
+
+#write a log file from a background thread, so slow disks don't hold up reading the data connection.
+#write() only queues the buffer. the thread joins whatever is queued into large blocks and writes those:
+#   writer = LogWriter(open(path, 'wb'), fsync_bytes=4 * 1024 * 1024)
+#   writer.write(data)  # False if the queue was full and the buffer was dropped
+#   writer.close()  # writes everything still queued, then closes the file
+
+LOG_QUEUE_MAX_BUFFERS = 10000  # buffers waiting to be written. when full, new buffers are dropped and counted
+LOG_WRITE_BLOCK_SIZE = 1024 * 1024  # join queued buffers into writes up to about this size
+LOG_FLUSH_SECONDS = 1  # flush written data to the OS at least this often, so the file size shows progress
+
+
+class LogWriter:
+    # fsync_bytes, fsync_seconds: fsync after this much data or this long since the last fsync. both None: only on close.
+    def __init__(self, file, fsync_bytes=None, fsync_seconds=None, max_buffers=LOG_QUEUE_MAX_BUFFERS,
+                 block_size=LOG_WRITE_BLOCK_SIZE):
+        self.file = file
+        self.fsync_bytes = fsync_bytes
+        self.fsync_seconds = fsync_seconds
+        self.block_size = block_size
+        self.queue = queue.Queue(max_buffers)
+        self.start_time = time.time()
+        self.written_bytes = 0
+        self.write_count = 0
+        self.fsync_count = 0
+        self.dropped_buffers = 0
+        self.dropped_bytes = 0
+        self.error = None  # first write error: the thread stops writing after one
+        self.thread = Thread(target=self.write_thread, daemon=True)
+        self.thread.start()
+
+    # queue a buffer to write. doesn't wait: if the queue is full, the buffer is dropped.
+    def write(self, data):
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except queue.Full:
+            self.dropped_buffers += 1
+            self.dropped_bytes += len(data)
+            return False
+
+    # write everything queued so far, then close the file
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+
+    def stats(self):
+        elapsed = time.time() - self.start_time
+        return {"queued_buffers": self.queue.qsize(),
+                "written_bytes": self.written_bytes,
+                "write_bytes_per_second": self.written_bytes / elapsed if elapsed > 0 else 0,
+                "writes": self.write_count,
+                "fsyncs": self.fsync_count,
+                "dropped_buffers": self.dropped_buffers,
+                "dropped_bytes": self.dropped_bytes,
+                "error": self.error}
+
+    # wait time for the next buffer: wake up in time for any flush or fsync that is due
+    def wait_seconds(self, last_flush_time, last_fsync_time, unflushed, unsynced_bytes):
+        due = []
+        if unflushed:
+            due.append(last_flush_time + LOG_FLUSH_SECONDS)
+        if unsynced_bytes and self.fsync_seconds is not None:
+            due.append(last_fsync_time + self.fsync_seconds)
+        return max(0, min(due) - time.time()) if due else None
+
+    def write_thread(self):
+        last_flush_time = last_fsync_time = time.time()
+        unflushed = False  # written, but not flushed to the OS yet
+        unsynced_bytes = 0
+        closing = False
+        while not closing:
+            # take one buffer, then whatever else is already queued, up to about block_size
+            block = []
+            block_length = 0
+            try:
+                data = self.queue.get(timeout=self.wait_seconds(last_flush_time, last_fsync_time, unflushed, unsynced_bytes))
+                while True:
+                    if data is None:
+                        closing = True
+                        break
+                    block.append(data)
+                    block_length += len(data)
+                    if block_length >= self.block_size:
+                        break
+                    data = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                if block and not self.error:
+                    self.file.write(block[0] if len(block) == 1 else b"".join(block))
+                    self.written_bytes += block_length
+                    self.write_count += 1
+                    unsynced_bytes += block_length
+                    unflushed = True
+                now = time.time()
+                fsync_due = unsynced_bytes > 0 and (closing or (self.fsync_bytes is not None and unsynced_bytes >= self.fsync_bytes)
+                                                    or (self.fsync_seconds is not None and now - last_fsync_time >= self.fsync_seconds))
+                if unflushed and (fsync_due or now - last_flush_time >= LOG_FLUSH_SECONDS):
+                    self.file.flush()
+                    last_flush_time = now
+                    unflushed = False
+                if fsync_due:
+                    os.fsync(self.file.fileno())
+                    self.fsync_count += 1
+                    last_fsync_time = now
+                    unsynced_bytes = 0
+            except Exception as e:  # like disk full: keep taking buffers so write() and close() still work
+                self.error = str(e)
+                unflushed = False
+                unsynced_bytes = 0
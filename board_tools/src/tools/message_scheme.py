@@ -1,9 +1,21 @@
 from abc import ABC, abstractmethod
+import copy
+import struct
 
 
 # message encoding scheme - can be $-type or aa4412 - type
 class Scheme(ABC):
 
+    # keep_raw: keep the frame data (raw_data, data, payload, checksum_input) on compact message types after parsing
+    # lazy: decode payload fields of data messages when one is first read, not while parsing. checksum, type etc. are
+    # still checked while parsing, so msgtype and valid can be used without decoding anything. only for fixed size
+    # payloads (rtcm, binary) whose length check means they decode: ascii always decodes while parsing.
+    # checked_frames: frames come from StreamFramer, which already checked the rtcm crc and binary checksum.
+    def __init__(self, keep_raw=False, lazy=True, checked_frames=False):
+        self.keep_raw = keep_raw
+        self.lazy = lazy
+        self.checked_frames = checked_frames
+
     def read_one_message(self, connection):
         pass
 
@@ -11,10 +23,25 @@ class Scheme(ABC):
         pass
 
     def parse_message(self, data):
-        m = Message()
+        m = self.new_message(data)
         self.set_fields_general(m, data)
+        if not self.keep_raw and hasattr(type(m), "drop_raw") and getattr(m, "valid", False):
+            m.drop_raw()  # invalid messages keep it for debugging
         return m
 
+    # empty message for this frame. schemes can pick a compact class by message type from the frame header
+    def new_message(self, data):
+        return Message()
+
+    # run decode(message, *args) now, or when a field of the message is first read if lazy
+    def decode_fields(self, message, decode, *args):
+        if not self.lazy:
+            decode(message, *args)
+            return
+        # views into a framer buffer or a mapped log can change or close before then: keep a copy of those
+        args = [bytes(arg) if isinstance(arg, memoryview) and not isinstance(arg.obj, bytes) else arg for arg in args]
+        message.decode_later(decode, *args)
+
     def set_fields_general(self, message, data):
         pass
 
@@ -40,16 +67,103 @@ class Scheme(ABC):
         pass
 
 
+# payload fields decoded on first access. decode_later stores the decode call, then reading any field which
+# is not set runs it once. fields set while parsing (msgtype, valid, ...) are read without decoding.
+class LazyFields:
+    __slots__ = ()
+
+    def decode_later(self, decode, *args):
+        self._pending_decode = (decode, args)
+
+    def decode_pending(self):
+        try:
+            decode, args = self._pending_decode
+        except AttributeError:
+            return
+        del self._pending_decode
+        decode(self, *args)
+
+    # only called when the normal lookup fails
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            self._pending_decode
+        except AttributeError:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'") from None
+        self.decode_pending()
+        return object.__getattribute__(self, name)
+
+
 # one message: has fields, can be valid or invalid
-class Message:
+class Message(LazyFields):
 
     def __init__(self, var_dict={}):
         for name in var_dict:
             setattr(self, name, var_dict[name])
 
+    # all fields which are set. same as for the compact message types
+    def fields(self):
+        self.decode_pending()
+        return dict(self.__dict__)
+
     def __str__(self):
-        return "Message: " + str(self.__dict__)
+        return "Message: " + str(self.fields())
 
     def __repr__(self):
-        return "Message: " + str(self.__dict__)
+        return "Message: " + str(self.fields())
+
+    # payload, data etc. can be memoryviews into a frame or mapped log, which deepcopy can't do: copy those as bytes
+    def __deepcopy__(self, memo):
+        copied = Message()
+        for name, value in self.fields().items():
+            copied.__dict__[name] = bytes(value) if isinstance(value, memoryview) else copy.deepcopy(value, memo)
+        return copied
+
+
+
+# payload format compiled once from a list of (name, struct code, optional scale) tuples.
+# the whole payload unpacks with one struct.Struct call, then the scale factors are applied.
+class PayloadFormat:
+
+    def __init__(self, format_list, endian="little", type_codes=None):
+        self.format_list = format_list
+        self.names = []
+        self.scales = []
+        format_str = "<" if endian == "little" else ">"
+        for item in format_list:
+            if len(item) == 3:
+                name, format_code, scale = item
+            elif len(item) == 2:
+                name, format_code = item
+                scale = 1
+            else:
+                continue
+            if type_codes:  # type names like "uint16" -> struct codes
+                format_code = type_codes[format_code]
+            format_str += format_code
+            self.names.append(name)
+            self.scales.append(scale)
+        self.struct = struct.Struct(format_str)
+        self.size = self.struct.size
+        # only multiply the fields which have a scale
+        self.scaled_fields = [(i, scale) for i, scale in enumerate(self.scales) if scale != 1]
 
+    def __repr__(self):
+        return "PayloadFormat: " + self.struct.format + " " + str(self.names)
+
+    # unpack all fields from data (bytes or any buffer), scaled. raises struct.error if data is too short
+    def unpack_scaled(self, data, offset=0):
+        values = list(self.struct.unpack_from(data, offset))
+        for i, scale in self.scaled_fields:
+            values[i] *= scale
+        return values
+
+    # put the scaled fields on the message as attributes. compact messages keep fields in slots, not __dict__
+    def set_fields(self, message, data, offset=0):
+        values = self.unpack_scaled(data, offset)
+        if type(message) is Message:
+            message.__dict__.update(zip(self.names, values))
+        else:
+            for name, value in zip(self.names, values):
+                setattr(message, name, value)
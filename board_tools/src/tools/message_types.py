@@ -0,0 +1,112 @@
+import copy
+try:  # importing from inside the package
+    from class_configs.readable_scheme_config import FORMAT_IMU_NO_SYNC, FORMAT_IMU_WITH_SYNC, FORMAT_IMU_3FOG, FORMAT_IM1, \
+        FORMAT_INS, FORMAT_INS_EXTRA_COMMA, FORMAT_GPS, FORMAT_HDG, HEADING_FLAGS
+    from class_configs.rtcm_scheme_config import RTCM_IMU_PAYLOAD_FIELDS_WITH_SYNC, RTCM_IMU_PAYLOAD_FIELDS_NO_SYNC, \
+        RTCM_IM1_PAYLOAD_FIELDS, RTCM_INS_PAYLOAD_FIELDS, RTCM_GPS_PAYLOAD_FIELDS, RTCM_DUAL_ANT_HEAD_FIELDS
+    from class_configs.binary_scheme_config import BINARY_FORMAT_IMU, BINARY_FORMAT_INS, BINARY_FORMAT_GPS, BINARY_FORMAT_HDG
+    from message_scheme import LazyFields
+except ModuleNotFoundError:  # importing from outside the package
+    from tools.class_configs.readable_scheme_config import FORMAT_IMU_NO_SYNC, FORMAT_IMU_WITH_SYNC, FORMAT_IMU_3FOG, FORMAT_IM1, \
+        FORMAT_INS, FORMAT_INS_EXTRA_COMMA, FORMAT_GPS, FORMAT_HDG, HEADING_FLAGS
+    from tools.class_configs.rtcm_scheme_config import RTCM_IMU_PAYLOAD_FIELDS_WITH_SYNC, RTCM_IMU_PAYLOAD_FIELDS_NO_SYNC, \
+        RTCM_IM1_PAYLOAD_FIELDS, RTCM_INS_PAYLOAD_FIELDS, RTCM_GPS_PAYLOAD_FIELDS, RTCM_DUAL_ANT_HEAD_FIELDS
+    from tools.class_configs.binary_scheme_config import BINARY_FORMAT_IMU, BINARY_FORMAT_INS, BINARY_FORMAT_GPS, BINARY_FORMAT_HDG
+    from tools.message_scheme import LazyFields
+
+#compact classes for the streaming message types: fields in __slots__ instead of a __dict__ per message.
+#used like Message: getattr/hasattr/setattr on the same field names. any field not listed still works,
+#it goes in a __dict__ which is only made for messages that need it.
+
+# frame data which the schemes only need while parsing. dropped after parsing unless the scheme has keep_raw.
+RAW_FIELDS = ["raw_data", "data", "payload", "checksum_input"]
+
+# set by all schemes, or added later like delta_t from Collector
+COMMON_FIELDS = RAW_FIELDS + ["valid", "error", "msgtype", "talker", "checksum", "payload_length", "company_code",
+                              "rtcm_msgtype", "binary_msgtype", "imu_time_ms", "delta_t"]
+
+# ascii "time" and "degrees" fields are split into parts
+SPLIT_FIELD_SUFFIXES = {"time": ["_hours", "_minutes", "_seconds"], "degrees": ["_degrees", "_minutes"]}
+
+
+# field names in format lists of (name, type) or (name, type, scale), in order, without repeats.
+# names which can't be slots (like "extra comma") are left out and go in __dict__.
+def field_names(format_lists, extra_fields=[]):
+    names = []
+    for format_list in format_lists:
+        for item in format_list:
+            suffixes = SPLIT_FIELD_SUFFIXES.get(item[1], [""]) if isinstance(item[1], str) else [""]
+            names.extend(item[0] + suffix for suffix in suffixes)
+    names.extend(extra_fields)
+    return list(dict.fromkeys(name for name in names if name.isidentifier() and name not in COMMON_FIELDS))
+
+
+class CompactMessage(LazyFields):
+    __slots__ = COMMON_FIELDS + ["_pending_decode", "__dict__"]
+
+    def __init__(self, var_dict={}):
+        for name in var_dict:
+            setattr(self, name, var_dict[name])
+
+    # all fields which are set, like Message.__dict__
+    def fields(self):
+        self.decode_pending()
+        fields = {}
+        for name, slot in self.field_slots:
+            try:
+                fields[name] = slot.__get__(self)  # slot directly, so unset ones don't go through __getattr__
+            except AttributeError:
+                pass
+        fields.update(self.__dict__)
+        return fields
+
+    def __str__(self):
+        return "Message: " + str(self.fields())
+
+    def __repr__(self):
+        return "Message: " + str(self.fields())
+
+    # memoryview fields can't be deep copied: copy those as bytes
+    def __deepcopy__(self, memo):
+        copied = type(self)()
+        for name, value in self.fields().items():
+            setattr(copied, name, bytes(value) if isinstance(value, memoryview) else copy.deepcopy(value, memo))
+        return copied
+
+    # drop the frame data after parsing, the decoded fields don't refer to it
+    def drop_raw(self):
+        for name in RAW_FIELDS:
+            try:
+                delattr(self, name)
+            except AttributeError:
+                pass
+
+
+# class with slots for every field in the format lists, for one message type
+def compact_message_class(class_name, format_lists, extra_fields=[]):
+    slots = field_names(format_lists, extra_fields)
+    message_class = type(class_name, (CompactMessage,), {"__slots__": slots})
+    message_class.field_names = COMMON_FIELDS + slots
+    message_class.field_slots = [(name, getattr(message_class, name)) for name in message_class.field_names]
+    return message_class
+
+
+ImuMessage = compact_message_class("ImuMessage",
+    [FORMAT_IMU_WITH_SYNC, FORMAT_IMU_NO_SYNC, FORMAT_IMU_3FOG, RTCM_IMU_PAYLOAD_FIELDS_WITH_SYNC,
+     RTCM_IMU_PAYLOAD_FIELDS_NO_SYNC, BINARY_FORMAT_IMU],
+    ["sync_time_ms", "odometer_time_ms", "accel_range", "rate_range"])
+
+ImuOneMessage = compact_message_class("ImuOneMessage", [FORMAT_IM1, RTCM_IM1_PAYLOAD_FIELDS],
+    ["sync_time_ms", "odometer_time_ms"])
+
+InsMessage = compact_message_class("InsMessage", [FORMAT_INS, FORMAT_INS_EXTRA_COMMA, RTCM_INS_PAYLOAD_FIELDS, BINARY_FORMAT_INS])
+
+GpsMessage = compact_message_class("GpsMessage", [FORMAT_GPS, RTCM_GPS_PAYLOAD_FIELDS, BINARY_FORMAT_GPS],
+    ["carrier_solution_status", "gnss_fix_type"])
+
+HdgMessage = compact_message_class("HdgMessage", [FORMAT_HDG, RTCM_DUAL_ANT_HEAD_FIELDS, BINARY_FORMAT_HDG],
+    list(HEADING_FLAGS.values()) + ["carrSoln"])
+
+# class for each message type as the schemes name it (b'GPS' and b'GP2' share one)
+COMPACT_MESSAGE_CLASSES = {b'IMU': ImuMessage, b'IM1': ImuOneMessage, b'INS': InsMessage, b'GPS': GpsMessage,
+                           b'GP2': GpsMessage, b'HDG': HdgMessage}
@@ -1,12 +1,24 @@
 try:  # importing from inside the package
     from message_scheme import Scheme, Message
+    from message_types import COMPACT_MESSAGE_CLASSES
     from class_configs.readable_scheme_config import *
     from connection import *
 except ModuleNotFoundError:  # importing from outside the package
     from tools.message_scheme import Scheme, Message
+    from tools.message_types import COMPACT_MESSAGE_CLASSES
     from tools.class_configs.readable_scheme_config import *
     from tools.connection import *
 
+#payload formats of the data messages, by number of fields when there are several
+DATA_PAYLOAD_FORMATS = {
+    b'IMU': [FORMAT_IMU_WITH_SYNC, FORMAT_IMU_NO_SYNC, FORMAT_IMU_3FOG],
+    b'IM1': [FORMAT_IM1],
+    b'INS': [FORMAT_INS, FORMAT_INS_EXTRA_COMMA],
+    b'GPS': [FORMAT_GPS],
+    b'GP2': [FORMAT_GP2],
+    b'HDG': [FORMAT_HDG],
+}
+
 
 # b'AA' -> 170
 def ascii_to_int(x):
@@ -49,9 +61,7 @@ class ReadableScheme(Scheme):
         # else:
         #     pass #TODO if no end code, could handle partial read or give an error
         #if data:
-        message = Message()
-        self.set_fields_general(message, data)
-        return message
+        return self.parse_message(data)
 
     # def read_message_from_file(self, input_file):
     #     # if (not hasattr(self, "reader")) or self.reader is None:
@@ -85,29 +95,68 @@ class ReadableScheme(Scheme):
         #print("sending: "+data.decode()) #debug message creation
         connection.write(data)
 
+    # message type is after the start code and talker
+    def new_message(self, data):
+        type_index = (len(READABLE_START) if data[:len(READABLE_START)] == READABLE_START else 0) + READABLE_TALKER_LENGTH
+        return COMPACT_MESSAGE_CLASSES.get(bytes(data[type_index: type_index + READABLE_TYPE_LENGTH]), Message)()
+
     def set_fields_general(self, message, data):
         try:
-
-            if data[:len(READABLE_START)] == READABLE_START: #chop off start code if present
-                data = data[len(READABLE_START):]
-            if data[-len(READABLE_END):] == READABLE_END: #chop off end code if present
-                data = data[:-len(READABLE_END)]
-
-            #message.data = data
-            sep_index = data.find(READABLE_CHECKSUM_SEPARATOR)
+            # data can be any buffer like a memoryview of a log. payload fields are split as bytes, so one copy
+            # for a view, none for bytes. the rest works with indexes and views instead of slicing at each step.
+            data = bytes(data)
+            start = len(READABLE_START) if data.startswith(READABLE_START) else 0 #skip start code if present
+            end = len(data) - len(READABLE_END) if data.endswith(READABLE_END) else len(data) #and end code
+            view = memoryview(data)
+
+            sep_index = data.find(READABLE_CHECKSUM_SEPARATOR, start, end)
+            if sep_index < 0:
+                raise ValueError("no checksum separator")
             checksum_start_index = sep_index + len(READABLE_CHECKSUM_SEPARATOR)
-            checksum_end_index = checksum_start_index + READABLE_CHECKSUM_LENGTH
+            checksum_end_index = min(checksum_start_index + READABLE_CHECKSUM_LENGTH, end)
 
-            message.data = data[:checksum_end_index] #take off any extras after checksum
-            message.checksum_input = data[:sep_index]
+            message.data = view[start: checksum_end_index] #take off any extras after checksum
+            message.checksum_input = view[start: sep_index]
             message.checksum = ascii_to_int(data[checksum_start_index:checksum_end_index]) #int(data[sep_index+len(READABLE_PAYLOAD_SEPARATOR):], 16) #it has bytes which read as the hex value
 
             #could split these from data or from message.checksum_input
-            message.talker = data[0: READABLE_TALKER_LENGTH]
-            message.msgtype = data[READABLE_TALKER_LENGTH: READABLE_TALKER_LENGTH + READABLE_TYPE_LENGTH]
-            message.payload = data[READABLE_TALKER_LENGTH + READABLE_TYPE_LENGTH + len(READABLE_PAYLOAD_SEPARATOR): sep_index]
+            type_index = start + READABLE_TALKER_LENGTH
+            message.talker = data[start: type_index]
+            message.msgtype = data[type_index: type_index + READABLE_TYPE_LENGTH]
+            message.payload = data[type_index + READABLE_TYPE_LENGTH + len(READABLE_PAYLOAD_SEPARATOR): sep_index]
             if self.check_valid(message):
-                self.decode_payload_for_type(message, message.msgtype, message.payload)
+                #data messages are decoded now too, even with lazy: a field which doesn't convert makes the message
+                #invalid, which can only be known by converting it. lazy applies to the rtcm and binary schemes.
+                if message.msgtype in DATA_PAYLOAD_FORMATS:
+                    msg_format = self.data_payload_format(message.msgtype, message.payload)
+                    if msg_format is None:
+                        message.valid = False
+                        message.error = f"unexpected length for {message.msgtype.decode()}: {message.payload.count(READABLE_PAYLOAD_SEPARATOR)}"
+                    else:
+                        self.decode_data_payload(message, msg_format, message.payload)
+                else:
+                    self.decode_payload_for_type(message, message.msgtype, message.payload)
+        except Exception as err:
+            message.valid = False
+            message.error = "Parsing Error: "+str(err)
+
+    #format for a data message payload by its number of fields, None if it doesn't fit any.
+    #types with one format can leave fields off the end, like decode_payload_for_type allows
+    def data_payload_format(self, msgtype, payload):
+        num_fields = payload.count(READABLE_PAYLOAD_SEPARATOR) + 1
+        formats = DATA_PAYLOAD_FORMATS[msgtype]
+        if len(formats) == 1:
+            return formats[0] if num_fields <= len(formats[0]) else None
+        for msg_format in formats:
+            if num_fields == len(msg_format):
+                return msg_format
+        return None
+
+    def decode_data_payload(self, message, msg_format, payload):
+        try:
+            self.set_fields_from_list(message, msg_format, payload)
+            if message.msgtype == b'HDG':
+                extract_flags_HDG(message)
         except Exception as err:
             message.valid = False
             message.error = "Parsing Error: "+str(err)
@@ -137,7 +186,7 @@ class ReadableScheme(Scheme):
                 message.error = None
             return message.valid
         except Exception as err:
-            print("exception checking message with data: "+str(message.data)+" , len = "+str(len(message.data)))
+            print("exception checking message with data: "+str(bytes(message.data))+" , len = "+str(len(message.data)))
             message.valid = False
             message.error = "Check Error: "+str(err)
 
@@ -166,6 +215,7 @@ class ReadableScheme(Scheme):
             b'INS': self.set_payload_fields_INS,
             b'VEH': self.set_payload_fields_with_names,
             b'SEN': self.set_payload_fields_with_names,
+            b'GAP': self.set_payload_fields_GAP,
         }
         decoderFunc = decoders.get(msgtype)
         if decoderFunc:
@@ -191,6 +241,7 @@ class ReadableScheme(Scheme):
             b'PNG': self.build_payload_no_fields,
             b'ECH': self.build_payload_ECH,
             b'ODO': self.build_payload_fields_ODO,
+            b'GAP': self.build_payload_GAP,
         }
         encoderFunc = encoders.get(msgtype)
         if encoderFunc:
@@ -294,6 +345,9 @@ class ReadableScheme(Scheme):
     def set_payload_fields_ODO(self, message, payload):
         self.set_fields_from_list(message, FORMAT_ODO, payload)
 
+    def set_payload_fields_GAP(self, message, payload):
+        self.set_fields_from_list(message, FORMAT_GAP, payload)
+
     #config message: mode is read or write
     #write has name, value pairs:   APCFG,w,odr,100,msg,IMU  is CFG with mode = write, odr = 10, msg = IMU
     #read has names only:           APCFG,r,odr,msg     is CFG with odr, msg
@@ -327,6 +381,9 @@ class ReadableScheme(Scheme):
 
     def build_payload_fields_ODO(self, message):
         return str(message.speed).encode()
+
+    def build_payload_GAP(self, message):
+        return f"{message.lost_time_s:.3f},{message.reconnect_time_s:.3f},{message.reconnects}".encode()
     
     def build_payload_INI(self, message):
         payload = b""
@@ -1,18 +1,19 @@
 from ctypes import *
 import os
 import struct
-from bitstring import Bits
-from pyrtcm import RTCMReader, crc2bytes, calc_crc24q
+from pyrtcm import RTCMReader
 try:  # importing from inside the package
     from pyrtcm import RTCMReader, RTCMParseError
     from pyrtcm.rtcmtypes_core import ERR_RAISE, ERR_LOG, ERR_IGNORE
     from class_configs.rtcm_scheme_config import * #TODO make config file with fomats
     from readable_scheme import extract_flags_HDG
-    from message_scheme import Scheme, Message
+    from message_scheme import Scheme, Message, PayloadFormat
+    from message_types import COMPACT_MESSAGE_CLASSES
 except ModuleNotFoundError:  # importing from outside the package
     from tools.class_configs.rtcm_scheme_config import *
     from tools.readable_scheme import extract_flags_HDG
-    from tools.message_scheme import Scheme, Message
+    from tools.message_scheme import Scheme, Message, PayloadFormat
+    from tools.message_types import COMPACT_MESSAGE_CLASSES
 
 #decoder for RTCM-style binary messages
 
@@ -20,13 +21,63 @@ except ModuleNotFoundError:  # importing from outside the package
 #   Preamble    |   Reserved    |   Length  |   payload |   CRC
 #   0xD3        | 000000 (6 bit)|   10 bits |           |   3 byte
 
+# payload formats compiled once, so each message decodes with a single unpack
+RTCM_IMU_FORMAT_WITH_SYNC = PayloadFormat(RTCM_IMU_PAYLOAD_FIELDS_WITH_SYNC, ENDIAN)
+RTCM_IMU_FORMAT_NO_SYNC = PayloadFormat(RTCM_IMU_PAYLOAD_FIELDS_NO_SYNC, ENDIAN)
+RTCM_PAYLOAD_FORMATS = {
+    RTCM_MSGTYPE_IM1: PayloadFormat(RTCM_IM1_PAYLOAD_FIELDS, ENDIAN),
+    RTCM_MSGTYPE_INS: PayloadFormat(RTCM_INS_PAYLOAD_FIELDS, ENDIAN),
+    RTCM_MSGTYPE_GPS: PayloadFormat(RTCM_GPS_PAYLOAD_FIELDS, ENDIAN),
+    RTCM_MSGTYPE_HEADING: PayloadFormat(RTCM_DUAL_ANT_HEAD_FIELDS, ENDIAN),
+}
+# shortest payload each type can decode, checked with the frame so lazy decoding can't fail on length later
+RTCM_PAYLOAD_MIN_SIZES = {msgtype: payload_format.size for msgtype, payload_format in RTCM_PAYLOAD_FORMATS.items()}
+RTCM_PAYLOAD_MIN_SIZES[RTCM_MSGTYPE_IMU] = RTCM_IMU_FORMAT_NO_SYNC.size
+
+
+#split the 4 header bytes after the preamble with shifts instead of bit strings
+#returns reserved (6 bit), length (10 bit), company code (12 bit), subtype (4 bit)
+def decode_rtcm_header(frame):
+    header = int.from_bytes(frame[1: 1 + LENGTH_LENGTH + TYPE_LENGTH], "big")
+    return header >> 26, (header >> 16) & 0x3FF, (header >> 4) & 0xFFF, header & 0xF
+
+
+def _make_crc24q_table():
+    table = []
+    for i in range(256):
+        crc = i << 16
+        for j in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= RTCM_CRC24Q_POLY
+        table.append(crc & 0xFFFFFF)
+    return table
+
+
+CRC24Q_TABLE = _make_crc24q_table()
+
+
+#table-driven CRC-24Q on bytes or memoryview. over a whole frame including its 3 CRC bytes, result is 0 if valid.
+def crc24q(data):
+    crc = 0
+    table = CRC24Q_TABLE
+    for octet in data:
+        crc = ((crc << 8) & 0xFFFFFF) ^ table[(crc >> 16) ^ octet]
+    return crc
+
+
+# compact message class by the 16 bit message number + subtype after the length
+RTCM_MESSAGE_CLASSES = {(ANELLO_IDENTIFIER << 4) | subtype: COMPACT_MESSAGE_CLASSES[msgtype]
+                        for subtype, msgtype in EQUIVALENT_MESSAGE_TYPES.items() if msgtype in COMPACT_MESSAGE_CLASSES}
+RTCM_TYPE_INDEX = len(RTCM_PREAMBLE) + LENGTH_LENGTH
+
 
 class RTCM_Scheme(Scheme):
     def read_one_message(self, connection):
+        message = Message()
         try:
             stream = RTCMReader(connection)
-            message = Message()
-            self.set_fields_general(message, stream.read()[0])
+            message = self.parse_message(stream.read()[0])
         except:
             # TODO be more specific about exception
             pass
@@ -41,7 +92,7 @@ class RTCM_Scheme(Scheme):
         try:
             raw, parsed = self.reader.read()
             if raw:
-                self.set_fields_general(message, raw)
+                message = self.parse_message(raw)
             elif parsed is None:  # end of file returns (raw = None, parsed = None)
                 return None
             else:  # errors could return (None, Error Code) but should raise RTCMParseERROR if using ERR_RAISE
@@ -55,59 +106,64 @@ class RTCM_Scheme(Scheme):
             message.error = "parsing error: "+str(e)
         return message
 
+    def new_message(self, data):
+        message_number = int.from_bytes(data[RTCM_TYPE_INDEX: RTCM_TYPE_INDEX + TYPE_LENGTH], "big")
+        return RTCM_MESSAGE_CLASSES.get(message_number, Message)()
+
     #   Preamble    |   Reserved    |   Length  | msgtype               |   payload     |   CRC
     #   0xD3        | 000000 (6 bit)|   10 bits | 12+4 bit = 2 bytes    |variable length|   3 byte
 
     def set_fields_general(self, message, raw_data):
         #split into preamble/lentgh/payload/crc , then check_valid
         try:
-            #message.data = data
-            full_data = raw_data[1:]
-            length_and_reserved = Bits(full_data[0: LENGTH_LENGTH]) #6 bit reserved zeros, 10 bit lenght - separate them too?
-            type_and_subtype = Bits(full_data[LENGTH_LENGTH: LENGTH_LENGTH + TYPE_LENGTH])  # 12+4 bit = 2 bytes. TODO - split them?
-            #print(f"type_and_subtype = {type_and_subtype}")
-
-            #split reserved/payload length
-            reserved, rtcm_length = Bits(bin=length_and_reserved.bin[:6]).uint, Bits(bin=length_and_reserved.bin[6:]).uint
+            # slice through a memoryview so nothing is copied, whether raw_data is bytes or a view of a log
+            view = memoryview(raw_data)
+            reserved, rtcm_length, company_code, msgtype = decode_rtcm_header(view)
             payload_length = rtcm_length - TYPE_LENGTH #if rtcm length includes the whole "data message", payload is smaller
             message.payload_length = payload_length
 
-            #split type/subtype
-            company_code, msgtype = Bits(bin=type_and_subtype.bin[:12]).uint, Bits(bin=type_and_subtype.bin[12:]).uint
             message.company_code = company_code
             message.rtcm_msgtype = msgtype
 
-            message.payload = full_data[LENGTH_LENGTH + TYPE_LENGTH: LENGTH_LENGTH + TYPE_LENGTH + payload_length]
-            checksum_bytes = full_data[LENGTH_LENGTH + TYPE_LENGTH + payload_length:
-                                  LENGTH_LENGTH + TYPE_LENGTH + payload_length + RTCM_CRC_LEN]
+            payload_start = len(RTCM_PREAMBLE) + LENGTH_LENGTH + TYPE_LENGTH
+            checksum_start = payload_start + payload_length
+            message.payload = view[payload_start: checksum_start]
+            checksum_bytes = view[checksum_start: checksum_start + RTCM_CRC_LEN]
 
             #message.data: up to expected end, ignore extras after. should it do anythinig with the extras?
             message.raw_data = raw_data
-            message.data = full_data[0: LENGTH_LENGTH + TYPE_LENGTH + payload_length + RTCM_CRC_LEN]
+            message.data = view[len(RTCM_PREAMBLE): checksum_start + RTCM_CRC_LEN]
             message.checksum = int.from_bytes(checksum_bytes, ENDIAN, signed=True)
             #message.checksum_input = message.rtcm_msgtype + payload_length_b + message.payload #TODO - what goes into checksum?
-            if self.check_valid(message):
-                self.decode_payload_for_type(message, message.rtcm_msgtype, message.payload)
-
             #tag as message types equivalent to ascii messages, including GPS/GP2 depending on gps message antenna id
             message.msgtype = EQUIVALENT_MESSAGE_TYPES.get(msgtype, b'Unknown')
-            if msgtype == RTCM_MSGTYPE_GPS and hasattr(message, "antenna_id"):
-                message.msgtype = b'GPS' if message.antenna_id == 0 else b'GP2'
-
-            #imu time ns to ms conversion: keep both on the message
-            if hasattr(message, "imu_time_ns"):
-                message.imu_time_ms = message.imu_time_ns / 1e6
-            if hasattr(message, "odometer_time_ns"):
-                message.odometer_time_ms = message.odometer_time_ns / 1e6
-            if hasattr(message, "sync_time_ns"):
-                message.sync_time_ms = message.sync_time_ns / 1e6
-            #TODO - tag delta t by message type too?
+            if self.check_valid(message):
+                if msgtype == RTCM_MSGTYPE_GPS:
+                    #GPS/GP2 is in the payload, so decode it now
+                    self.decode_payload(message, msgtype, message.payload)
+                    if hasattr(message, "antenna_id"):
+                        message.msgtype = b'GPS' if message.antenna_id == 0 else b'GP2'
+                else:
+                    self.decode_fields(message, self.decode_payload, msgtype, message.payload)
 
         except Exception as e:
             #print(f"error in set_fields_general for data: {full_data}")
             #print(e)
             message.valid=False
 
+    #payload fields and the ones computed from them
+    def decode_payload(self, message, msgtype, payload):
+        self.decode_payload_for_type(message, msgtype, payload)
+
+        #imu time ns to ms conversion: keep both on the message
+        if hasattr(message, "imu_time_ns"):
+            message.imu_time_ms = message.imu_time_ns / 1e6
+        if hasattr(message, "odometer_time_ns"):
+            message.odometer_time_ms = message.odometer_time_ns / 1e6
+        if hasattr(message, "sync_time_ns"):
+            message.sync_time_ms = message.sync_time_ns / 1e6
+        #TODO - tag delta t by message type too?
+
     def check_valid(self, message):
         try:
             if message.rtcm_msgtype not in RTCM_MESSAGE_TYPES:
@@ -126,12 +182,15 @@ class RTCM_Scheme(Scheme):
             elif not self.checksum_passes(message):
                 message.valid = False
                 message.error = "Checksum Fail"
+            elif message.payload_length < RTCM_PAYLOAD_MIN_SIZES.get(message.rtcm_msgtype, 0):
+                message.valid = False
+                message.error = "Length(unpack)"
             else:
                 message.valid = True
                 message.error = None
             return message.valid
         except Exception as err:
-            #print("exception checking message with data: "+str(message.data)+" , len = "+str(len(message.data)))
+            #print("exception checking message with data: "+str(bytes(message.data))+" , len = "+str(len(message.data)))
             message.valid = False
             message.error = "Check Error: "+str(err)
 
@@ -140,20 +199,15 @@ class RTCM_Scheme(Scheme):
         if message.rtcm_msgtype not in RTCM_MESSAGE_TYPES:
             return
         if message.rtcm_msgtype == RTCM_MSGTYPE_IMU:
-            self.set_fields_from_list_scaled(message, RTCM_IMU_PAYLOAD_FIELDS_WITH_SYNC, payload)
-            #if parse with one format fails, try the other (or should it decide using length?)
-            if not message.valid:
-                message.valid = True #need this or it will stay invalid. will be invalid again if second parse fails.
-                self.set_fields_from_list_scaled(message, RTCM_IMU_PAYLOAD_FIELDS_NO_SYNC, payload)
-        elif message.rtcm_msgtype == RTCM_MSGTYPE_IM1:
-            self.set_fields_from_list_scaled(message, RTCM_IM1_PAYLOAD_FIELDS, payload)
-        elif message.rtcm_msgtype == RTCM_MSGTYPE_INS:
-            self.set_fields_from_list_scaled(message, RTCM_INS_PAYLOAD_FIELDS, payload)
-        elif message.rtcm_msgtype == RTCM_MSGTYPE_GPS:
-            self.set_fields_from_list_scaled(message, RTCM_GPS_PAYLOAD_FIELDS, payload)
-        elif message.rtcm_msgtype == RTCM_MSGTYPE_HEADING:
-            self.set_fields_from_list_scaled(message, RTCM_DUAL_ANT_HEAD_FIELDS, payload)
-            extract_flags_HDG(message) #separate the heading flags in "flags" attribute, from ReadableScheme
+            #IMU with sync time is longer: pick the format by payload length
+            if len(payload) >= RTCM_IMU_FORMAT_WITH_SYNC.size:
+                self.set_fields_from_list_scaled(message, RTCM_IMU_FORMAT_WITH_SYNC, payload)
+            else:
+                self.set_fields_from_list_scaled(message, RTCM_IMU_FORMAT_NO_SYNC, payload)
+        elif message.rtcm_msgtype in RTCM_PAYLOAD_FORMATS:
+            self.set_fields_from_list_scaled(message, RTCM_PAYLOAD_FORMATS[message.rtcm_msgtype], payload)
+            if message.rtcm_msgtype == RTCM_MSGTYPE_HEADING:
+                extract_flags_HDG(message) #separate the heading flags in "flags" attribute, from ReadableScheme
 
         #do any computed fields like adjusting time units after?
 
@@ -176,46 +230,12 @@ class RTCM_Scheme(Scheme):
             message.error = "Length(unpack)"
 
     #version with optional scale factor as 3rd number of tuple in format_list
+    #format_list can be a list of tuples or an already compiled PayloadFormat
     def set_fields_from_list_scaled(self, message, format_list, data):
         try:
-            #print(f'Payload length: {message.payload_length}')
-            data_offset = 0
-            for item in format_list:
-                if len(item) == 3:
-                    name, format_code, scale = item
-                elif len(item) == 2:
-                    name, format_code = item
-                    scale = 1
-                else:
-                    #print(f"wrong length in format: {item}")
-                    continue
-                format_str = "<" if ENDIAN == "little" else ">"
-                format_str += format_code
-                chunk_size = struct.calcsize(format_str)
-                data_chunk = data[data_offset:data_offset+chunk_size]
-                #message.setattr()
-                #value = struct.unpack_from(format_str, data, offset=data_offset)[0]
-                value = struct.unpack(format_str, data_chunk)[0]
-                data_offset += chunk_size #struct.calcsize(format_str)
-                #scale the value if numerical, put in the message.
-                # todo: should it put the un-scaled value in the message too? group the values as a dictionary?
-
-                if type(value) in [int, float]:
-                    scaled_value = scale * value
-                else:
-                    scaled_value = value
-
-                # setattr(message, name, value)
-                #setattr(message, name+"_scaled", scaled_value)
-                setattr(message, name, scaled_value) #scaled only
-
-                # print(f"\nfor item {item}:")
-                # print(f"format_str = {format_str}")
-                # print(f"chunk_size = {chunk_size}")
-                # print(f"data_chunk = {data_chunk}")
-                # print(f"value = {value}")
-                # print(f"scaled value = {scaled_value}")
-
+            if not isinstance(format_list, PayloadFormat):
+                format_list = PayloadFormat(format_list, ENDIAN)
+            format_list.set_fields(message, data)
         except Exception as e:
             #print("error in set_fields_from_list")
             #print(e)
@@ -227,7 +247,10 @@ class RTCM_Scheme(Scheme):
     #     pass
 
     def checksum_passes(self, message):
-        #return self.compute_checksum(message) == message.checksum or something
-        #if computed on whole message data including the checksum, should be 0.
-        return crc2bytes(RTCM_PREAMBLE + message.data) == b'\00\x00\x00'
-        #return True
+        if self.checked_frames:
+            return True
+        #computed on whole frame including the checksum, should be 0.
+        frame_length = len(RTCM_PREAMBLE) + LENGTH_LENGTH + TYPE_LENGTH + message.payload_length + RTCM_CRC_LEN
+        if len(message.raw_data) < frame_length:
+            return False
+        return crc24q(memoryview(message.raw_data)[:frame_length]) == 0
@@ -0,0 +1,258 @@
+import re
+try:  # importing from inside the package
+    from class_configs.readable_scheme_config import READABLE_START, READABLE_END
+    from class_configs.rtcm_scheme_config import RTCM_PREAMBLE, LENGTH_LENGTH, RTCM_CRC_LEN
+    from class_configs.binary_scheme_config import BINARY_PREAMBLE, BINARY_TYPE_LENGTH, BINARY_LENGTH_LENGTH, BINARY_CRC_LEN
+    from rtcm_scheme import crc24q
+    from binary_scheme import binary_checksum
+except ModuleNotFoundError:  # importing from outside the package
+    from tools.class_configs.readable_scheme_config import READABLE_START, READABLE_END
+    from tools.class_configs.rtcm_scheme_config import RTCM_PREAMBLE, LENGTH_LENGTH, RTCM_CRC_LEN
+    from tools.class_configs.binary_scheme_config import BINARY_PREAMBLE, BINARY_TYPE_LENGTH, BINARY_LENGTH_LENGTH, BINARY_CRC_LEN
+    from tools.rtcm_scheme import crc24q
+    from tools.binary_scheme import binary_checksum
+
+#split a byte stream with any mix of ascii, rtcm and binary messages into whole frames.
+#each frame comes out once, as (protocol, memoryview) with the start and end codes included:
+#   framer = StreamFramer()
+#   for protocol, frame in framer.feed(data):
+#       message = schemes[protocol].parse_message(bytes(frame))
+#the memoryview points into the framer's buffer, so use or copy it before taking the next frame.
+#rtcm and binary frames which fail their checksum are not given out, only counted in bad_frames.
+
+FRAME_ASCII = "ascii"
+FRAME_RTCM = "rtcm"
+FRAME_BINARY = "binary"
+FRAME_PROTOCOLS = [FRAME_ASCII, FRAME_RTCM, FRAME_BINARY]
+
+FRAMER_BUFFER_SIZE = 64 * 1024  # much bigger than any one frame, so data is rarely moved
+MAX_ASCII_FRAME_LENGTH = 1024  # '#' with no \r\n within this many bytes is not a message start
+RTCM_RESERVED_MASK = 0xFC  # 6 reserved bits before the 10 bit length, always 0
+
+# FormatSniffer: look at this much data at a time for a protocol, and to check a locked protocol still fits
+SNIFF_BYTES = 4096
+SNIFF_MIN_FRAMES = 10  # valid frames of one protocol needed to lock onto it
+SNIFF_CONFIDENCE = 0.95  # share of the valid frames which must be that protocol
+RESNIFF_INVALID_FRAMES = 10  # invalid frames in a row which unlock
+RESNIFF_SKIPPED_SHARE = 0.5  # unlock if the locked framer skips this much of the data, like other protocols mixed in
+
+ASCII_START_BYTE = READABLE_START[0]
+RTCM_START_BYTE = RTCM_PREAMBLE[0]
+BINARY_START_BYTE = BINARY_PREAMBLE[0]
+BINARY_HEADER_LENGTH = len(BINARY_PREAMBLE) + BINARY_TYPE_LENGTH + BINARY_LENGTH_LENGTH
+RTCM_HEADER_LENGTH = len(RTCM_PREAMBLE) + LENGTH_LENGTH
+
+PROTOCOL_START_BYTES = {FRAME_ASCII: ASCII_START_BYTE, FRAME_RTCM: RTCM_START_BYTE, FRAME_BINARY: BINARY_START_BYTE}
+
+
+# pattern for any byte that can start a frame of these protocols
+def sync_pattern(protocols):
+    return re.compile(b'[' + b''.join(re.escape(bytes([PROTOCOL_START_BYTES[protocol]])) for protocol in protocols) + b']')
+
+
+SYNC_PATTERN = sync_pattern(FRAME_PROTOCOLS)
+# ascii message body: printable characters except '#', so it can't run across a binary, rtcm or following ascii frame
+ASCII_BODY = re.compile(b'[\x20-\x22\x24-\x7E]*')
+
+
+class StreamFramer:
+    def __init__(self, buffer_size=FRAMER_BUFFER_SIZE):
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # first byte not framed yet
+        self.end = 0  # end of buffered data
+        self.frame_counts = {protocol: 0 for protocol in FRAME_PROTOCOLS}
+        self.skipped_bytes = 0  # bytes which were not part of any frame
+        self.bad_frames = {protocol: 0 for protocol in FRAME_PROTOCOLS}  # complete frames with a wrong checksum
+        self.sync_pattern = SYNC_PATTERN
+
+    # framer over data that is already all in memory, like a memory mapped log. nothing is copied into a buffer:
+    # frames() gives views into data, starting from start.
+    @classmethod
+    def in_place(cls, data, start=0):
+        framer = cls(0)
+        framer.buffer = data
+        framer.view = memoryview(data)
+        framer.start = start
+        framer.end = len(data)
+        return framer
+
+    # drop any buffered data, like after reconnecting
+    def reset(self):
+        self.start = 0
+        self.end = 0
+
+    # only look for frames of these protocols, other data is skipped like noise
+    def set_protocols(self, protocols):
+        self.sync_pattern = SYNC_PATTERN if set(protocols) == set(FRAME_PROTOCOLS) else sync_pattern(protocols)
+
+    def buffered_length(self):
+        return self.end - self.start
+
+    # add data from the stream, yield each frame it completes.
+    # partial frames at the end stay buffered for the next feed.
+    def feed(self, data):
+        data = memoryview(data)
+        offset = 0
+        while True:
+            offset += self.fill(data[offset:])
+            yield from self.frames()
+            if offset >= len(data):
+                return
+
+    # end of stream (like end of a log file): frame what is left, treating incomplete frames as noise
+    def finish(self):
+        yield from self.frames(final=True)
+        self.reset()
+
+    # copy as much data as fits, moving the unframed part to the front first if needed
+    def fill(self, data):
+        if self.end + len(data) > len(self.buffer) and self.start > 0:
+            pending = self.end - self.start
+            self.buffer[:pending] = self.buffer[self.start:self.end]
+            self.start, self.end = 0, pending
+        count = min(len(data), len(self.buffer) - self.end)
+        self.buffer[self.end: self.end + count] = data[:count]
+        self.end += count
+        return count
+
+    def frames(self, final=False):
+        while True:
+            match = self.sync_pattern.search(self.buffer, self.start, self.end)
+            if match is None:
+                self.skip_to(self.end)
+                return
+            pos = match.start()
+            self.skip_to(pos)
+            protocol, length = self.frame_at(pos)
+            if length is None and not final:  # could be a frame, wait for the rest
+                return
+            if not length:  # start byte inside other data, or a broken frame: look again after it
+                self.skip_to(pos + 1)
+                continue
+            self.start = pos + length
+            self.frame_counts[protocol] += 1
+            yield protocol, self.view[pos: pos + length]
+
+    def skip_to(self, pos):
+        self.skipped_bytes += pos - self.start
+        self.start = pos
+
+    # protocol and length of the frame starting at pos. length None if incomplete, 0 if not a valid frame.
+    def frame_at(self, pos):
+        buffer, end = self.buffer, self.end
+        start_byte = buffer[pos]
+
+        if start_byte == ASCII_START_BYTE:
+            # '#', printable characters, then \r\n. another '#' first means this one was noise
+            limit = pos + MAX_ASCII_FRAME_LENGTH
+            body_end = ASCII_BODY.match(buffer, pos + 1, min(end, limit)).end()
+            if body_end == limit:
+                return FRAME_ASCII, 0
+            frame_end = body_end + len(READABLE_END)
+            if frame_end > end:
+                return FRAME_ASCII, None if READABLE_END.startswith(buffer[body_end: end]) else 0
+            return FRAME_ASCII, frame_end - pos if buffer[body_end: frame_end] == READABLE_END else 0
+
+        elif start_byte == RTCM_START_BYTE:
+            # 0xD3, 6 reserved bits, 10 bit length of message data, message data, CRC-24Q
+            if pos + 1 < end and buffer[pos + 1] & RTCM_RESERVED_MASK:
+                return FRAME_RTCM, 0
+            if pos + RTCM_HEADER_LENGTH > end:
+                return FRAME_RTCM, None
+            data_length = ((buffer[pos + 1] & 0x03) << 8) | buffer[pos + 2]
+            frame_length = RTCM_HEADER_LENGTH + data_length + RTCM_CRC_LEN
+            if pos + frame_length > end:
+                return FRAME_RTCM, None
+            # crc over the whole frame including its own crc is 0
+            if crc24q(self.view[pos: pos + frame_length]) != 0:
+                self.bad_frames[FRAME_RTCM] += 1
+                return FRAME_RTCM, 0
+            return FRAME_RTCM, frame_length
+
+        else:
+            # 0xC5 0x50, type, length of payload, payload, 2 byte checksum over type/length/payload
+            if pos + 1 < end and buffer[pos + 1] != BINARY_PREAMBLE[1]:
+                return FRAME_BINARY, 0
+            if pos + BINARY_HEADER_LENGTH > end:
+                return FRAME_BINARY, None
+            frame_length = BINARY_HEADER_LENGTH + buffer[pos + BINARY_HEADER_LENGTH - 1] + BINARY_CRC_LEN
+            frame_end = pos + frame_length
+            if frame_end > end:
+                return FRAME_BINARY, None
+            checksum = binary_checksum(self.view[pos + len(BINARY_PREAMBLE): frame_end - BINARY_CRC_LEN])
+            if checksum != buffer[frame_end - BINARY_CRC_LEN: frame_end]:
+                self.bad_frames[FRAME_BINARY] += 1
+                return FRAME_BINARY, 0
+            return FRAME_BINARY, frame_length
+
+
+# finds which protocol a live stream is in and locks the framer onto it, so it doesn't search for the others.
+# counts valid frames of each protocol in the first SNIFF_BYTES, starting over if no protocol is clear yet.
+# unlocks to search for all protocols again after a run of invalid frames, or SNIFF_BYTES with no valid frame or
+# mostly skipped data (like when the output format was changed, or other protocols are mixed in).
+#   sniffer = FormatSniffer(framer)
+#   sniffer.add_data(len(data))
+#   for protocol, frame in framer.feed(data):
+#       message = schemes[protocol].parse_message(bytes(frame))
+#       sniffer.add_frame(protocol, message.valid)
+class FormatSniffer:
+    def __init__(self, framer, sniff_bytes=SNIFF_BYTES, min_frames=SNIFF_MIN_FRAMES, confidence=SNIFF_CONFIDENCE,
+                 resniff_invalid_frames=RESNIFF_INVALID_FRAMES, resniff_skipped_share=RESNIFF_SKIPPED_SHARE):
+        self.framer = framer
+        self.sniff_bytes = sniff_bytes
+        self.min_frames = min_frames
+        self.confidence = confidence
+        self.resniff_invalid_frames = resniff_invalid_frames
+        self.resniff_skipped_share = resniff_skipped_share
+        self.reset()
+
+    # locked protocol, None while sniffing
+    def reset(self):
+        self.protocol = None
+        self.framer.set_protocols(FRAME_PROTOCOLS)
+        self.start_window()
+
+    def start_window(self):
+        self.valid_counts = {protocol: 0 for protocol in FRAME_PROTOCOLS}
+        self.window_bytes = 0
+        self.window_skipped = self.framer.skipped_bytes
+        self.invalid_run = 0
+
+    # call with the length of each read, before framing it
+    def add_data(self, length):
+        if self.window_bytes > self.sniff_bytes:  # everything in the window is framed now
+            skipped = self.framer.skipped_bytes - self.window_skipped
+            if self.protocol and (not self.valid_counts[self.protocol] or skipped > self.resniff_skipped_share * self.window_bytes):
+                self.reset()
+            else:
+                self.start_window()
+        self.window_bytes += length
+
+    def add_frame(self, protocol, valid):
+        if not valid:
+            self.invalid_run += 1
+            if self.protocol and self.invalid_run >= self.resniff_invalid_frames:
+                self.reset()
+            return
+        self.invalid_run = 0
+        self.valid_counts[protocol] += 1
+        count = self.valid_counts[protocol]
+        if not self.protocol and count >= self.min_frames and count >= self.confidence * sum(self.valid_counts.values()):
+            self.protocol = protocol
+            self.framer.set_protocols([protocol])
+            self.start_window()
+
+
+# every complete frame of a MappedLogConnection from its current position on, as views into the map.
+# the connection moves along with the frames so it can give back the pages already framed.
+# bad_frames, if given, gets the framer's count of frames with a wrong checksum added in when it's done.
+def mapped_log_frames(connection, bad_frames=None):
+    framer = StreamFramer.in_place(connection.view, connection.position)
+    for protocol, frame in framer.frames(final=True):
+        connection.advance_to(framer.start)
+        yield protocol, frame
+    connection.advance_to(framer.start)
+    if bad_frames is not None:
+        for protocol, count in framer.bad_frames.items():
+            bad_frames[protocol] = bad_frames.get(protocol, 0) + count
@@ -0,0 +1,99 @@
+#stress test for receiving data over UDP, like an A-1 at a high output rate over ethernet. no unit needed.
+#a sender process sends one RTCM message per datagram to a UDPConnection on this computer, which is read the way
+#io_loop reads it: wait for the socket, readall, frame. reports what arrived, what the OS dropped and read delays.
+#usage: python udp_stress.py [-r IMU rate in Hz] [-s seconds] [--reader_delay_ms ms per wakeup] [--rcvbuf bytes]
+
+import argparse
+import random
+import select
+import socket
+import statistics
+import sys
+import pathlib
+import time
+from multiprocessing import Process
+
+parent_dir = str(pathlib.Path(__file__).parent)
+sys.path.append(parent_dir+'/src')
+from tools import *
+from tools.connection import UDP_RECEIVE_BUFFER_SIZE
+from decode_benchmark import build_rtcm_frame
+
+STRESS_PORT = 19550
+SEND_INTERVAL_SECONDS = 1e-3  # sender wakes up this often and sends the messages which are due
+
+
+# per second: IMU at the rate, INS at a tenth of it, GPS and heading at 10 Hz
+def message_mix(imu_rate):
+    return [(RTCM_MSGTYPE_IMU, RTCM_IMU_PAYLOAD_FIELDS_WITH_SYNC, imu_rate),
+            (RTCM_MSGTYPE_INS, RTCM_INS_PAYLOAD_FIELDS, imu_rate // 10),
+            (RTCM_MSGTYPE_GPS, RTCM_GPS_PAYLOAD_FIELDS, 10),
+            (RTCM_MSGTYPE_HEADING, RTCM_DUAL_ANT_HEAD_FIELDS, 10)]
+
+
+def send_messages(port, imu_rate, seconds):
+    random.seed(0)
+    mix = message_mix(imu_rate)
+    frames = [[build_rtcm_frame(subtype, format_list) for i in range(16)] for subtype, format_list, rate in mix]
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    start = time.perf_counter()
+    sent = [0] * len(mix)
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+        for i, (subtype, format_list, rate) in enumerate(mix):
+            while sent[i] < int(elapsed * rate):
+                sock.sendto(frames[i][sent[i] % 16], ("127.0.0.1", port))
+                sent[i] += 1
+        time.sleep(SEND_INTERVAL_SECONDS)
+    sock.close()
+
+
+def run(imu_rate, seconds, reader_delay_ms, rcvbuf):
+    expected = sum(rate for subtype, format_list, rate in message_mix(imu_rate)) * seconds
+    connection = UDPConnection("127.0.0.1", STRESS_PORT + 1, STRESS_PORT, receive_buffer_size=rcvbuf, timestamps=True)
+    framer = StreamFramer()
+    sender = Process(target=send_messages, args=(STRESS_PORT, imu_rate, seconds))
+    sender.start()
+    frames = 0
+    wakeups = 0
+    delays = []  # from the kernel receiving a datagram to reading it
+    while sender.is_alive() or connection.read_ready():
+        select.select([connection.fileno()], [], [], 0.1)
+        if reader_delay_ms:
+            time.sleep(reader_delay_ms / 1000)  # busy reader, like a slow log disk or decoding
+        offset = connection.read_offset()
+        data = connection.readall()
+        read_time = time.time_ns()
+        if not data:
+            continue
+        wakeups += 1
+        arrival = connection.arrival_time_ns(offset)
+        if arrival is not None:
+            delays.append((read_time - arrival) / 1e6)
+        frames += sum(1 for frame in framer.feed(data))
+    sender.join()
+    stats = connection.stats()
+    connection.close()
+
+    print(f"IMU {imu_rate} Hz for {seconds} s, reader delay {reader_delay_ms} ms, SO_RCVBUF {stats['receive_buffer_size']}"
+          f" (kernel timestamps {'on' if connection.kernel_timestamps else 'off'})")
+    print(f"    sent about {expected:,} messages, framed {frames:,} in {stats['datagrams']:,} datagrams, {wakeups:,} reads")
+    drops = stats["kernel_drops"]
+    print(f"    dropped by the OS: {'unknown' if drops is None else f'{drops:,}'},"
+          f" dropped unread: {stats['overflow_bytes']:,} bytes")
+    if delays:
+        delays.sort()
+        print(f"    oldest datagram per read waited: median {statistics.median(delays):.2f} ms,"
+              f" p99 {delays[int(len(delays) * 0.99)]:.2f} ms, max {delays[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    argp = argparse.ArgumentParser()
+    argp.add_argument('-r', '--imu_rate', type=int, default=2000, help='IMU messages per second')
+    argp.add_argument('-s', '--seconds', type=int, default=5, help='how long to send')
+    argp.add_argument('--reader_delay_ms', type=float, default=0, help='extra time the reader takes per wakeup')
+    argp.add_argument('--rcvbuf', type=int, default=UDP_RECEIVE_BUFFER_SIZE, help='SO_RCVBUF to ask for')
+    args = argp.parse_args()
+    run(args.imu_rate, args.seconds, args.reader_delay_ms, args.rcvbuf)
@@ -42,14 +42,10 @@ with open(os.devnull, "w") as f, redirect_stdout(f):
 class UserProgram:
 
     #(data_connection, logging_on, log_name, log_file, ntrip_on, ntrip_reader, ntrip_request, ntrip_ip, ntrip_port)
-    def __init__(self, exitflag, con_on, con_start, con_stop, con_succeed,
-                 con_type, com_port, com_baud, udp_ip, udp_port, gps_received,
-                 log_on, log_start, log_stop, log_name,
-                 ntrip_on, ntrip_start, ntrip_stop, ntrip_succeed,
-                 ntrip_ip, ntrip_port, ntrip_gga, ntrip_req,
-                 last_ins_msg, last_gps_msg, last_gp2_msg, last_imu_msg, last_hdg_msg,
-                 last_imu_time,
-                 shared_serial_number
+    def __init__(self, con_on, gps_received, log_on, ntrip_on, data_format,
+                 latest_state,
+                 shared_serial_number,
+                 io_channel
         ):
         self.connection_info = None
         self.board = None
@@ -60,15 +56,13 @@ class UserProgram:
         self.product_id = ""
 
         #keep the shared vars as class attributes so other UserProgram methods have them.
-        #set them like self.log_name.value = x so change is shared. not self.log_name = x
-        self.exitflag, self.con_on, self.con_start, self.con_stop, self.con_succeed = exitflag, con_on, con_start, con_stop, con_succeed
-        self.con_type, self.com_port, self.com_baud, self.udp_ip, self.udp_port, self.gps_received =\
-            con_type, com_port, com_baud, udp_ip, udp_port, gps_received
-        self.log_on, self.log_start, self.log_stop, self.log_name = log_on, log_start, log_stop, log_name
-        self.ntrip_on, self.ntrip_start, self.ntrip_stop, self.ntrip_succeed = ntrip_on, ntrip_start, ntrip_stop, ntrip_succeed
-        self.ntrip_ip, self.ntrip_port, self.ntrip_gga, self.ntrip_req = ntrip_ip, ntrip_port, ntrip_gga, ntrip_req
-        self.last_ins_msg, self.last_gps_msg, self.last_gp2_msg, self.last_imu_msg, self.last_hdg_msg = last_ins_msg, last_gps_msg, last_gp2_msg, last_imu_msg, last_hdg_msg
-        self.last_imu_time = last_imu_time
+        #con_on, log_on, ntrip_on, gps_received and data_format are set by io_loop only: change them by sending commands on io_channel.
+        self.con_on, self.gps_received, self.log_on, self.ntrip_on = con_on, gps_received, log_on, ntrip_on
+        self.data_format = data_format # protocol io_loop detected in the output: ascii, rtcm or binary. empty until known
+        self.log_name = ""
+        self.ntrip_ip, self.ntrip_port = "", 0
+        self.latest_state = latest_state # latest decoded messages from io_loop
+        self.io_channel = io_channel
 
         #any features which might or not be there - do based on firmware version?
         self.available_configs = []
@@ -123,7 +117,7 @@ class UserProgram:
     #exit: close connections, signal iothread to exit (which will close its own connections)
     def exit(self):
         self.release()
-        self.exitflag.value = 1
+        self.io_channel.send(ExitCommand())
         exit()
 
     # release all connections before connecting again
@@ -134,9 +128,8 @@ class UserProgram:
         if self.board:
             self.board.release_connections()  # must release or reconnecting to the same ports will error
             self.board = None
-        #signal iothread to stop data connection
-        self.con_on.value = 0
-        self.con_stop.value = 1
+        #tell iothread to stop data connection
+        self.io_channel.send(DisconnectCommand())
 
     # stop operations and data port before bootloader, but still need config port to send enter_bootloading command.
     def release_for_bootload(self):
@@ -150,11 +143,8 @@ class UserProgram:
             if hasattr(self.board, "odometer_connection") and self.board.odometer_connection:
                 self.board.odometer_connection.close()
 
-        #signal iothread to stop data connection
-        #Todo - should it signal and close, or close only, or signal only? set flags back after bootloading?
-        self.con_on.value = 0
-        self.con_stop.value = 1
-        time.sleep(1) #wait for communications to stop - can it check for stop?
+        #tell iothread to stop data connection. it responds once the connection is closed.
+        self.io_channel.send(DisconnectCommand())
 
     # if we clear after every action, refresh does nothing extra
     def refresh(self):
@@ -184,14 +174,29 @@ class UserProgram:
                 output += "configuration port = "+con["control port"]+", data port = "+con["data port"]
             elif con["type"] == "UDP":
                 output += "ip = "+con["ip"]+", data port = "+con["port1"]+", configuration port = "+con["port2"]
+            data_format = self.data_format.value.decode()
+            if data_format:
+                output += ", output format = "+data_format
             print(output)
+            stats = self.io_channel.send(ConnectionStatusCommand()).data
+            if stats and stats["reconnects"]:
+                print(f"         reconnected {stats['reconnects']} times, {stats['downtime_seconds']:.1f} s without data")
+            if stats and stats.get("connection"): # UDP
+                udp = stats["connection"]
+                dropped = "unknown" if udp["kernel_drops"] is None else str(udp["kernel_drops"])
+                print(f"         {udp['datagrams']} datagrams received, {dropped} dropped by the OS")
         else:
-            print("    Connection: Not connected")
+            stats = self.io_channel.send(ConnectionStatusCommand()).data
+            if con and stats and stats["reconnecting"]:
+                # io_loop keeps trying to reopen it, and logging continues once it's back
+                print(f"    Connection: lost {stats['outage_seconds']:.0f} s ago ({stats['error']}), reconnecting")
+            else:
+                print("    Connection: Not connected")
 
     def show_ntrip(self):
         if self.ntrip_on.value:  #and ntrip_target:
-            ip = self.ntrip_ip.value.decode()
-            port = self.ntrip_port.value
+            ip = self.ntrip_ip
+            port = self.ntrip_port
             status = "    NTRIP: Connected to "+ip+":"+str(port)
         else:
             status = "    NTRIP: Not connected"
@@ -200,7 +205,13 @@ class UserProgram:
     def show_logging(self):
         if self.log_on.value:
             # TODO - count messages logged: either read file (if safe while writing) or communicate with process
-            print("    Log: Logging to "+self.log_name.value.decode()) #+" ("+str(num_messages)+" messages logged )")
+            print("    Log: Logging to "+self.log_name) #+" ("+str(num_messages)+" messages logged )")
+            stats = self.io_channel.send(LogStatusCommand()).data
+            if stats:
+                print(f"         {stats['written_bytes'] / 1e6:.1f} MB written ({stats['write_bytes_per_second'] / 1e3:.1f} kB/s), "
+                      f"{stats['queued_buffers']} reads queued, {stats['dropped_buffers']} dropped")
+                if stats["error"]:
+                    print("         write error: "+stats["error"])
         else:
             print("    Log: Not logging")
 
@@ -226,7 +237,6 @@ class UserProgram:
                     new_connection = self.connect_udp()
                     if new_connection:
                         self.connection_info = new_connection
-                        self.con_type.value = b"UDP"
                         control_success = True
                     else: #connect_udp failed or canceled
                         continue
@@ -237,16 +247,9 @@ class UserProgram:
                 self.release()
                 show_and_pause("error connecting - check connections and try again")
                 continue
-            self.gps_received.value = False # need to see gps message again after each connect
-            #check success from ioloop. TODO - maybe check new_connection here - will be None for cancel, then dont wait
-            debug_print("wait for connect success")
-            while self.con_succeed.value == 0:
-                time.sleep(0.1)
-                # should it time out eventually?
-            debug_print("done waiting")
-            data_success = (self.con_succeed.value == 1) # 0 waiting, 1 succeed, 2 fail
+            #ioloop has responded to the connect command by now: con_on shows if the data connection worked
+            data_success = bool(self.con_on.value)
             debug_print("data success: "+str(data_success)+", control success: "+str(control_success))
-            self.con_succeed.value = 0
             if data_success and control_success:
                 # do stuff based on pid here since connect_udp and connect_com get the pid
                 if 'IMU' in self.product_id:
@@ -286,11 +289,8 @@ class UserProgram:
             show_and_pause("\nfailed to read product info. Check connection settings and try again.")
             return
 
-        # let io_thread do the data connection - give it the signal, close this copy
-        self.com_port.value, self.com_baud.value = data_port_name.encode(), board.baud
-        self.con_type.value = b"COM"
-        self.con_on.value = 1
-        self.con_start.value = 1
+        # let io_thread do the data connection - send it the port, close this copy
+        self.io_channel.send(ConnectCommand("COM", com_port=data_port_name, com_baud=board.baud))
         return {"type": "COM", "control port": board.control_port_name, "data port": data_port_name}
 
     # connect by UDP:
@@ -342,10 +342,7 @@ class UserProgram:
             save_udp_settings(A1_ip, data_port, config_port)
 
         #send udp start info to io thread:
-        self.udp_ip.value, self.udp_port.value = A1_ip.encode(), data_port
-        self.con_type.value = b"UDP"
-        self.con_on.value = 1
-        self.con_start.value = 1
+        self.io_channel.send(ConnectCommand("UDP", udp_ip=A1_ip, udp_port=data_port))
         return {"type": "UDP", "ip": A1_ip, "port1": str(data_port), "port2": str(config_port)}
 
     def product_info_on_connect(self, board):
@@ -598,13 +595,11 @@ class UserProgram:
                 chosen_name = suggested
             else:
                 chosen_name = input("file name: ")
-            self.log_name.value = chosen_name.encode()
-            self.log_on.value = 1
-            self.log_start.value = 1
+            self.log_name = chosen_name
+            self.io_channel.send(StartLogCommand(chosen_name))
 
     def stop_logging(self):
-        self.log_on.value = 0
-        self.log_stop.value = 1 #send stop signal to other thread which will close the log
+        self.io_channel.send(StopLogCommand()) #other thread will close the log
 
     def ntrip_menu(self):
         if self.connection_info: # and self.connection_info["type"] == "UDP":
@@ -671,9 +666,8 @@ class UserProgram:
             port = int(port)
             mountpoint = mountpoint.encode()
             #ntrip_target = (caster, port)
-            self.ntrip_ip.value = caster.encode()
-            self.ntrip_port.value = port
-            self.ntrip_gga.value = send_gga # seems to convert True/False to 1/0
+            self.ntrip_ip = caster
+            self.ntrip_port = port
 
             # _______NTRIP Connection Configs_______
             userAgent = b'NTRIP Anello Client'
@@ -683,27 +677,19 @@ class UserProgram:
             if ntrip_version == 1 and ntrip_auth == "Basic":
                 auth_str = username + ":" + password
                 auth_64 = base64.b64encode(auth_str.encode("ascii"))
-                self.ntrip_req.value = b'GET /' + mountpoint + b' HTTP/1.0\r\nUser-Agent: ' + userAgent + b'\r\nAuthorization: Basic ' + auth_64 + b'\r\n\r\n'
+                ntrip_req = b'GET /' + mountpoint + b' HTTP/1.0\r\nUser-Agent: ' + userAgent + b'\r\nAuthorization: Basic ' + auth_64 + b'\r\n\r\n'
             else:
                 # TODO make request structure for NTRIP v2, other auth options.
                 print("not implemented: version = " + str(ntrip_version) + ", auth = " + str(ntrip_auth))
-                self.ntrip_req.value=b'' # will work as False for conditions
-            #signal io_thread to connect the ntrip.
+                ntrip_req = b'' # will work as False for conditions
+            #tell io_thread to connect the ntrip, it responds with success or fail.
             clear_screen()
-            self.ntrip_on.value = 1
-            self.ntrip_start.value = 1
-            #wait for success or fail message
-            while self.ntrip_succeed.value == 0:
-                continue
-                # should it time out eventually?
-            success = (self.ntrip_succeed.value == 1) # 0 waiting, 1 succeed, 2 fail
-            self.ntrip_succeed.value = 0
+            success = self.io_channel.send(StartNtripCommand(caster, port, ntrip_req, bool(send_gga))).success
             debug_print(success)
 
-    #set flags and iothread will close ntrip connection
+    #iothread will close ntrip connection
     def stop_ntrip(self):
-        self.ntrip_on.value = 0
-        self.ntrip_stop.value = 1
+        self.io_channel.send(StopNtripCommand())
 
     def monitor(self):
         if not self.board:
@@ -721,10 +707,6 @@ class UserProgram:
 
     def monitor_main(self):
 
-        ascii_scheme = ReadableScheme()
-        binary_scheme = Binary_Scheme()
-        rtcm_scheme = RTCM_Scheme()
-
         sg.theme(SGTHEME)
 
         label_font = (FONT_NAME, LABEL_FONT_SIZE)
@@ -1152,11 +1134,11 @@ class UserProgram:
         debug_print("BASE_WIDTH: "+str(base_width))
         debug_print("BASE_HEIGHT:" +str(base_height))
 
-        last_last_ins = b''
-        last_last_gps = b''
-        last_last_gp2 = b''
-        last_last_imu = b''
-        last_last_hdg = b''
+        last_ins_sequence = 0
+        last_gps_sequence = 0
+        last_gp2_sequence = 0
+        last_imu_sequence = 0
+        last_hdg_sequence = 0
         last_ins_time = time.time()
         last_gps_time = last_ins_time
         last_gp2_time = last_ins_time
@@ -1237,9 +1219,8 @@ class UserProgram:
                 else:
                     #start log with default name
                     logname = collector.default_log_name(self.serialnum)
-                    self.log_name.value = logname.encode()
-                    self.log_on.value = 1
-                    self.log_start.value = 1
+                    self.log_name = logname
+                    self.io_channel.send(StartLogCommand(logname))
                 #update color
                 log_button.update(LOG_TEXT+TOGGLE_TEXT[self.log_on.value], button_color=TOGGLE_COLORS[self.log_on.value])
             elif event == "Configure": #resize, move. also triggers on button for some reason.
@@ -1263,293 +1244,269 @@ class UserProgram:
                 debug_print("map zoom = " + str(current_zoom))
 
             #update for new ins data , only update items in the active tab.
-            if hasattr(self.last_ins_msg, "raw"):
-                #print(f"has last_ins_msg: {self.last_ins_msg.raw}")
-                #active_tab = tab_group.get() #move to top of loop
-                elapsed = time.time() - last_ins_time
-                # window["since_ins"].update('%.2f' % elapsed)
-                #if self.last_ins_msg.value == last_last_ins:
-                if self.last_ins_msg.raw == last_last_ins:
-                    #did not change - no update. but if it's been too long, zero the fields
-                    #time_since_ins.update(str(elapsed))
-                    #window.refresh()
-                    if (elapsed > ZERO_OUT_TIME) and active_tab == "numbers-tab": #zero out the numbers tab
-                        for field in ins_fields:
-                            field.update(MONITOR_DEFAULT_VALUE)
-                else: #changed - update the last_ins and counter, then update display from the new values
-                    #last_last_ins = self.last_ins_msg.value
-                    last_last_ins = self.last_ins_msg.raw
-                    last_ins_time = time.time()
-
-                    ins_msg = try_multiple_parsers([binary_scheme, ascii_scheme, rtcm_scheme], self.last_ins_msg.raw)
-                    #print(f"\nins_msg: {ins_msg}")
-
-                    #Simple json for now. 
-                    json_out["roll_deg"] = ins_msg.roll_deg if hasattr(ins_msg, "roll_deg") else json_out["roll_deg"]
-                    json_out["pitch_deg"] = ins_msg.pitch_deg if hasattr(ins_msg, "pitch_deg") else json_out["pitch_deg"]
-                    json_out["heading_deg"] = ins_msg.heading_deg if hasattr(ins_msg, "heading_deg") else json_out["heading_deg"] 
-
-                    json_out["lat_deg"] = ins_msg.lat_deg if hasattr(ins_msg, "lat_deg") else json_out["lat_deg"]
-                    json_out["lon_deg"] = ins_msg.lon_deg if hasattr(ins_msg, "lon_deg") else json_out["lon_deg"]
-                    json_out["alt_m"] = ins_msg.alt_m if hasattr(ins_msg, "alt_m") else json_out["alt_m"]
-
-                    json_out["velocity_north_mps"] = ins_msg.velocity_north_mps if hasattr(ins_msg, "velocity_north_mps") else json_out["velocity_north_mps"]
-                    json_out["velocity_east_mps"] = ins_msg.velocity_east_mps if hasattr(ins_msg, "velocity_east_mps") else json_out["velocity_east_mps"]
-                    json_out["velocity_down_mps"] = ins_msg.velocity_down_mps if hasattr(ins_msg, "velocity_down_mps") else json_out["velocity_down_mps"]
-                    json_out["gps_time_ns"] = ins_msg.gps_time_ns if hasattr(ins_msg, "gps_time_ns") else json_out["gps_time_ns"]
+            #active_tab = tab_group.get() #move to top of loop
+            elapsed = time.time() - last_ins_time
+            # window["since_ins"].update('%.2f' % elapsed)
+            if self.latest_state.sequence(b'INS') == last_ins_sequence:
+                #did not change - no update. but if it's been too long, zero the fields
+                #time_since_ins.update(str(elapsed))
+                #window.refresh()
+                if (elapsed > ZERO_OUT_TIME) and active_tab == "numbers-tab": #zero out the numbers tab
+                    for field in ins_fields:
+                        field.update(MONITOR_DEFAULT_VALUE)
+            else: #changed - update the last_ins and counter, then update display from the new values
+                last_ins_sequence, ins_msg = self.latest_state.read(b'INS')
+                last_ins_time = time.time()
+
+                #print(f"\nins_msg: {ins_msg}")
+
+                #Simple json for now. 
+                json_out["roll_deg"] = ins_msg.roll_deg if hasattr(ins_msg, "roll_deg") else json_out["roll_deg"]
+                json_out["pitch_deg"] = ins_msg.pitch_deg if hasattr(ins_msg, "pitch_deg") else json_out["pitch_deg"]
+                json_out["heading_deg"] = ins_msg.heading_deg if hasattr(ins_msg, "heading_deg") else json_out["heading_deg"] 
+
+                json_out["lat_deg"] = ins_msg.lat_deg if hasattr(ins_msg, "lat_deg") else json_out["lat_deg"]
+                json_out["lon_deg"] = ins_msg.lon_deg if hasattr(ins_msg, "lon_deg") else json_out["lon_deg"]
+                json_out["alt_m"] = ins_msg.alt_m if hasattr(ins_msg, "alt_m") else json_out["alt_m"]
+
+                json_out["velocity_north_mps"] = ins_msg.velocity_north_mps if hasattr(ins_msg, "velocity_north_mps") else json_out["velocity_north_mps"]
+                json_out["velocity_east_mps"] = ins_msg.velocity_east_mps if hasattr(ins_msg, "velocity_east_mps") else json_out["velocity_east_mps"]
+                json_out["velocity_down_mps"] = ins_msg.velocity_down_mps if hasattr(ins_msg, "velocity_down_mps") else json_out["velocity_down_mps"]
+                json_out["gps_time_ns"] = ins_msg.gps_time_ns if hasattr(ins_msg, "gps_time_ns") else json_out["gps_time_ns"]
                     
 
-                    #update numbers display if active
-                    if active_tab == "numbers-tab":
-                        # debug_print(msg)
-                        # for label, attrname in configs:
-                        # textval = str(getattr(msg, attrname) if hasattr(msg, attrname) else default_value
-                        # window[label].update(textval)
-                        window["lat"].update('%.7f'%ins_msg.lat_deg if hasattr(ins_msg, "lat_deg") else MONITOR_DEFAULT_VALUE)
-                        window["lon"].update('%.7f'%ins_msg.lon_deg if hasattr(ins_msg, "lon_deg") else MONITOR_DEFAULT_VALUE)
-
-                        #compute ins speed as magnitude. include vz? should be small anyway
-                        vx = float(ins_msg.velocity_north_mps) if hasattr(ins_msg, "velocity_north_mps") else 0
-                        vy = float(ins_msg.velocity_east_mps) if hasattr(ins_msg, "velocity_east_mps") else 0
-                        vz = float(ins_msg.velocity_down_mps) if hasattr(ins_msg, "velocity_down_mps") else 0
-                        magnitude = ((vx**2)+(vy**2)+(vz**2))**(1/2)
-
-                        window["speed"].update('%.3f'%magnitude)
-                        window["att0"].update(
-                            '%.1f'%ins_msg.roll_deg if hasattr(ins_msg, "roll_deg") else MONITOR_DEFAULT_VALUE)
-                        window["att1"].update(
-                            '%.1f'%ins_msg.pitch_deg if hasattr(ins_msg, "pitch_deg") else MONITOR_DEFAULT_VALUE)
-                        window["att2"].update(
-                            '%.1f'%ins_msg.heading_deg if hasattr(ins_msg, "heading_deg") else MONITOR_DEFAULT_VALUE)
-
-                        window["soln"].update(INS_SOLN_NAMES.get(ins_msg.ins_solution_status, str(ins_msg.ins_solution_status))
-                            if hasattr(ins_msg, "ins_solution_status") else MONITOR_DEFAULT_VALUE)
-
-                        window["zupt"].update(ZUPT_NAMES.get(ins_msg.zupt_flag, str(ins_msg.zupt_flag))
-                                              if hasattr(ins_msg, "zupt_flag") else MONITOR_DEFAULT_VALUE)
-
-                        window["altitude"].update('%.1f'%ins_msg.alt_m if hasattr(ins_msg, "alt_m") else MONITOR_DEFAULT_VALUE)
-
-                        window["ins_imu_time"].update(
-                            '%.1f' % ins_msg.imu_time_ms if hasattr(ins_msg, "imu_time_ms") else MONITOR_DEFAULT_VALUE)
-
-                        window["ins_gps_time"].update(
-                            '%d' % ins_msg.gps_time_ns if hasattr(ins_msg, "gps_time_ns") else MONITOR_DEFAULT_VALUE)
-
-                    #Update Map if active
-                    if active_tab == "map-tab":
-                        #credit the provider selected with some text - maps from: name, website, copyright/license terms
-
-                        provider = "osm"  # force "osm" for now since stamen not working in geotiler.
-                        provider_credit_text = MAP_PROVIDER_CREDITS[provider] if provider in MAP_PROVIDER_CREDITS \
-                            else "maps from " + str(provider) + ", needs copyright/license info adding here"
-                        provider_credit_text_holder.update(provider_credit_text)
-
-                        #from ins message - could share variable with text updates above
-                        lat = ins_msg.lat_deg if hasattr(ins_msg, "lat_deg") else None #if None, will not update
-                        lon = ins_msg.lon_deg if hasattr(ins_msg, "lon_deg") else None
-                        heading = ins_msg.heading_deg if hasattr(ins_msg, "heading_deg") else None #0,1,2 = roll, pitch, heading
-
-                        #update the map, only if the lat/lon/position all received
-                        if (lat is not None) and (lon is not None) and (heading is not None):
-                            #tried to suppress map error prints with no internet, but doesn't work.
-                            #with open(os.devnull, "w") as f, redirect_stdout(f):
-                            pil_image = draw_map(lat, lon, current_zoom, MAP_DIMENSIONS, MAP_ARROW_SIZE, heading, arrow_file_path, provider, storage=self.map_cache)
-                            bio = io.BytesIO()  # todo- does this accumulate memory? but if bio outside loop, image does't update
-                            pil_image.save(bio, format="PNG")  # put it in memory to load
-                            map_image.update(data=bio.getvalue()) #todo - check actual window size and handle resizes?
-
+                #update numbers display if active
+                if active_tab == "numbers-tab":
+                    # debug_print(msg)
+                    # for label, attrname in configs:
+                    # textval = str(getattr(msg, attrname) if hasattr(msg, attrname) else default_value
+                    # window[label].update(textval)
+                    window["lat"].update('%.7f'%ins_msg.lat_deg if hasattr(ins_msg, "lat_deg") else MONITOR_DEFAULT_VALUE)
+                    window["lon"].update('%.7f'%ins_msg.lon_deg if hasattr(ins_msg, "lon_deg") else MONITOR_DEFAULT_VALUE)
+
+                    #compute ins speed as magnitude. include vz? should be small anyway
+                    vx = float(ins_msg.velocity_north_mps) if hasattr(ins_msg, "velocity_north_mps") else 0
+                    vy = float(ins_msg.velocity_east_mps) if hasattr(ins_msg, "velocity_east_mps") else 0
+                    vz = float(ins_msg.velocity_down_mps) if hasattr(ins_msg, "velocity_down_mps") else 0
+                    magnitude = ((vx**2)+(vy**2)+(vz**2))**(1/2)
+
+                    window["speed"].update('%.3f'%magnitude)
+                    window["att0"].update(
+                        '%.1f'%ins_msg.roll_deg if hasattr(ins_msg, "roll_deg") else MONITOR_DEFAULT_VALUE)
+                    window["att1"].update(
+                        '%.1f'%ins_msg.pitch_deg if hasattr(ins_msg, "pitch_deg") else MONITOR_DEFAULT_VALUE)
+                    window["att2"].update(
+                        '%.1f'%ins_msg.heading_deg if hasattr(ins_msg, "heading_deg") else MONITOR_DEFAULT_VALUE)
+
+                    window["soln"].update(INS_SOLN_NAMES.get(ins_msg.ins_solution_status, str(ins_msg.ins_solution_status))
+                        if hasattr(ins_msg, "ins_solution_status") else MONITOR_DEFAULT_VALUE)
+
+                    window["zupt"].update(ZUPT_NAMES.get(ins_msg.zupt_flag, str(ins_msg.zupt_flag))
+                                          if hasattr(ins_msg, "zupt_flag") else MONITOR_DEFAULT_VALUE)
+
+                    window["altitude"].update('%.1f'%ins_msg.alt_m if hasattr(ins_msg, "alt_m") else MONITOR_DEFAULT_VALUE)
+
+                    window["ins_imu_time"].update(
+                        '%.1f' % ins_msg.imu_time_ms if hasattr(ins_msg, "imu_time_ms") else MONITOR_DEFAULT_VALUE)
+
+                    window["ins_gps_time"].update(
+                        '%d' % ins_msg.gps_time_ns if hasattr(ins_msg, "gps_time_ns") else MONITOR_DEFAULT_VALUE)
+
+                #Update Map if active
+                if active_tab == "map-tab":
+                    #credit the provider selected with some text - maps from: name, website, copyright/license terms
+
+                    provider = "osm"  # force "osm" for now since stamen not working in geotiler.
+                    provider_credit_text = MAP_PROVIDER_CREDITS[provider] if provider in MAP_PROVIDER_CREDITS \
+                        else "maps from " + str(provider) + ", needs copyright/license info adding here"
+                    provider_credit_text_holder.update(provider_credit_text)
+
+                    #from ins message - could share variable with text updates above
+                    lat = ins_msg.lat_deg if hasattr(ins_msg, "lat_deg") else None #if None, will not update
+                    lon = ins_msg.lon_deg if hasattr(ins_msg, "lon_deg") else None
+                    heading = ins_msg.heading_deg if hasattr(ins_msg, "heading_deg") else None #0,1,2 = roll, pitch, heading
+
+                    #update the map, only if the lat/lon/position all received
+                    if (lat is not None) and (lon is not None) and (heading is not None):
+                        #tried to suppress map error prints with no internet, but doesn't work.
+                        #with open(os.devnull, "w") as f, redirect_stdout(f):
+                        pil_image = draw_map(lat, lon, current_zoom, MAP_DIMENSIONS, MAP_ARROW_SIZE, heading, arrow_file_path, provider, storage=self.map_cache)
+                        bio = io.BytesIO()  # todo- does this accumulate memory? but if bio outside loop, image does't update
+                        pil_image.save(bio, format="PNG")  # put it in memory to load
+                        map_image.update(data=bio.getvalue()) #todo - check actual window size and handle resizes?
+
+            # window.refresh()
+            elapsed = time.time() - last_gps_time
+            window["since_gps"].update('%.2f' % elapsed) #outside of tabs, do it whichever tab is active
+            if self.latest_state.sequence(b'GPS') == last_gps_sequence:
+                #did not change - no update. but if it's been too long, zero the fields
+                # time_since_gps.update(str(elapsed))
                 # window.refresh()
-            if hasattr(self.last_gps_msg, "raw"):
-                #print(f"has last_gps_msg: {self.last_gps_msg.raw}")
-                elapsed = time.time() - last_gps_time
-                window["since_gps"].update('%.2f' % elapsed) #outside of tabs, do it whichever tab is active
-                #if self.last_gps_msg.value == last_last_gps:
-                if self.last_gps_msg.raw == last_last_gps:
-                    #did not change - no update. but if it's been too long, zero the fields
-                    # time_since_gps.update(str(elapsed))
-                    # window.refresh()
-                    if elapsed > ZERO_OUT_TIME:
-                        if active_tab == "numbers-tab": #zero these if tab is active
-                            for field in ins_tab_gps_fields:
-                                field.update(MONITOR_DEFAULT_VALUE)
-                        elif active_tab == "gps-tab":
-                            for field in gps_tab_gps_fields:
-                                field.update(MONITOR_DEFAULT_VALUE)
-                else:
-                    #last_last_gps = self.last_gps_msg.value
-                    last_last_gps = self.last_gps_msg.raw
-                    last_gps_time = time.time()
-                    if active_tab == 'numbers-tab': #these items are in numbers tab, so update only if active
-                        gps_msg = try_multiple_parsers([binary_scheme, ascii_scheme, rtcm_scheme], self.last_gps_msg.raw)
-                        #print(f"\ngps_msg: {gps_msg}")
-                        window["gps_carrsoln2"].update(GPS_SOLN_NAMES.get(gps_msg.carrier_solution_status, str(gps_msg.carrier_solution_status))
-                                                      if hasattr(gps_msg, "carrier_solution_status") else MONITOR_DEFAULT_VALUE)
-                        window["gps_fix2"].update(GPS_FIX_NAMES.get(gps_msg.gnss_fix_type, str(gps_msg.gnss_fix_type))
-                                                 if hasattr(gps_msg, "gnss_fix_type") else MONITOR_DEFAULT_VALUE)
-                        window["num_sats2"].update(gps_msg.num_sats if hasattr(gps_msg, "num_sats") else MONITOR_DEFAULT_VALUE)
-                    if active_tab == 'gps-tab':
-                        gps_msg = try_multiple_parsers([binary_scheme, ascii_scheme, rtcm_scheme], self.last_gps_msg.raw)
-                        #update the fields. todo: can this be a loop over gps_tab_gps_fields?
-                        window["gps_lat"].update('%.7f' % gps_msg.lat_deg if hasattr(gps_msg, "lat_deg") else MONITOR_DEFAULT_VALUE)
-                        window["gps_lon"].update('%.7f' % gps_msg.lon_deg if hasattr(gps_msg, "lon_deg") else MONITOR_DEFAULT_VALUE)
-                        window["gps_alt_ell"].update('%.2f' % gps_msg.alt_ellipsoid_m if hasattr(gps_msg, "alt_ellipsoid_m") else MONITOR_DEFAULT_VALUE)
-                        window["gps_alt_msl"].update('%.2f' % gps_msg.alt_msl_m if hasattr(gps_msg, "alt_msl_m") else MONITOR_DEFAULT_VALUE)
-                        window["gps_spd"].update('%.2f' % gps_msg.speed_mps if hasattr(gps_msg, "speed_mps") else MONITOR_DEFAULT_VALUE)
-                        window["gps_hdg"].update('%.2f' % gps_msg.heading_deg if hasattr(gps_msg, "heading_deg") else MONITOR_DEFAULT_VALUE)
-                        window["gps_hacc"].update('%.2f' % gps_msg.accuracy_horizontal_m if hasattr(gps_msg, "accuracy_horizontal_m") else MONITOR_DEFAULT_VALUE)
-                        window["gps_vacc"].update('%.2f' % gps_msg.accuracy_vertical_m if hasattr(gps_msg, "accuracy_vertical_m") else MONITOR_DEFAULT_VALUE)
-                        window["gps_pdop"].update('%.2f' % gps_msg.PDOP if hasattr(gps_msg, "PDOP") else MONITOR_DEFAULT_VALUE)
-                        window["gps_numsv"].update(gps_msg.num_sats if hasattr(gps_msg, "num_sats") else MONITOR_DEFAULT_VALUE) #int, don't %3f.
-                        window["gps_spd_acc"].update('%.2f' % gps_msg.speed_accuracy_mps if hasattr(gps_msg, "speed_accuracy_mps") else MONITOR_DEFAULT_VALUE)
-                        window["gps_hdg_acc"].update('%.2f' % gps_msg.heading_accuracy_deg if hasattr(gps_msg, "heading_accuracy_deg") else MONITOR_DEFAULT_VALUE)
-                        #values with names - get name from dictionary.
-                        window["gps_carrsoln"].update(GPS_SOLN_NAMES.get(gps_msg.carrier_solution_status, str(gps_msg.carrier_solution_status))
-                                                      if hasattr(gps_msg, "carrier_solution_status") else MONITOR_DEFAULT_VALUE)
-                        window["gps_fix"].update(GPS_FIX_NAMES.get(gps_msg.gnss_fix_type, str(gps_msg.gnss_fix_type))
-                                                 if hasattr(gps_msg, "gnss_fix_type") else MONITOR_DEFAULT_VALUE)
+                if elapsed > ZERO_OUT_TIME:
+                    if active_tab == "numbers-tab": #zero these if tab is active
+                        for field in ins_tab_gps_fields:
+                            field.update(MONITOR_DEFAULT_VALUE)
+                    elif active_tab == "gps-tab":
+                        for field in gps_tab_gps_fields:
+                            field.update(MONITOR_DEFAULT_VALUE)
+            else:
+                last_gps_sequence, gps_msg = self.latest_state.read(b'GPS')
+                last_gps_time = time.time()
+                if active_tab == 'numbers-tab': #these items are in numbers tab, so update only if active
+                    #print(f"\ngps_msg: {gps_msg}")
+                    window["gps_carrsoln2"].update(GPS_SOLN_NAMES.get(gps_msg.carrier_solution_status, str(gps_msg.carrier_solution_status))
+                                                  if hasattr(gps_msg, "carrier_solution_status") else MONITOR_DEFAULT_VALUE)
+                    window["gps_fix2"].update(GPS_FIX_NAMES.get(gps_msg.gnss_fix_type, str(gps_msg.gnss_fix_type))
+                                             if hasattr(gps_msg, "gnss_fix_type") else MONITOR_DEFAULT_VALUE)
+                    window["num_sats2"].update(gps_msg.num_sats if hasattr(gps_msg, "num_sats") else MONITOR_DEFAULT_VALUE)
+                if active_tab == 'gps-tab':
+                    #update the fields. todo: can this be a loop over gps_tab_gps_fields?
+                    window["gps_lat"].update('%.7f' % gps_msg.lat_deg if hasattr(gps_msg, "lat_deg") else MONITOR_DEFAULT_VALUE)
+                    window["gps_lon"].update('%.7f' % gps_msg.lon_deg if hasattr(gps_msg, "lon_deg") else MONITOR_DEFAULT_VALUE)
+                    window["gps_alt_ell"].update('%.2f' % gps_msg.alt_ellipsoid_m if hasattr(gps_msg, "alt_ellipsoid_m") else MONITOR_DEFAULT_VALUE)
+                    window["gps_alt_msl"].update('%.2f' % gps_msg.alt_msl_m if hasattr(gps_msg, "alt_msl_m") else MONITOR_DEFAULT_VALUE)
+                    window["gps_spd"].update('%.2f' % gps_msg.speed_mps if hasattr(gps_msg, "speed_mps") else MONITOR_DEFAULT_VALUE)
+                    window["gps_hdg"].update('%.2f' % gps_msg.heading_deg if hasattr(gps_msg, "heading_deg") else MONITOR_DEFAULT_VALUE)
+                    window["gps_hacc"].update('%.2f' % gps_msg.accuracy_horizontal_m if hasattr(gps_msg, "accuracy_horizontal_m") else MONITOR_DEFAULT_VALUE)
+                    window["gps_vacc"].update('%.2f' % gps_msg.accuracy_vertical_m if hasattr(gps_msg, "accuracy_vertical_m") else MONITOR_DEFAULT_VALUE)
+                    window["gps_pdop"].update('%.2f' % gps_msg.PDOP if hasattr(gps_msg, "PDOP") else MONITOR_DEFAULT_VALUE)
+                    window["gps_numsv"].update(gps_msg.num_sats if hasattr(gps_msg, "num_sats") else MONITOR_DEFAULT_VALUE) #int, don't %3f.
+                    window["gps_spd_acc"].update('%.2f' % gps_msg.speed_accuracy_mps if hasattr(gps_msg, "speed_accuracy_mps") else MONITOR_DEFAULT_VALUE)
+                    window["gps_hdg_acc"].update('%.2f' % gps_msg.heading_accuracy_deg if hasattr(gps_msg, "heading_accuracy_deg") else MONITOR_DEFAULT_VALUE)
+                    #values with names - get name from dictionary.
+                    window["gps_carrsoln"].update(GPS_SOLN_NAMES.get(gps_msg.carrier_solution_status, str(gps_msg.carrier_solution_status))
+                                                  if hasattr(gps_msg, "carrier_solution_status") else MONITOR_DEFAULT_VALUE)
+                    window["gps_fix"].update(GPS_FIX_NAMES.get(gps_msg.gnss_fix_type, str(gps_msg.gnss_fix_type))
+                                             if hasattr(gps_msg, "gnss_fix_type") else MONITOR_DEFAULT_VALUE)
 
             #update GP2 tab for GP2 message. TODO - can this logic be combined with GPS tab?
-            if hasattr(self.last_gp2_msg, "raw"):
-                #print(f"has last_gps_msg: {self.last_gps_msg.raw}")
-                elapsed = time.time() - last_gp2_time
-                if self.last_gp2_msg.raw == last_last_gp2:
-                    #did not change - no update. but if it's been too long, zero the fields
-                    if elapsed > ZERO_OUT_TIME:
-                        if active_tab == "gp2-tab":
-                            for field in gp2_tab_gp2_fields:
-                                field.update(MONITOR_DEFAULT_VALUE)
-                else:
-                    #last_last_gps = self.last_gps_msg.value
-                    last_last_gp2 = self.last_gp2_msg.raw
-                    last_gp2_time = time.time()
-                    if active_tab == 'gp2-tab':
-                        gps_msg = try_multiple_parsers([binary_scheme, ascii_scheme, rtcm_scheme], self.last_gp2_msg.raw)
-                        #update the fields. todo: can this be a loop over gps_tab_gps_fields?
-                        window["gp2_lat"].update('%.7f' % gps_msg.lat_deg if hasattr(gps_msg, "lat_deg") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_lon"].update('%.7f' % gps_msg.lon_deg if hasattr(gps_msg, "lon_deg") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_alt_ell"].update('%.2f' % gps_msg.alt_ellipsoid_m if hasattr(gps_msg, "alt_ellipsoid_m") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_alt_msl"].update('%.2f' % gps_msg.alt_msl_m if hasattr(gps_msg, "alt_msl_m") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_spd"].update('%.2f' % gps_msg.speed_mps if hasattr(gps_msg, "speed_mps") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_hdg"].update('%.2f' % gps_msg.heading_deg if hasattr(gps_msg, "heading_deg") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_hacc"].update('%.2f' % gps_msg.accuracy_horizontal_m if hasattr(gps_msg, "accuracy_horizontal_m") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_vacc"].update('%.2f' % gps_msg.accuracy_vertical_m if hasattr(gps_msg, "accuracy_vertical_m") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_pdop"].update('%.2f' % gps_msg.PDOP if hasattr(gps_msg, "PDOP") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_numsv"].update(gps_msg.num_sats if hasattr(gps_msg, "num_sats") else MONITOR_DEFAULT_VALUE) #int, don't %3f.
-                        window["gp2_spd_acc"].update('%.2f' % gps_msg.speed_accuracy_mps if hasattr(gps_msg, "speed_accuracy_mps") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_hdg_acc"].update('%.2f' % gps_msg.heading_accuracy_deg if hasattr(gps_msg, "heading_accuracy_deg") else MONITOR_DEFAULT_VALUE)
-                        #values with names - get name from dictionary.
-                        window["gp2_carrsoln"].update(GPS_SOLN_NAMES.get(gps_msg.carrier_solution_status, str(gps_msg.carrier_solution_status))
-                                                      if hasattr(gps_msg, "carrier_solution_status") else MONITOR_DEFAULT_VALUE)
-                        window["gp2_fix"].update(GPS_FIX_NAMES.get(gps_msg.gnss_fix_type, str(gps_msg.gnss_fix_type))
-                                                 if hasattr(gps_msg, "gnss_fix_type") else MONITOR_DEFAULT_VALUE)
-            if hasattr(self.last_imu_msg, "raw"):
-                #print(f"has last_imu_msg: {self.last_imu_msg.raw}")
-                #update for new imu message
-                elapsed = time.time() - last_imu_time
-                #TODO - can update any "time since imu" indicator here
-                #if self.last_imu_msg.value == last_last_imu:
-                if self.last_imu_msg.raw == last_last_imu:
-                    # did not change - no update. but if it's been too long, zero the fields
-                    # time_since_ins.update(str(elapsed))
-                    # window.refresh()
-                    if (elapsed > ZERO_OUT_TIME) and active_tab == "imu-tab":  # zero out the numbers tab
-                        for field in imu_fields:
+            elapsed = time.time() - last_gp2_time
+            if self.latest_state.sequence(b'GP2') == last_gp2_sequence:
+                #did not change - no update. but if it's been too long, zero the fields
+                if elapsed > ZERO_OUT_TIME:
+                    if active_tab == "gp2-tab":
+                        for field in gp2_tab_gp2_fields:
                             field.update(MONITOR_DEFAULT_VALUE)
-                else:  # changed - update the last_ins and counter, then update display from the new values
-                    # last_last_imu = self.last_imu_msg.value
-                    last_last_imu = self.last_imu_msg.raw
-                    last_imu_time = time.time()
-                    imu_msg = try_multiple_parsers([binary_scheme, ascii_scheme, rtcm_scheme], self.last_imu_msg.raw)
-                    if active_tab == 'imu-tab':
-                        #print(f"\nimu_msg: {imu_msg}")
-                        #update the imu fields from the message
-                        window["ax_value"].update('%.4f'%imu_msg.accel_x_g if hasattr(imu_msg, "accel_x_g")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["ay_value"].update('%.4f' % imu_msg.accel_y_g if hasattr(imu_msg, "accel_y_g")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["az_value"].update('%.4f' % imu_msg.accel_z_g if hasattr(imu_msg, "accel_z_g")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["wx_value"].update('%.4f' % imu_msg.angrate_x_dps if hasattr(imu_msg, "angrate_x_dps")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["wy_value"].update('%.4f' % imu_msg.angrate_y_dps if hasattr(imu_msg, "angrate_y_dps")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["wz_value"].update('%.4f' % imu_msg.angrate_z_dps if hasattr(imu_msg, "angrate_z_dps")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["fog_value"].update('%.4f' % imu_msg.fog_angrate_z_dps
-                                                   if hasattr(imu_msg, "fog_angrate_z_dps") else MONITOR_DEFAULT_VALUE)
-                        window["temp_value"].update('%.2f' % imu_msg.temperature_c
-                                                   if hasattr(imu_msg, "temperature_c") else MONITOR_DEFAULT_VALUE)
-                        window["imu_cpu_time"].update('%.2f' % imu_msg.imu_time_ms
-                                                    if hasattr(imu_msg, "imu_time_ms") else MONITOR_DEFAULT_VALUE)
-                        window["imu_sync_time"].update('%.2f' % imu_msg.sync_time_ms
-                                                    if hasattr(imu_msg, "sync_time_ms") else MONITOR_DEFAULT_VALUE)
-
-                        #message with an odometer speed/time: update the latest speed, reset timer.
-                        if hasattr(imu_msg, "odometer_speed_mps") and hasattr(imu_msg, "odometer_time_ms") and imu_msg.odometer_time_ms > 0:
-                            #odo_value =  '%.2f' % imu_msg.odometer_speed_mps
-                            #last_odo_speed = imu_msg.odometer_speed_mps
-                            last_odo_time = time.time() #or use time of the message?
-                            window["odo_value"].update('%.2f' % imu_msg.odometer_speed_mps)
-                        #if timer runs out, blank the odo speed.
-                        elif time.time() - last_odo_time > ODOMETER_ZERO_TIME:
-                            #odo_value = MONITOR_DEFAULT_VALUE #TODO - do the timeout logic here.
-                            window["odo_value"].update(MONITOR_DEFAULT_VALUE)
-            if hasattr(self.last_hdg_msg, "raw"):
-                #print(f"last_hdg_msg.raw is {self.last_hdg_msg.raw}")
-                elapsed_hdg = time.time() - last_hdg_time
-                # can update any "time since hdg" indicator here
-                if self.last_hdg_msg.raw == last_last_hdg:
-                    # can zero any heading fields if too much time passed
-                    if (elapsed_hdg > ZERO_OUT_TIME) and active_tab == "gps-tab":  # zero out the numbers tab
-                        for field in hdg_fields:
-                            field.update(MONITOR_DEFAULT_VALUE)
-                else:  # changed - update the last_ins and counter, then update display from the new values
-                    # last_last_imu = self.last_imu_msg.value
-                    last_last_hdg = self.last_hdg_msg.raw
-                    last_hdg_time = time.time()
-                    #json_out["heading_imu"] = ins_msg.heading_deg if hasattr(ins_msg, "relPosHeading_deg") else json_out["heading_imu"] 
-
-                    if active_tab == 'hdg-tab':
-                        hdg_msg = try_multiple_parsers([binary_scheme, ascii_scheme, rtcm_scheme], self.last_hdg_msg.raw)
-                        #print(f"new heading message: {hdg_msg}")
-                        #update the hdg monitor fields here
-                        window["hdg_hdg"].update('%.2f' % hdg_msg.relPosHeading_deg if hasattr(hdg_msg, "relPosHeading_deg")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_len"].update('%.2f' % hdg_msg.relPosLen_m if hasattr(hdg_msg, "relPosLen_m")
-                                                  else MONITOR_DEFAULT_VALUE)
-
-                        window["hdg_N"].update('%.2f' % hdg_msg.relPosN_m if hasattr(hdg_msg, "relPosN_m")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_E"].update('%.2f' % hdg_msg.relPosE_m if hasattr(hdg_msg, "relPosE_m")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_D"].update('%.2f' % hdg_msg.relPosD_m if hasattr(hdg_msg, "relPosD_m")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_lenacc"].update('%.2f' % hdg_msg.relPosLenAcc_m if hasattr(hdg_msg, "relPosLenAcc_m")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_hdgacc"].update('%.2f' % hdg_msg.relPosHeadingAcc_deg if hasattr(hdg_msg, "relPosHeadingAcc_deg")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_flags"].update(hdg_msg.flags if hasattr(hdg_msg, "flags") #int, don't show decimals
-                                                  else MONITOR_DEFAULT_VALUE)
-                        #flags are ints - show as 1/0 or on/off?
-                        window["hdg_flags_fixok"].update(hdg_msg.gnssFixOK if hasattr(hdg_msg, "gnssFixOK")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_flags_diffsoln"].update(hdg_msg.diffSoln if hasattr(hdg_msg, "diffSoln")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_flags_posvalid"].update(hdg_msg.relPosValid if hasattr(hdg_msg, "relPosValid")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_flags_ismoving"].update(hdg_msg.isMoving if hasattr(hdg_msg, "isMoving")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_flags_refposmiss"].update(hdg_msg.refPosMiss if hasattr(hdg_msg, "refPosMiss")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_flags_refobsmiss"].update(hdg_msg.refObsMiss if hasattr(hdg_msg, "refObsMiss")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_flags_hdgvalid"].update(hdg_msg.relPosHeading_Valid if hasattr(hdg_msg, "relPosHeading_Valid")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_flags_normalized"].update(hdg_msg.relPos_Normalized if hasattr(hdg_msg, "relPos_Normalized")
-                                                  else MONITOR_DEFAULT_VALUE)
-                        window["hdg_flags_carrsoln"].update(hdg_msg.carrSoln if hasattr(hdg_msg, "carrSoln")
-                                                  else MONITOR_DEFAULT_VALUE)
+            else:
+                last_gp2_sequence, gps_msg = self.latest_state.read(b'GP2')
+                last_gp2_time = time.time()
+                if active_tab == 'gp2-tab':
+                    #update the fields. todo: can this be a loop over gps_tab_gps_fields?
+                    window["gp2_lat"].update('%.7f' % gps_msg.lat_deg if hasattr(gps_msg, "lat_deg") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_lon"].update('%.7f' % gps_msg.lon_deg if hasattr(gps_msg, "lon_deg") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_alt_ell"].update('%.2f' % gps_msg.alt_ellipsoid_m if hasattr(gps_msg, "alt_ellipsoid_m") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_alt_msl"].update('%.2f' % gps_msg.alt_msl_m if hasattr(gps_msg, "alt_msl_m") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_spd"].update('%.2f' % gps_msg.speed_mps if hasattr(gps_msg, "speed_mps") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_hdg"].update('%.2f' % gps_msg.heading_deg if hasattr(gps_msg, "heading_deg") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_hacc"].update('%.2f' % gps_msg.accuracy_horizontal_m if hasattr(gps_msg, "accuracy_horizontal_m") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_vacc"].update('%.2f' % gps_msg.accuracy_vertical_m if hasattr(gps_msg, "accuracy_vertical_m") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_pdop"].update('%.2f' % gps_msg.PDOP if hasattr(gps_msg, "PDOP") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_numsv"].update(gps_msg.num_sats if hasattr(gps_msg, "num_sats") else MONITOR_DEFAULT_VALUE) #int, don't %3f.
+                    window["gp2_spd_acc"].update('%.2f' % gps_msg.speed_accuracy_mps if hasattr(gps_msg, "speed_accuracy_mps") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_hdg_acc"].update('%.2f' % gps_msg.heading_accuracy_deg if hasattr(gps_msg, "heading_accuracy_deg") else MONITOR_DEFAULT_VALUE)
+                    #values with names - get name from dictionary.
+                    window["gp2_carrsoln"].update(GPS_SOLN_NAMES.get(gps_msg.carrier_solution_status, str(gps_msg.carrier_solution_status))
+                                                  if hasattr(gps_msg, "carrier_solution_status") else MONITOR_DEFAULT_VALUE)
+                    window["gp2_fix"].update(GPS_FIX_NAMES.get(gps_msg.gnss_fix_type, str(gps_msg.gnss_fix_type))
+                                             if hasattr(gps_msg, "gnss_fix_type") else MONITOR_DEFAULT_VALUE)
+            #update for new imu message
+            elapsed = time.time() - last_imu_time
+            #TODO - can update any "time since imu" indicator here
+            if self.latest_state.sequence(b'IMU') == last_imu_sequence:
+                # did not change - no update. but if it's been too long, zero the fields
+                # time_since_ins.update(str(elapsed))
+                # window.refresh()
+                if (elapsed > ZERO_OUT_TIME) and active_tab == "imu-tab":  # zero out the numbers tab
+                    for field in imu_fields:
+                        field.update(MONITOR_DEFAULT_VALUE)
+            else:  # changed - update the last_ins and counter, then update display from the new values
+                last_imu_sequence, imu_msg = self.latest_state.read(b'IMU')
+                last_imu_time = time.time()
+                if active_tab == 'imu-tab':
+                    #print(f"\nimu_msg: {imu_msg}")
+                    #update the imu fields from the message
+                    window["ax_value"].update('%.4f'%imu_msg.accel_x_g if hasattr(imu_msg, "accel_x_g")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["ay_value"].update('%.4f' % imu_msg.accel_y_g if hasattr(imu_msg, "accel_y_g")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["az_value"].update('%.4f' % imu_msg.accel_z_g if hasattr(imu_msg, "accel_z_g")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["wx_value"].update('%.4f' % imu_msg.angrate_x_dps if hasattr(imu_msg, "angrate_x_dps")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["wy_value"].update('%.4f' % imu_msg.angrate_y_dps if hasattr(imu_msg, "angrate_y_dps")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["wz_value"].update('%.4f' % imu_msg.angrate_z_dps if hasattr(imu_msg, "angrate_z_dps")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["fog_value"].update('%.4f' % imu_msg.fog_angrate_z_dps
+                                               if hasattr(imu_msg, "fog_angrate_z_dps") else MONITOR_DEFAULT_VALUE)
+                    window["temp_value"].update('%.2f' % imu_msg.temperature_c
+                                               if hasattr(imu_msg, "temperature_c") else MONITOR_DEFAULT_VALUE)
+                    window["imu_cpu_time"].update('%.2f' % imu_msg.imu_time_ms
+                                                if hasattr(imu_msg, "imu_time_ms") else MONITOR_DEFAULT_VALUE)
+                    window["imu_sync_time"].update('%.2f' % imu_msg.sync_time_ms
+                                                if hasattr(imu_msg, "sync_time_ms") else MONITOR_DEFAULT_VALUE)
+
+                    #message with an odometer speed/time: update the latest speed, reset timer.
+                    if hasattr(imu_msg, "odometer_speed_mps") and hasattr(imu_msg, "odometer_time_ms") and imu_msg.odometer_time_ms > 0:
+                        #odo_value =  '%.2f' % imu_msg.odometer_speed_mps
+                        #last_odo_speed = imu_msg.odometer_speed_mps
+                        last_odo_time = time.time() #or use time of the message?
+                        window["odo_value"].update('%.2f' % imu_msg.odometer_speed_mps)
+                    #if timer runs out, blank the odo speed.
+                    elif time.time() - last_odo_time > ODOMETER_ZERO_TIME:
+                        #odo_value = MONITOR_DEFAULT_VALUE #TODO - do the timeout logic here.
+                        window["odo_value"].update(MONITOR_DEFAULT_VALUE)
+            elapsed_hdg = time.time() - last_hdg_time
+            # can update any "time since hdg" indicator here
+            if self.latest_state.sequence(b'HDG') == last_hdg_sequence:
+                # can zero any heading fields if too much time passed
+                if (elapsed_hdg > ZERO_OUT_TIME) and active_tab == "gps-tab":  # zero out the numbers tab
+                    for field in hdg_fields:
+                        field.update(MONITOR_DEFAULT_VALUE)
+            else:  # changed - update the last_ins and counter, then update display from the new values
+                last_hdg_sequence, hdg_msg = self.latest_state.read(b'HDG')
+                last_hdg_time = time.time()
+                #json_out["heading_imu"] = ins_msg.heading_deg if hasattr(ins_msg, "relPosHeading_deg") else json_out["heading_imu"] 
+
+                if active_tab == 'hdg-tab':
+                    #print(f"new heading message: {hdg_msg}")
+                    #update the hdg monitor fields here
+                    window["hdg_hdg"].update('%.2f' % hdg_msg.relPosHeading_deg if hasattr(hdg_msg, "relPosHeading_deg")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_len"].update('%.2f' % hdg_msg.relPosLen_m if hasattr(hdg_msg, "relPosLen_m")
+                                              else MONITOR_DEFAULT_VALUE)
+
+                    window["hdg_N"].update('%.2f' % hdg_msg.relPosN_m if hasattr(hdg_msg, "relPosN_m")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_E"].update('%.2f' % hdg_msg.relPosE_m if hasattr(hdg_msg, "relPosE_m")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_D"].update('%.2f' % hdg_msg.relPosD_m if hasattr(hdg_msg, "relPosD_m")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_lenacc"].update('%.2f' % hdg_msg.relPosLenAcc_m if hasattr(hdg_msg, "relPosLenAcc_m")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_hdgacc"].update('%.2f' % hdg_msg.relPosHeadingAcc_deg if hasattr(hdg_msg, "relPosHeadingAcc_deg")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_flags"].update(hdg_msg.flags if hasattr(hdg_msg, "flags") #int, don't show decimals
+                                              else MONITOR_DEFAULT_VALUE)
+                    #flags are ints - show as 1/0 or on/off?
+                    window["hdg_flags_fixok"].update(hdg_msg.gnssFixOK if hasattr(hdg_msg, "gnssFixOK")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_flags_diffsoln"].update(hdg_msg.diffSoln if hasattr(hdg_msg, "diffSoln")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_flags_posvalid"].update(hdg_msg.relPosValid if hasattr(hdg_msg, "relPosValid")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_flags_ismoving"].update(hdg_msg.isMoving if hasattr(hdg_msg, "isMoving")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_flags_refposmiss"].update(hdg_msg.refPosMiss if hasattr(hdg_msg, "refPosMiss")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_flags_refobsmiss"].update(hdg_msg.refObsMiss if hasattr(hdg_msg, "refObsMiss")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_flags_hdgvalid"].update(hdg_msg.relPosHeading_Valid if hasattr(hdg_msg, "relPosHeading_Valid")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_flags_normalized"].update(hdg_msg.relPos_Normalized if hasattr(hdg_msg, "relPos_Normalized")
+                                              else MONITOR_DEFAULT_VALUE)
+                    window["hdg_flags_carrsoln"].update(hdg_msg.carrSoln if hasattr(hdg_msg, "carrSoln")
+                                              else MONITOR_DEFAULT_VALUE)
 
     # tell them to get bootloader exe and hex, give upgrade instructions. Will not do this automatically yet.
     # prompt to activate boot loader mode
@@ -1674,16 +1631,6 @@ def version_greater_or_equal(our_ver, compareto):
             return False
     return True #equal
 
-#try parsing a message by multiple parsers, return result of whichever worked (valid)
-def try_multiple_parsers(parser_list, raw_data):
-    for parser in parser_list:
-        message = parser.parse_message(raw_data)
-        #print(f"\n{type(parser)} parses: {message}")
-        if message.valid:
-            return message
-    return None #fail, no parsers worked
-
-
 # pause on messages if it will refresh after
 def show_and_pause(text): #UserProgram
     print(text)
@@ -1783,23 +1730,15 @@ def form_aln_string_prompt():
 
 
 #(data_connection, logging_on, log_name, log_file, ntrip_on, ntrip_reader, ntrip_request, ntrip_ip, ntrip_port)
-def runUserProg(exitflag, con_on, con_start, con_stop, con_succeed,
-                con_type, com_port, com_baud, udp_ip, udp_port, gps_received,
-                log_on, log_start, log_stop, log_name,
-                ntrip_on, ntrip_start, ntrip_stop, ntrip_succeed,
-                ntrip_ip, ntrip_port, ntrip_gga, ntrip_req,
-                last_ins_msg, last_gps_msg, last_gp2_msg, last_imu_msg, last_hdg_msg,
-                last_imu_time,
-                serial_number
+def runUserProg(con_on, gps_received, log_on, ntrip_on, data_format,
+                latest_state,
+                serial_number,
+                io_channel
     ):
-    prog = UserProgram(exitflag, con_on, con_start, con_stop, con_succeed,
-                       con_type, com_port, com_baud, udp_ip, udp_port, gps_received,
-                       log_on, log_start, log_stop, log_name,
-                       ntrip_on, ntrip_start, ntrip_stop, ntrip_succeed,
-                       ntrip_ip, ntrip_port, ntrip_gga, ntrip_req,
-                       last_ins_msg, last_gps_msg, last_gp2_msg, last_imu_msg, last_hdg_msg,
-                       last_imu_time,
-                       serial_number
+    prog = UserProgram(con_on, gps_received, log_on, ntrip_on, data_format,
+                       latest_state,
+                       serial_number,
+                       io_channel
     )
     prog.mainloop()
 
@@ -1809,55 +1748,29 @@ if __name__ == "__main__":
     string_size = 500 # make Arrays big unless I find out how to resize
     #shared vars
 
-    exitflag = Value('b', 0)
+    # status from io_loop
     con_on = Value('b', 0)
-    con_start = Value('b', 0)
-    con_stop = Value('b', 0)
-    con_succeed = Value('b', 0)
-    con_type = Array('c', string_size) #com/udp
-    com_port = Array('c', string_size)#str
-    com_baud = Value('i', 0) #int
-    udp_ip = Array('c', string_size) #str
-    udp_port = Value('i', 0) #int
     gps_received = Value('b', 0)
-    # bundle all connection ones into one structure? same for logging / ntrip
-    # or group into arrays by type: all single flags, all ints, etc
-
-    log_on = Value('b', 0) # for current status
-    log_start = Value('b', 0) # start signal
-    log_stop = Value('b', 0) # stop signal
-    log_name = Array('c', string_size) #Array('c', b'')
-
+    log_on = Value('b', 0)
     ntrip_on = Value('b',0)
-    ntrip_start = Value('b', 0)
-    ntrip_stop = Value('b', 0)
-    ntrip_succeed = Value('b', 0)
-    ntrip_ip = Array('c', string_size)
-    ntrip_port = Value('i', 0)
-    ntrip_gga = Value('b', 0)
-    ntrip_req = Array('c', string_size)  # b'') #probably biggest string - allocate more?
-
-    #shared vars for monitor
-    last_ins_msg = Array('c', string_size)
-    last_gps_msg = Array('c', string_size)
-    last_gp2_msg = Array('c', string_size)
-    last_imu_msg = Array('c', string_size)
-    last_hdg_msg = Array('c', string_size)
-
-    last_imu_time = Value('d', 0)
+    data_format = Array('c', string_size)
+
+    #latest decoded messages for monitor, written by io_loop
+    latest_state = LatestState()
 
     serial_number = Array('c', string_size)
 
-    shared_args = (exitflag, con_on, con_start, con_stop, con_succeed,
-                   con_type, com_port, com_baud, udp_ip, udp_port, gps_received,
-                   log_on, log_start, log_stop, log_name,
-                   ntrip_on, ntrip_start, ntrip_stop, ntrip_succeed, ntrip_ip, ntrip_port, ntrip_gga, ntrip_req,
-                   last_ins_msg, last_gps_msg, last_gp2_msg, last_imu_msg, last_hdg_msg,
-                   last_imu_time,
-                   serial_number              
+    # connect, log, ntrip and exit commands to io_loop, which responds to each when it's done
+    io_channel = IOChannel()
+
+    shared_args = (con_on, gps_received, log_on, ntrip_on, data_format,
+                   latest_state,
+                   serial_number,
+                   io_channel
     )
     io_process = Process(target=io_loop, args=shared_args)
     io_process.start()
     runUserProg(*shared_args) # must do this in main thread so it can take inputs
     io_process.join()
+    latest_state.close()
 
@@ -147,17 +147,38 @@ BCAL_LEVER_ARM_WAIT_SECONDS = 3
 #A1_port2 = UDP_LOCAL_CONFIG_PORT
 UDP_CACHE = "udp_settings.txt"
 NTRIP_CACHE = "ntrip_settings.txt"
-NTRIP_TIMEOUT_SECONDS = 2
-NTRIP_RETRY_SECONDS = 30
-#NTRIP_READ_SIZE = 2048 # how much it reads from caster at once
-NTRIP_MAX_BYTES_PER_INTERVAL = 5000  # don't send in more that this much data per NTRIP_READ_INTERVAL_SECONDS
-NTRIP_MAX_BYTES_PER_WRITE = 1500  # don't send in more that this much data per write
-NTRIP_READ_INTERVAL_SECONDS = 1  # interval for NTRIP bytes limit
+NTRIP_TIMEOUT_SECONDS = 2  # for connecting to the caster, and for its response
+NTRIP_BACKOFF_START_SECONDS = 1  # wait before reconnecting after an ntrip failure, doubling each time it fails again
+NTRIP_BACKOFF_MAX_SECONDS = 30
+NTRIP_RESOLVE_POLL_SECONDS = 0.05  # how often io_loop checks on a caster address lookup
+NTRIP_READ_SIZE = 4096 # how much it reads from caster at once
+NTRIP_MAX_BYTES_PER_SECOND = 5000  # rate corrections are sent to the unit at, at most
+NTRIP_SERIAL_LINK_SHARE = 0.5  # on serial, also use at most this share of the baud rate for corrections
+NTRIP_BUCKET_SECONDS = 1  # corrections can go out in bursts of up to this many seconds at the rate
+NTRIP_MAX_BYTES_PER_WRITE = 1500  # don't send in more that this much data per write (always whole RTCM messages)
+NTRIP_MAX_QUEUE_SECONDS = 2  # drop corrections which waited longer than this to be sent: too old to help
+NTRIP_GGA_INTERVAL_SECONDS = 10  # send GGA to the caster this often (and right after connecting)
+NTRIP_GGA_MOVE_METERS = 100  # also send it when the unit moved this far from the last GGA. None: only by time
 MAX_SINGLE_NTRIP_MESSAGE_SIZE = 1400  # max size of a single message to send to caster
 
-CONNECT_RETRIES = 3
+CONNECT_RETRIES = 3  # ntrip start fails after this many failed tries (io_loop keeps reading data meanwhile)
+
+DATA_RECONNECT_BACKOFF_START_SECONDS = 0.5  # wait before reopening a lost data connection, doubling each failed try
+DATA_RECONNECT_BACKOFF_MAX_SECONDS = 5
+DATA_RECONNECT_BAUD_CHECK_BYTES = 4096  # reopened serial port reads this much without a valid message: try another baud
+IO_POLL_SECONDS = 1e-3 # io_loop wait when the data connection can't be waited on (serial ports on Windows)
+
 RUNNING_RETRIES = 10
-FLUSH_FREQUENCY = 200
+# log files are written by a thread in io_loop. fsync after this many bytes or seconds, None for no limit.
+# with both None, it only fsyncs when the log is closed.
+LOG_FSYNC_BYTES = 4 * 1024 * 1024
+LOG_FSYNC_SECONDS = 10
+# compress logs while writing: None, "gzip" or "zstd" (zstd needs the zstandard package, otherwise it uses gzip)
+LOG_COMPRESSION = None
+# start a new log segment after this many bytes (before compression) or seconds, None for no limit.
+# rotated logs are name_0001.txt, name_0002.txt, ... with name_manifest.json listing them. convertLog reads either.
+LOG_ROTATE_BYTES = None
+LOG_ROTATE_SECONDS = None
 
 #__________Log export configs__________:
 EXPORT_MESSAGE_TYPES = [b'IMU', b'IM1', b'INS', b'GPS', b'GP2', b'HDG']